@@ -10,7 +10,7 @@ Iterate list checking for versions
 that are not the 'latest' or are
 not flagged 'Latest', and delete
 those using 'version_id' of each
-file in case.
+file in case, in bulk batches.
 
 2026
 """
@@ -34,6 +34,8 @@ LOG_PATH: Final = os.environ["LOG_PATH"]
 STORAGE: Final = os.environ["ADMIN"]
 CSV_PTH: Final = os.path.join(STORAGE, "new_false_latest_flag.csv")
 BUCKET: Final = "Access_Renditions_backup"
+# Versions collected before each bulk deletion
+BATCH_SIZE: Final = 1000
 
 # Setup logging
 LOGGER: Final = logging.getLogger("Access_rendition_deletion_clean_up")
@@ -102,6 +104,7 @@ def main() -> None:
     LOGGER.info(
         "=== Access_Rendition_backup bucket clean up START ===================="
     )
+    pending: dict[str, list[str]] = {}
     for row in yield_csv_rows(CSV_PTH):
         print(row)
         if not utils.check_control("black_pearl"):
@@ -156,59 +159,53 @@ def main() -> None:
             ", ".join(to_delete.values()),
         )
 
-        success = delete_existing_proxy(fname, to_delete, len(obj_list))
-        if not success:
-            LOGGER.warning("%s - Deletions not fully successful")
-            continue
-        LOGGER.info("Completed: Clean up of spare files for %s", fname)
+        pending[fname] = list(to_delete.values())
+        if sum(len(versions) for versions in pending.values()) >= BATCH_SIZE:
+            delete_versions(pending)
+            pending = {}
 
-        LOGGER.info("Checking preserved items Latest is set to true")
-        obj_list = bp.get_object_details(fname, BUCKET)
-        version_id = obj_list[0].get("Id")
-        if len(obj_list) != 1:
-            LOGGER.warning(
-                "More than one item remains after deletion run... %s\n", obj_list
-            )
-        else:
-            if bp.set_latest_flag_true(fname, BUCKET, version_id):
-                LOGGER.info("Set Latest flag to True for %s - %s\n", fname, version_id)
+    if pending:
+        delete_versions(pending)
 
     LOGGER.info(
         "=== Access_Rendition_backup bucket clean up END ======================"
     )
 
 
-def delete_existing_proxy(fname: str, deletions: dict[str, str], total) -> bool:
+def delete_versions(pending: dict[str, list[str]]) -> None:
     """
-    A proxy is being replaced so the
-    existing version should be cleared
+    Delete batch of old versions in bulk, then
+    confirm one version remains per file and
+    set its Latest flag to true
     """
+    objects = [(fname, ver) for fname, versions in pending.items() for ver in versions]
+    LOGGER.info(
+        "Deletion stage received %s versions for %s files", len(objects), len(pending)
+    )
+    deleted, failed = bp.delete_black_pearl_objects(objects, BUCKET)
+    LOGGER.info("Successfully deleted %s versions", len(deleted))
+    failed_files = {fname for fname, _ in failed}
+    for fname, version_id in failed:
+        LOGGER.warning(
+            "** Potential deletion failure with %s version %s", fname, version_id
+        )
 
-    if not deletions:
-        LOGGER.info("No files being replaced at this time")
-        return False
-
-    count = 0
-    for key, val in deletions.items():
-        LOGGER.info("Deletion stage received: %s | %s | %s", fname, key, val)
-        confirmed = bp.delete_black_pearl_object(fname, val, BUCKET)
-        print(type(confirmed))
-
-        if confirmed:
-            count += 1
-            obj_list = bp.get_object_list_items(fname)
-            check = int(total) - count
-            if len(obj_list) != check:
-                LOGGER.waring(
-                    "** Potential deletion failure with version %s / %s", val, key
-                )
-            LOGGER.info("Successfully deletion of version %s created on %s", val, key)
-
-    print(count, total)
-    if count == (total - 1):
-        return True
-
-    return False
+    for fname in pending:
+        if fname in failed_files:
+            LOGGER.warning("%s - Deletions not fully successful", fname)
+            continue
+        LOGGER.info("Completed: Clean up of spare files for %s", fname)
+
+        LOGGER.info("Checking preserved items Latest is set to true")
+        obj_list = bp.get_object_details(fname, BUCKET)
+        if not obj_list or len(obj_list) != 1:
+            LOGGER.warning(
+                "More than one item remains after deletion run... %s\n", obj_list
+            )
+            continue
+        version_id = obj_list[0].get("Id")
+        if bp.set_latest_flag_true(fname, BUCKET, version_id):
+            LOGGER.info("Set Latest flag to True for %s - %s\n", fname, version_id)
 
 
 if __name__ == "__main__":
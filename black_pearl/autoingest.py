@@ -503,6 +503,131 @@ def asset_is_next_ingest(
         return False
 
 
+def get_index_key(fname: str) -> str:
+    """
+    Return object_number for a partWhole
+    filename, eg N_123456_02of03.mkv > N-123456
+    """
+    return "-".join(fname.split("_")[:-1])
+
+
+def get_media_ingests_bulk(
+    object_numbers: list[str], session: requests.Session, chunk: int = 50
+) -> dict[str, set[str]]:
+    """
+    Retrieve media record original filenames for
+    many object_numbers using batched OR searches
+    """
+    ingests: dict[str, set[str]] = {}
+    object_numbers = sorted(set(object_numbers))
+    for num in range(0, len(object_numbers), chunk):
+        batch = object_numbers[num : num + chunk]
+        for ob_num in batch:
+            ingests[ob_num] = set()
+        search = " or ".join(f'object.object_number="{ob_num}"' for ob_num in batch)
+        hits, record = adlib.retrieve_record(
+            CID_API, "media", search, "0", session, ["imagen.media.original_filename"]
+        )
+        if hits is None:
+            logger.exception('"CID API was unreachable for Media search: %s', search)
+            raise Exception(f"CID API was unreachable for Media search: {search}")
+        if record is None:
+            continue
+        print(
+            f"get_media_ingests_bulk(): {hits} media records for {len(batch)} object numbers"
+        )
+        for r in record:
+            try:
+                filename = adlib.retrieve_field_name(
+                    r, "imagen.media.original_filename"
+                )[0]
+            except Exception as err:
+                print(err)
+                continue
+            if not filename:
+                continue
+            key = get_index_key(filename)
+            if key in ingests:
+                ingests[key].add(filename)
+
+    return ingests
+
+
+def build_ingest_index(
+    files: list[str], session: Optional[requests.Session] = None
+) -> dict[str, dict[str, Any]]:
+    """
+    Build per run index of multipart ingest state:
+    - cid: object_number > media record filenames
+    - queued: black_pearl_folder > object_number > filenames
+    - local: object_number > filenames awaiting ingest
+    CID media records for all parts > 01 are fetched
+    in bulk, BP folders are walked once when first used
+    """
+    ingest_index: dict[str, dict[str, Any]] = {"cid": {}, "queued": {}, "local": {}}
+    object_numbers = []
+    for fpath in files:
+        fname = os.path.basename(fpath)
+        match = re.search(r"_(\d{2,4})of(\d{2,4})\.[^.]+$", fname)
+        if not match:
+            continue
+        key = get_index_key(fname)
+        ingest_index["local"].setdefault(key, set()).add(fname)
+        if int(match.group(1)) > 1:
+            object_numbers.append(key)
+
+    if object_numbers and session is not None:
+        ingest_index["cid"].update(get_media_ingests_bulk(object_numbers, session))
+
+    return ingest_index
+
+
+def get_indexed_ingests(
+    ingest_index: dict[str, dict[str, Any]],
+    object_number: str,
+    session: requests.Session,
+) -> set[str]:
+    """
+    Return CID media filenames for object_number from index,
+    falling back to a single search if not yet indexed
+    """
+    if object_number not in ingest_index["cid"]:
+        ingest_fnames = get_media_ingests(object_number, session)
+        ingest_index["cid"][object_number] = set(ingest_fnames or [])
+
+    return ingest_index["cid"][object_number]
+
+
+def get_indexed_queue(
+    ingest_index: dict[str, dict[str, Any]], black_pearl_folder: str, key: str
+) -> set[str]:
+    """
+    Return filenames queued in black_pearl_folder for key
+    walking the folder only on first request per run
+    """
+    if black_pearl_folder not in ingest_index["queued"]:
+        queued: dict[str, set[str]] = {}
+        for _, _, files in os.walk(black_pearl_folder):
+            for f in files:
+                queued.setdefault(get_index_key(f), set()).add(f)
+        ingest_index["queued"][black_pearl_folder] = queued
+
+    return ingest_index["queued"][black_pearl_folder].get(key, set())
+
+
+def update_ingest_index(
+    ingest_index: dict[str, dict[str, Any]], black_pearl_folder: str, fname: str
+) -> None:
+    """
+    Record a file moved into black_pearl_folder
+    so later parts in this run see it queued
+    """
+    key = get_index_key(fname)
+    ingest_index["local"].get(key, set()).discard(fname)
+    if black_pearl_folder in ingest_index["queued"]:
+        ingest_index["queued"][black_pearl_folder].setdefault(key, set()).add(fname)
+
+
 def asset_is_next(
     fname: str,
     ext: str,
@@ -511,15 +636,20 @@ def asset_is_next(
     whole: int,
     black_pearl_folder: str,
     session: requests.Session,
+    ingest_index: Optional[dict[str, dict[str, Any]]] = None,
 ) -> str:
     """
     Check which files have persisted already and
-    if this file is next in queue
+    if this file is next in queue, using the run's
+    ingest index in place of repeat CID/folder scans
     """
 
     if part == 1:
         return "True"
 
+    if ingest_index is None:
+        ingest_index = build_ingest_index([])
+
     fsplit = fname.split("_")
     file = "_".join(fsplit[:-1])
     range_whole = whole + 1
@@ -539,36 +669,25 @@ def asset_is_next(
 
     # Get previous parts index (hence -2)
     previous = part - 2
-    ingest_fnames = get_media_ingests(object_number, session)
+    ingest_fnames = get_indexed_ingests(ingest_index, object_number, session)
 
-    if not ingest_fnames:
-        in_bp_ingest_folder = asset_is_next_ingest(
-            fname, filename_range[previous], black_pearl_folder
-        )
-        if in_bp_ingest_folder:
-            print(
-                f"Is the asset in BP ingest folder: {in_bp_ingest_folder} {type(in_bp_ingest_folder)}"
-            )
-            return "True"
-        return "False"
-
-    if fname_check in str(ingest_fnames):
+    if any(f.startswith(fname_check) for f in ingest_fnames):
         return "Ingested already"
-    elif filename_range[previous] in str(ingest_fnames):
+    if any(f.startswith(filename_range[previous]) for f in ingest_fnames):
         print(
             f"Filename previous in ingest_fnames:{filename_range[previous]} {ingest_fnames}"
         )
         return "True"
-    else:
-        in_bp_ingest_folder = asset_is_next_ingest(
-            fname, filename_range[previous], black_pearl_folder
-        )
-        if in_bp_ingest_folder:
-            print(
-                f"Is the asset in BP ingest folder: {in_bp_ingest_folder} {type(in_bp_ingest_folder)}"
-            )
-            return "True"
-        return "False"
+
+    queued = get_indexed_queue(ingest_index, black_pearl_folder, get_index_key(fname))
+    if any(f.startswith(filename_range[previous]) for f in queued):
+        print(f"Previous part in BP ingest folder: {filename_range[previous]}")
+        return "True"
+
+    local = ingest_index["local"].get(get_index_key(fname), set())
+    if any(f.startswith(filename_range[previous]) for f in local):
+        print(f"Previous part still awaiting ingest: {filename_range[previous]}")
+    return "False"
 
 
 def get_mappings(pth: str, mappings: str) -> list[str]:
@@ -627,6 +746,7 @@ def main():
         # Collect files
         files = get_mappings(tree, config_dict["Mappings"])
         print(files)
+        ingest_index = build_ingest_index(files, sess)
         for pth in files:
             if not utils.check_control("autoingest"):
                 sys.exit(
@@ -854,7 +974,14 @@ def main():
                     print("\t* file is multi-part...")
                     print("\t\t* === AUTOINGEST - TEST for ASSET_IS_NEXT ======")
                     result = asset_is_next(
-                        fname, ext, object_number, part, whole, black_pearl_folder, sess
+                        fname,
+                        ext,
+                        object_number,
+                        part,
+                        whole,
+                        black_pearl_folder,
+                        sess,
+                        ingest_index,
                     )
                     if "No index" in result:
                         print("\t\t***** Indexing logic broken")
@@ -912,6 +1039,7 @@ def main():
                             shutil.move(
                                 fpath, os.path.join(black_pearl_blobbing, fname)
                             )
+                            update_ingest_index(ingest_index, black_pearl_folder, fname)
                             print(
                                 f"\t** File moved to {os.path.join(black_pearl_blobbing, fname)}"
                             )
@@ -935,6 +1063,7 @@ def main():
                     continue
                 try:
                     shutil.move(fpath, os.path.join(black_pearl_folder, fname))
+                    update_ingest_index(ingest_index, black_pearl_folder, fname)
                     print(
                         f"\t** File moved to {os.path.join(black_pearl_folder, fname)}"
                     )
@@ -6,14 +6,19 @@ MP4 and JPG proxy files created as part
 of autoingest to DPI.
 
 Targeting bfi/ subfolders only at this time:
-- Checks for modifications in last MOD_MAX days
-- Checks if file already in BP bucket
-- If yes compares local/remote MD5
-- If don't match pushes through to BP bucket along iwth
-  items not found there already (new items)
+- Keeps a manifest of path, size, mtime and last
+  backed up etag, plus each date folder's mtime
+- Only lists date folders whose mtime has changed
+  (or the latest folder), and stats those files
+- Files unseen by manifest and modified in last
+  MOD_MAX days are checked against BP bucket
+- Changed/replaced files have MD5 compared to etag
+  and if they don't match are queued for replacement
 - Deletes out of date duplicates (replace_list)
   Sleep for 30 mins before PUT of same files
-- Pushes all replacement/new items to BP bucket
+- PUTs all replacement/new items to BP bucket
+  directly from their storage path, in batches
+  up to UPLOAD_MAX, and records etag in manifest
 
 2024
 """
@@ -22,11 +27,11 @@ import logging
 
 # Global imports
 import os
-import shutil
+import sqlite3
 import sys
 from datetime import datetime
 from time import sleep
-from typing import Final, Optional
+from typing import Final
 
 # Local imports
 import bp_utils
@@ -39,7 +44,7 @@ import utils
 LOG_PATH = os.environ["LOG_PATH"]
 CONTROL_JSON = os.environ["CONTROL_JSON"]
 STORAGE = os.environ["BP_TRANSCODING"]
-INGEST_POINT = os.path.join(STORAGE, "mp4_proxy_backup_ingest_bfi/")
+MANIFEST = os.path.join(LOG_PATH, "black_pearl", "access_rendition_manifest.db")
 MOD_MAX = 15
 UPLOAD_MAX = 1099511627776
 BUCKET = "Access_Renditions_backup"
@@ -56,6 +61,20 @@ LOGGER.setLevel(logging.INFO)
 
 START_FOLDERS: Final = {"bfi": "201410"}
 
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS FILES (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    etag TEXT,
+    backed_up TEXT
+);
+CREATE TABLE IF NOT EXISTS FOLDERS (
+    path TEXT PRIMARY KEY,
+    mtime REAL
+);
+"""
+
 
 def check_mod_time(fpath: str) -> bool:
     """
@@ -70,38 +89,140 @@ def check_mod_time(fpath: str) -> bool:
     return True
 
 
-def move_to_ingest_folder(new_path: str, file_list: list[str]):
+def connect_manifest(db_path: str = MANIFEST) -> sqlite3.Connection:
     """
-    File list to be formatted structured:
-    'bfi/202402/filename1', 'bfi/202402/filename2'
-    Runs while loop and moves upto 1TB folder size
+    Open manifest database, creating tables if needed
     """
-    ingest_list: list[str] = []
-    LOGGER.info("move_to_ingest_folder(): %s", INGEST_POINT)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
 
-    folder_size = utils.get_size(INGEST_POINT)
-    if folder_size is None:
-        folder_size = 0
-    max_fill_size = UPLOAD_MAX - folder_size
 
-    for fname in file_list:
-        fpath: str = os.path.join(STORAGE, fname)
-        if not max_fill_size >= 0:
+def scan_folder(
+    conn: sqlite3.Connection, key: str, folder: str, folder_path: str
+) -> tuple[list[str], list[str]]:
+    """
+    Stat files in one date folder and compare to
+    manifest, returning new and replace lists of
+    'bfi/202402/filename' formatted entries
+    """
+    new_list: list[str] = []
+    replace_list: list[str] = []
+    known = {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT path, size, mtime, etag FROM FILES WHERE path LIKE ?",
+            (f"{key}/{folder}/%",),
+        )
+    }
+    for entry in os.scandir(folder_path):
+        if not entry.is_file() or entry.name.endswith((".mp4", ".MP4")):
+            continue
+        item = f"{key}/{folder}/{entry.name}"
+        stat = entry.stat()
+        record = known.get(item)
+        if record and record[0] == stat.st_size and record[1] == stat.st_mtime:
+            continue
+
+        if record is None and check_mod_time(entry.path) is False:
+            # Outside backup window, record without checking BP
+            conn.execute(
+                "INSERT INTO FILES (path, size, mtime) VALUES (?, ?, ?)",
+                (item, stat.st_size, stat.st_mtime),
+            )
+            continue
+        etag = record[2] if record else None
+        if etag is None:
+            if bp_utils.check_no_bp_status(item, [BUCKET]) is True:
+                LOGGER.info("New item to write to BP: %s", item)
+                new_list.append(item)
+                continue
+            etag = bp_utils.get_bp_md5(item, BUCKET)
+
+        local_md5 = utils.create_md5_65536(entry.path)
+        if etag and local_md5 == etag:
+            LOGGER.info("Skipping item %s as MD5 matches backed up etag", item)
+            conn.execute(
+                """INSERT INTO FILES (path, size, mtime, etag) VALUES (?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET size=excluded.size,
+                mtime=excluded.mtime, etag=excluded.etag""",
+                (item, stat.st_size, stat.st_mtime, etag),
+            )
+        else:
             LOGGER.info(
-                "move_to_ingest_folder(): Folder at capacity. Breaking move to ingest folder."
+                "MD5s do not match, queue for deletion:\n%s - Local MD5\n%s - Remote MD5",
+                local_md5,
+                etag,
             )
-            break
+            replace_list.append(item)
+    conn.commit()
+
+    return new_list, replace_list
 
-        file_size = utils.get_size(fpath)
-        if file_size is None:
-            file_size = 0
-        max_fill_size -= file_size
-        print(f"Moving file {fname} to {new_path}")
-        shutil.move(fpath, new_path)
-        ingest_list.append(fname)
-    LOGGER.info("move_to_ingest_folder(): Ingest list: %s", ingest_list)
 
-    return ingest_list
+def record_backup(conn: sqlite3.Connection, item_list: list[str]) -> None:
+    """
+    Update manifest with size, mtime and BP etag
+    for items successfully PUT
+    """
+    for item in item_list:
+        fpath = os.path.join(STORAGE, item)
+        conn.execute(
+            """INSERT INTO FILES (path, size, mtime, etag, backed_up)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET size=excluded.size, mtime=excluded.mtime,
+            etag=excluded.etag, backed_up=excluded.backed_up""",
+            (
+                item,
+                os.path.getsize(fpath),
+                os.path.getmtime(fpath),
+                bp_utils.get_bp_md5(item, BUCKET),
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+    conn.commit()
+
+
+def record_folders(conn: sqlite3.Connection, scanned: dict[str, float]) -> None:
+    """
+    Store mtimes of date folders whose files are all
+    backed up, so unchanged folders are skipped next run
+    """
+    conn.executemany(
+        "INSERT OR REPLACE INTO FOLDERS (path, mtime) VALUES (?, ?)", scanned.items()
+    )
+    conn.commit()
+
+
+def put_in_place(item_list: list[str]) -> list[str]:
+    """
+    PUT items from their STORAGE path, keeping
+    'bfi/202402/filename' as the object name.
+    Batches up to UPLOAD_MAX bytes per job
+    Returns list of job IDs
+    """
+    job_list: list[str] = []
+    batch: list[ds3Helpers.HelperPutObject] = []
+    batch_size = 0
+    for item in item_list:
+        fpath = os.path.join(STORAGE, item)
+        size = os.path.getsize(fpath)
+        if batch and batch_size + size > UPLOAD_MAX:
+            job_list.append(
+                bp_utils.put_objects_with_progress(batch, BUCKET, log=LOGGER.info)
+            )
+            batch = []
+            batch_size = 0
+        batch.append(
+            ds3Helpers.HelperPutObject(object_name=item, file_path=fpath, size=size)
+        )
+        batch_size += size
+    if batch:
+        job_list.append(
+            bp_utils.put_objects_with_progress(batch, BUCKET, log=LOGGER.info)
+        )
+
+    return job_list
 
 
 def delete_existing_proxy(file_list: list[str]) -> list[str]:
@@ -112,7 +233,7 @@ def delete_existing_proxy(file_list: list[str]) -> list[str]:
     if not file_list:
         LOGGER.info("No files being replaced at this time")
         return []
-    for file in file_list:
+    for file in list(file_list):
         version_id = bp_utils.get_version_id(file)
         confirmed = bp_utils.delete_black_pearl_object(file, version_id, BUCKET)
         print(type(confirmed))
@@ -132,18 +253,19 @@ def delete_existing_proxy(file_list: list[str]) -> list[str]:
 
 def main():
     """
-    Search through list of files in folder path
-    Check for modification times newer than MOD_MAX
-    Move to INGEST_POINT and PUT to BP bucket.
-    Move all contents of folder back to matching
-    folder structures. Iterate to next folder path and
-    check INGEST_POINT empty for next PUT.
+    Check date folders with modified mtimes (or
+    all folders with 'full' argument) for new or
+    changed files using the manifest. Delete out of
+    date proxies then PUT from storage path to
+    BP bucket, recording the etags in manifest
     """
     if not utils.check_storage(STORAGE):
         LOGGER.info("Script run prevented by Storage Control document. Script exiting.")
         sys.exit("Script run prevented by storage_control.json. Script exiting.")
 
+    full_scan = len(sys.argv) > 1 and sys.argv[1] == "full"
     LOGGER.info("====== BP Access Renditions back up script start ==================")
+    conn = connect_manifest()
     for key, value in START_FOLDERS.items():
         access_path: str = os.path.join(STORAGE, key)
         print(access_path)
@@ -160,9 +282,17 @@ def main():
             )
             continue
 
-        # Iterate folders building lists
+        folder_mtimes = dict(
+            conn.execute(
+                "SELECT path, mtime FROM FOLDERS WHERE path LIKE ?", (f"{key}/%",)
+            ).fetchall()
+        )
+
+        # Iterate changed folders building lists, folder mtimes
+        # only stored once their files are backed up
         file_list: list[str] = []
         replace_list: list[str] = []
+        scanned: dict[str, float] = {}
         for folder in folder_list:
             if not utils.check_control("black_pearl") or not utils.check_control(
                 "pause_scripts"
@@ -170,187 +300,64 @@ def main():
                 sys.exit(
                     "Script run prevented by downtime_control.json. Script exiting."
                 )
+            folder_path = os.path.join(access_path, folder)
+            mtime = os.path.getmtime(folder_path)
+            if (
+                not full_scan
+                and folder != folder_list[-1]
+                and folder_mtimes.get(f"{key}/{folder}") == mtime
+            ):
+                continue
 
             LOGGER.info("** Working with access path date folder: %s", folder)
-            new_path = os.path.join(INGEST_POINT, key, folder)
-            os.makedirs(new_path, mode=0o777, exist_ok=True)
-
-            files: list[str] = os.listdir(os.path.join(access_path, folder))
-            for file in files:
-                old_fpath = os.path.join(access_path, folder, file)
-                if file.endswith((".mp4", ".MP4")):
-                    continue
-                if check_mod_time(old_fpath) is False:
-                    continue
-                if (
-                    bp_utils.check_no_bp_status(f"{key}/{folder}/{file}", [BUCKET])
-                    is True
-                ):
-                    LOGGER.info("New item to write to BP: %s/%s/%s", key, folder, file)
-                    print(f"New item to write to BP: {key}/{folder}/{file}")
-                    file_list.append(f"{key}/{folder}/{file}")
-                else:
-                    print(f"Existing item to overwrite: {key}/{folder}/{file}")
-                    LOGGER.info(
-                        "Existing item to delete and write to BP: %s/%s/%s",
-                        key,
-                        folder,
-                        file,
-                    )
-                    replace_list.append(f"{key}/{folder}/{file}")
-
-            # Checking for matching MD5 within replace list
-            print(len(replace_list))
-            remove_list: list = []
-            if replace_list:
-                for item in replace_list:
-                    local_md5 = utils.create_md5_65536(os.path.join(STORAGE, item))
-                    bp_md5 = bp_utils.get_bp_md5(item, BUCKET)
-                    print(f"Local {local_md5} - {item}")
-                    print(f"Remote {bp_md5} - {item}")
-                    if local_md5 == bp_md5:
-                        print(f"Removing from list MD5 match: {item}")
-                        LOGGER.info(
-                            "Skipping item %s as MD5 files match:\n%s - Local MD5\n%s - Remote MD5",
-                            item,
-                            local_md5,
-                            bp_md5,
-                        )
-                        remove_list.append(item)
-                    elif bp_md5 is None:
-                        LOGGER.info(
-                            "MD5 for item was not found in Black Pearl. File in incorrect list 'replace_list'"
-                        )
-                    else:
-                        LOGGER.info(
-                            "MD5s do not match, queue for deletion:\n%s - Local MD4\n%s - Remote MD5",
-                            local_md5,
-                            bp_md5,
-                        )
-                        print(f"MD5 do not match - queued for deletion: {item}")
-
-            for item in remove_list:
-                replace_list.remove(item)
-
-            if len(replace_list) > 0:
-                # Delete existing versions if being replaced
+            new_items, replace_items = scan_folder(conn, key, folder, folder_path)
+            file_list.extend(new_items)
+            replace_list.extend(replace_items)
+            scanned[f"{key}/{folder}"] = mtime
+
+        LOGGER.info(
+            "%s new and %s replacement files found", len(file_list), len(replace_list)
+        )
+        if len(replace_list) > 0:
+            # Delete existing versions if being replaced
+            LOGGER.info(
+                "** Replacement files needed, original proxy files for deletion:\n%s",
+                replace_list,
+            )
+            success_list = delete_existing_proxy(list(replace_list))
+            if len(success_list) == 0:
                 LOGGER.info(
-                    "** Replacement files needed, original proxy files for deletion:\n%s",
-                    replace_list,
+                    "All repeated files successfully deleted before replacement."
                 )
-                print(len(replace_list))
-                success_list = delete_existing_proxy(replace_list)
-                if len(success_list) == 0:
-                    LOGGER.info(
-                        "All repeated files successfully deleted before replacement."
-                    )
-                else:
-                    LOGGER.warning(
-                        "Duplicate files remaining in Black Pearl - removing from replace_list to avoid duplicate writes: %s",
-                        success_list,
-                    )
-                    for fail_item in success_list:
-                        replace_list.remove(fail_item)
-                sleep(1800)
-
-            # While files remaining in list, move to ingest folder, PUT, and remove again
-            for rep_item in replace_list:
-                file_list.append(rep_item)
-            while file_list:
-                if not utils.check_control("black_pearl"):
-                    sys.exit(
-                        "Script run prevented by downtime_control.json. Script exiting."
-                    )
-                empty_check = [
-                    x
-                    for x in os.listdir(INGEST_POINT)
-                    if os.path.isfile(os.path.join(INGEST_POINT, x))
-                ]
-                if len(empty_check) != 0:
-                    LOGGER.warning(
-                        "Exiting: Files found that weren't moved from ingest point previous run: %s",
-                        INGEST_POINT,
-                    )
-                    sys.exit("See logs for exit reason")
-
-                # Returns list of ingested items and PUTs to BP before moving ingest items back to original path
-                ingest_list: list = []
-                ingest_list = move_to_ingest_folder(new_path, file_list)
-                LOGGER.info("** Moving new set of PUT items:\n%s", ingest_list)
-
-                job_list: Optional[list[str]] = bp_utils.put_directory(
-                    INGEST_POINT, BUCKET
+            else:
+                LOGGER.warning(
+                    "Duplicate files remaining in Black Pearl - removing from replace_list to avoid duplicate writes: %s",
+                    success_list,
                 )
-                if not job_list:
-                    LOGGER.warning(
-                        "Exiting: Failed to PUT data to Black Pearl. Clean up work needed"
-                    )
-                    sys.exit("Failed to PUT data to BP. See logs")
-                LOGGER.info("** PUT folder confirmation: %s", job_list)
-                LOGGER.info(
-                    "Moving files back to original qnap_access_renditions folders: %s",
-                    ingest_list,
-                )
-                success = move_items_back(ingest_list)
-                if success:
-                    new_file_list: list[str] = []
-                    set_ingest_list: set = set(ingest_list)
-                    new_file_list = [x for x in file_list if x not in set_ingest_list]
-                    LOGGER.info("Files successfully moved back to original path.\n")
-                    if len(file_list) != (len(ingest_list) + len(new_file_list)):
-                        LOGGER.info("Inbalance in list following set removal. Exiting")
-                        sys.exit("Inbalance in lists for ingest folder/file lists")
-                    file_list = new_file_list
-                else:
-                    LOGGER.warning(
-                        "Problem moving files from ingest list:\n%s", ingest_list
-                    )
-                    set_ingest_list = set(ingest_list)
-                    files_stuck = [
-                        x for x in set_ingest_list if x not in os.listdir(new_path)
-                    ]
-                    LOGGER.warning("Files that are stuck in folder:\n%s", files_stuck)
-                    sys.exit(
-                        f"Please manually move files back to QNAP-11:\n{files_stuck}"
-                    )
-
-    LOGGER.info("====== BP Access Renditions back up script end ====================")
-
-
-def move_items_back(ingest_list: list[str]) -> bool:
-    """
-    Receive PUT file list and move items back after
-    confirmation of job PUT okay
-    """
-
-    if len(ingest_list) == 0:
-        sys.exit()
+                for fail_item in success_list:
+                    replace_list.remove(fail_item)
+                    # Rescan folder next run to retry replacement
+                    scanned.pop(os.path.dirname(fail_item), None)
+            sleep(1800)
+
+        file_list.extend(replace_list)
+        if not file_list:
+            record_folders(conn, scanned)
+            continue
+        if not utils.check_control("black_pearl"):
+            sys.exit("Script run prevented by downtime_control.json. Script exiting.")
 
-    for entry in ingest_list:
-        print(
-            f"Move: {os.path.join(INGEST_POINT, entry)} - to - {os.path.join(STORAGE, entry)}"
-        )
-        LOGGER.info(
-            "Moving %s to original path %s",
-            os.path.join(INGEST_POINT, entry),
-            os.path.join(STORAGE, entry),
-        )
         try:
-            shutil.move(os.path.join(INGEST_POINT, entry), os.path.join(STORAGE, entry))
+            job_list = put_in_place(file_list)
         except Exception as err:
-            print(err)
-        if not os.path.isfile(os.path.join(STORAGE, entry)):
-            LOGGER.warning("Failed to move file back to STORAGE path. Script exiting!")
-
-    empty_check: list[str] = [
-        x
-        for x in os.listdir(INGEST_POINT)
-        if os.path.isfile(os.path.join(INGEST_POINT, x))
-    ]
-    if len(empty_check) != 0:
-        return False
-    else:
-        return True
+            LOGGER.warning("Exiting: Failed to PUT data to Black Pearl: %s", err)
+            sys.exit("Failed to PUT data to BP. See logs")
+        LOGGER.info("** PUT job confirmation: %s", job_list)
+        record_backup(conn, file_list)
+        record_folders(conn, scanned)
+
+    conn.close()
+    LOGGER.info("====== BP Access Renditions back up script end ====================")
 
 
 if __name__ == "__main__":
@@ -22,12 +22,14 @@ Script actions:
       ii. Checks if filename is first part in many part wholes, builds list
       iii. Extact each filename from imagen.media.original_filename field of Media record
       iv. Check digital_pick.csv to see if filename already been downloaded
-      v. Launch BP download using preservation_bucket entry and receive BP job ID
-      vi. Check new download path/file exists.
-      vii. If yes, write particular file data to digital_pick.csv
-   e. Create XML payload with new DPI download date message, prepended to
+      v. Collect file for restore using preservation_bucket entry
+   e. All collected files are grouped by tape holding them and restored
+      as one bulk GET job per tape group, MAX_JOBS jobs at a time
+   f. Check new download path/file exists.
+      If yes, write particular file data to digital_pick.csv
+   g. Create XML payload with new DPI download date message, prepended to
       contents of request_details field.
-   f. Overwrite request.details data to Workflow record.
+   h. Overwrite request.details data to Workflow record.
 4. Exit script with final log message.
 
 NOTES: Updated to work with adlib_v3
@@ -69,6 +71,8 @@ TODAY: Final = datetime.strftime(datetime.now(), FORMAT)
 CONTROL_JSON: Final = os.environ["CONTROL_JSON"]
 HEADERS: Final = {"Content-Type": "text/xml"}
 CID_API: Final = utils.get_current_api()
+# Bulk GET jobs (one per tape group) running at once
+MAX_JOBS: Final = int(os.environ.get("BP_PICK_MAX_JOBS", "2"))
 
 # Set up logging
 LOGGER = logging.getLogger("bp_get_digital_pick")
@@ -314,22 +318,23 @@ def get_missing_part_names(filename: str) -> Optional[list[str]]:
     return fname_list
 
 
-def make_check_md5(fpath: str, fname: str, bucket: str) -> tuple[str, str]:
+def make_check_md5(
+    fpath: str, fname: str, bucket: str, download_checksum: str = ""
+) -> tuple[str, str]:
     """
-    Generate MD5 for fpath
-    Locate matching file in CID/checksum_md5 folder
-    and see if checksums match. If not, write to log
+    Generate MD5 for fpath, unless supplied
+    from hashing during download, and compare
+    to MD5 retrieved from Black Pearl
     """
-    download_checksum: str = ""
-
-    try:
-        hash_md5 = hashlib.md5()
-        with open(fpath, "rb") as file:
-            for chunk in iter(lambda: file.read(65536), b""):
-                hash_md5.update(chunk)
-        download_checksum = hash_md5.hexdigest()
-    except Exception as err:
-        print(err)
+    if not download_checksum:
+        try:
+            hash_md5 = hashlib.md5()
+            with open(fpath, "rb") as file:
+                for chunk in iter(lambda: file.read(65536), b""):
+                    hash_md5.update(chunk)
+            download_checksum = hash_md5.hexdigest()
+        except Exception as err:
+            print(err)
 
     local_checksum = bp.get_bp_md5(fname, bucket)
     print(
@@ -367,7 +372,9 @@ def main():
     """
     Start Workflow search, iterate results and build list
     of files for download from DPI. Map in digital_pick.csv
-    to avoid repeating unecessary DPI downloads
+    to avoid repeating unecessary DPI downloads. Restore all
+    files for the run in tape order, then update CSV and
+    Workflow records
     """
     if not utils.check_control("black_pearl") or not utils.check_control(
         "pause_scripts"
@@ -392,231 +399,40 @@ def main():
     LOGGER.info("=========== Digital Pick script start ===========")
     LOGGER.info("Workflow jobs retrieved for next two weeks:\n%s", workflow_jobs)
 
-    # Iterate all workflow jobs for next 2 weeks
+    # Collect restore requests for all workflow jobs for next 2 weeks
+    restores: dict[str, list[dict[str, str]]] = {}
+    file_paths: dict[tuple[str, str], str] = {}
     for wf in workflow_jobs.items():
         priref = wf[0]
-        jobnumber = wf[1][0]
-        contact_person = wf[1][1]
-        request_details = wf[1][2]
-        request_from = wf[1][3]
-        LOGGER.info("Looking at Workflow job number %s - priref %s", jobnumber, priref)
-
-        # Fetch child items of ObjectList
-        children = fetch_item_list(priref)
-        if children is None or len(children) == 0:
-            LOGGER.info("Skipping. No children found for Priref: %s", priref)
-            continue
-
-        # Build folder name for BP file retrieval location
-        if jobnumber and request_from:
-            outpath = os.path.join(PICK_FOLDER, f"{jobnumber}_{request_from}")
-        elif jobnumber:
-            outpath = os.path.join(PICK_FOLDER, f"{jobnumber}_{contact_person}")
-        else:
-            LOGGER.info("Skipping. No Workflow jobnumber found for priref: %s", priref)
-            continue
-
-        # Iterate children of Workflow job
-        downloads = []
-        for child_priref in children:
-            child_ob_num = get_child_ob_num(child_priref)
-            LOGGER.info(
-                "Child object number returned from description field: <%s>",
-                child_ob_num,
-            )
-            filename, ref_num, bucket = get_media_original_filename(
-                f"object.object_number='{child_ob_num}'"
-            )
-            if not filename:
+        for request in collect_restores(wf):
+            key = (request["download_fname"], request["bucket"])
+            if key in file_paths:
                 LOGGER.info(
-                    "Skipping. No matching Media record object number / imagen original filename: %s",
-                    child_ob_num,
+                    "Skipping. File %s already requested this run", request["filename"]
                 )
-                downloads.append("False")
                 continue
-            print(child_priref, child_ob_num, filename, ref_num)
-            LOGGER.info(
-                "Looking at child object number %s - priref %s",
-                child_ob_num,
-                child_priref,
+            file_paths[key] = os.path.join(
+                request["outpath"], request["download_fname"]
             )
+            restores.setdefault(priref, []).append(request)
 
-            # Check if file is first part of sequence of files
-            parts_downloads = []
-            filenames = [filename]
-            if "01of01" not in filename:
-                parts_downloads = get_missing_part_names(filename)
-                if not parts_downloads:
-                    pass
-                else:
-                    for parts in parts_downloads:
-                        filenames.append(parts.split(":")[0])
-
-            downloaded_fnames = []
-            for fname in filenames:
-                downloaded = check_csv(fname)
-                if downloaded:
-                    downloaded_fnames.append(fname)
-                    LOGGER.info(
-                        "DOWNLOADED: File %s already downloaded: %s",
-                        filename,
-                        downloaded,
-                    )
-                    downloads.append("False")
-            if len(filenames) == len(downloaded_fnames):
-                LOGGER.info("All parts downloaded: %s", filenames)
-                continue
-
-            # Create new jobnumber folder
-            if not os.path.exists(outpath):
-                os.makedirs(outpath, mode=0o777, exist_ok=True)
+    # Restore grouped by tape, then check and log each download
+    plan = bp.plan_restore(list(file_paths))
+    LOGGER.info("Restoring %s files in %s tape groups", len(file_paths), len(plan))
+    results = bp.restore_planned(plan, file_paths, max_jobs=MAX_JOBS, log=LOGGER.info)
 
-            if filename.strip() == ref_num.strip():
-                umid = False
-                download_fname = filename
-            else:
-                download_fname = ref_num
-                umid = True
-                LOGGER.info("File to be retrieved from BP with UMID: %s", ref_num)
-
-            # Call up BP and get the file object
-            if filename not in downloaded_fnames:
-                download_job_id = bp.download_bp_object(download_fname, outpath, bucket)
-                if os.path.exists(os.path.join(outpath, download_fname)):
-                    # Write successful download to CSV
-                    if umid:
-                        os.rename(
-                            os.path.join(outpath, download_fname),
-                            os.path.join(outpath, filename),
-                        )
-                    download_checksum, bp_checksum = make_check_md5(
-                        os.path.join(outpath, filename), download_fname, bucket
-                    )
-                    if len(bp_checksum) == 0 or len(download_checksum) == 0:
-                        LOGGER.warning(
-                            "Checksums could not be retrieved %s | %s. Writing warning to checksum_failure.log",
-                            download_checksum,
-                            bp_checksum,
-                        )
-                        checksum_log(
-                            f"Error accessing checksum for {filename} | BP checksum: {bp_checksum} | Downloaded file checksum: {download_checksum}"
-                        )
-                    elif bp_checksum.strip() != download_checksum.strip():
-                        LOGGER.warning(
-                            "Checksums do not match %s | %s. Writing warning to checksum_failure.log",
-                            download_checksum,
-                            bp_checksum,
-                        )
-                        checksum_log(
-                            f"Error accessing checksum for {filename} | BP checksum: {bp_checksum} | Downloaded file checksum: {download_checksum}"
-                        )
-                    else:
-                        LOGGER.info(
-                            "Black Pearl checksum '%s' matches generated checksum for download file '%s'",
-                            bp_checksum,
-                            download_checksum,
-                        )
-                    data = [
-                        filename,
-                        outpath,
-                        priref,
-                        jobnumber,
-                        contact_person,
-                        child_priref,
-                        child_ob_num,
-                        download_job_id,
-                        datetime.strftime(datetime.now(), FORMAT),
-                    ]
-                    write_to_csv(data)
-                    LOGGER.info("File %s downloaded to %s", filename, outpath)
-                    LOGGER.info("digital_pick.csv updated: %s", data)
-                    downloads.append("True")
-                else:
-                    LOGGER.warning(
-                        "Skipping this item: BP download failed for file %s", filename
-                    )
-                    downloads.append("False")
-
-            # Download other parts if they exist
-            if parts_downloads:
-                LOGGER.info("Multiple parts need to be downloaded for this job")
-                for download_fname_part in parts_downloads:
-                    part_fname, part_umid, download_bucket = download_fname_part.split(
-                        ":"
-                    )
-                    if part_fname in downloaded_fnames:
-                        LOGGER.info(
-                            "Skipping this item as already downloaded: %s", part_fname
-                        )
-                        continue
-                    if part_fname == part_umid:
-                        dpart_fname = part_fname
-                    else:
-                        dpart_fname = part_umid
-                    # check bucket for all parts, can't assume they match
-                    d_job_id = bp.download_bp_object(
-                        dpart_fname, outpath, download_bucket
-                    )
-                    if os.path.exists(os.path.join(outpath, dpart_fname)):
-                        # Write successful download to CSV
-                        if part_fname != dpart_fname:
-                            os.rename(
-                                os.path.join(outpath, dpart_fname),
-                                os.path.join(outpath, part_fname),
-                            )
-                        # Make checksum test
-                        download_checksum, bp_checksum = make_check_md5(
-                            os.path.join(outpath, part_fname),
-                            dpart_fname,
-                            download_bucket,
-                        )
-                        if bp_checksum is None or download_checksum is None:
-                            LOGGER.warning(
-                                "Checksums could not be retrieved %s | %s. Writing warning to checksum_failure.log",
-                                download_checksum,
-                                bp_checksum,
-                            )
-                            checksum_log(
-                                f"Error accessing checksum for {part_fname} | BP checksum: {bp_checksum} | Downloaded file checksum: {download_checksum}"
-                            )
-                        elif bp_checksum.strip() != download_checksum.strip():
-                            LOGGER.warning(
-                                "Checksums do not match %s | %s. Writing warning to checksum_failure.log",
-                                download_checksum,
-                                bp_checksum,
-                            )
-                            checksum_log(
-                                f"Error accessing checksum for {part_fname} | BP checksum: {bp_checksum} | Downloaded file checksum: {download_checksum}"
-                            )
-                        else:
-                            LOGGER.info(
-                                "Black Pearl checksum '%s' matches generated checksum for download file '%s'",
-                                bp_checksum,
-                                download_checksum,
-                            )
-                        data = [
-                            part_fname,
-                            outpath,
-                            priref,
-                            jobnumber,
-                            contact_person,
-                            child_priref,
-                            child_ob_num,
-                            d_job_id,
-                            datetime.strftime(datetime.now(), FORMAT),
-                        ]
-                        write_to_csv(data)
-                        LOGGER.info("File %s downloaded to %s", filename, outpath)
-                        LOGGER.info("digital_pick.csv updated: %s", data)
-                        downloads.append("True")
-                    else:
-                        LOGGER.warning(
-                            "Skipping this item: BP download failed for file %s", fname
-                        )
-                        downloads.append("False")
+    for wf in workflow_jobs.items():
+        priref = wf[0]
+        request_details = wf[1][2]
+        downloads = [
+            record_download(
+                request, results[(request["download_fname"], request["bucket"])]
+            )
+            for request in restores.get(priref, [])
+        ]
 
         # Check for any successful uploads
-        if "True" not in downloads:
+        if True not in downloads:
             LOGGER.info("No items downloaded for this Workflow: %s", wf)
             continue
 
@@ -640,6 +456,159 @@ def main():
     LOGGER.info("=========== Digital Pick script end =============\n")
 
 
+def collect_restores(wf: tuple[str, list[str]]) -> list[dict[str, str]]:
+    """
+    Iterate child items of Workflow job, returning
+    files (and other parts) not already downloaded
+    with BP object name, bucket and output folder
+    """
+    priref = wf[0]
+    jobnumber = wf[1][0]
+    contact_person = wf[1][1]
+    request_from = wf[1][3]
+    LOGGER.info("Looking at Workflow job number %s - priref %s", jobnumber, priref)
+
+    # Fetch child items of ObjectList
+    children = fetch_item_list(priref)
+    if children is None or len(children) == 0:
+        LOGGER.info("Skipping. No children found for Priref: %s", priref)
+        return []
+
+    # Build folder name for BP file retrieval location
+    if jobnumber and request_from:
+        outpath = os.path.join(PICK_FOLDER, f"{jobnumber}_{request_from}")
+    elif jobnumber:
+        outpath = os.path.join(PICK_FOLDER, f"{jobnumber}_{contact_person}")
+    else:
+        LOGGER.info("Skipping. No Workflow jobnumber found for priref: %s", priref)
+        return []
+
+    # Iterate children of Workflow job
+    restores = []
+    for child_priref in children:
+        child_ob_num = get_child_ob_num(child_priref)
+        LOGGER.info(
+            "Child object number returned from description field: <%s>",
+            child_ob_num,
+        )
+        filename, ref_num, bucket = get_media_original_filename(
+            f"object.object_number='{child_ob_num}'"
+        )
+        if not filename:
+            LOGGER.info(
+                "Skipping. No matching Media record object number / imagen original filename: %s",
+                child_ob_num,
+            )
+            continue
+        print(child_priref, child_ob_num, filename, ref_num)
+        LOGGER.info(
+            "Looking at child object number %s - priref %s",
+            child_ob_num,
+            child_priref,
+        )
+
+        # Check if file is first part of sequence of files
+        parts = [f"{filename}:{ref_num or filename}:{bucket}"]
+        if "01of01" not in filename:
+            parts.extend(get_missing_part_names(filename) or [])
+
+        for part in parts:
+            part_fname, part_umid, part_bucket = part.split(":")
+            downloaded = check_csv(part_fname)
+            if downloaded:
+                LOGGER.info(
+                    "DOWNLOADED: File %s already downloaded: %s",
+                    part_fname,
+                    downloaded,
+                )
+                continue
+            if part_fname.strip() != part_umid.strip():
+                LOGGER.info("File to be retrieved from BP with UMID: %s", part_umid)
+            # Create new jobnumber folder
+            if not os.path.exists(outpath):
+                os.makedirs(outpath, mode=0o777, exist_ok=True)
+            restores.append(
+                {
+                    "filename": part_fname,
+                    "download_fname": part_umid.strip() or part_fname,
+                    "bucket": part_bucket,
+                    "outpath": outpath,
+                    "priref": priref,
+                    "jobnumber": jobnumber,
+                    "contact_person": contact_person,
+                    "child_priref": child_priref,
+                    "child_ob_num": child_ob_num,
+                }
+            )
+
+    return restores
+
+
+def record_download(request: dict[str, str], result: dict[str, Any]) -> bool:
+    """
+    Rename UMID downloads to filename, compare
+    download MD5 to BP and write to digital_pick.csv
+    """
+    filename = request["filename"]
+    outpath = request["outpath"]
+    download_path = os.path.join(outpath, request["download_fname"])
+    if result.get("error"):
+        LOGGER.warning("Download failed for %s: %s", filename, result["error"])
+        if os.path.exists(download_path):
+            os.remove(download_path)
+    if not os.path.exists(download_path):
+        LOGGER.warning("Skipping this item: BP download failed for file %s", filename)
+        return False
+
+    if request["download_fname"] != filename:
+        os.rename(download_path, os.path.join(outpath, filename))
+    download_checksum, bp_checksum = make_check_md5(
+        os.path.join(outpath, filename),
+        request["download_fname"],
+        request["bucket"],
+        result.get("md5") or "",
+    )
+    if len(bp_checksum) == 0 or len(download_checksum) == 0:
+        LOGGER.warning(
+            "Checksums could not be retrieved %s | %s. Writing warning to checksum_failure.log",
+            download_checksum,
+            bp_checksum,
+        )
+        checksum_log(
+            f"Error accessing checksum for {filename} | BP checksum: {bp_checksum} | Downloaded file checksum: {download_checksum}"
+        )
+    elif bp_checksum.strip() != download_checksum.strip():
+        LOGGER.warning(
+            "Checksums do not match %s | %s. Writing warning to checksum_failure.log",
+            download_checksum,
+            bp_checksum,
+        )
+        checksum_log(
+            f"Error accessing checksum for {filename} | BP checksum: {bp_checksum} | Downloaded file checksum: {download_checksum}"
+        )
+    else:
+        LOGGER.info(
+            "Black Pearl checksum '%s' matches generated checksum for download file '%s'",
+            bp_checksum,
+            download_checksum,
+        )
+    data = [
+        filename,
+        outpath,
+        request["priref"],
+        request["jobnumber"],
+        request["contact_person"],
+        request["child_priref"],
+        request["child_ob_num"],
+        result["job_id"],
+        datetime.strftime(datetime.now(), FORMAT),
+    ]
+    write_to_csv(data)
+    LOGGER.info("File %s downloaded to %s", filename, outpath)
+    LOGGER.info("digital_pick.csv updated: %s", data)
+    return True
+
+
 def build_payload(priref: str, data: str, today: str) -> str:
     """
     Build payload info to write to Workflow record
@@ -8,16 +8,21 @@ folders and PUT data to Black Pearl tape library
 
 Script actions:
 1. Identify supply path and collection for bucket selection
-2. Adds items found top level in black_pearl_(netflix_)ingest to dated ingest
-   subfolder until the total size of the folder exceeds upload size,
-   using while loop to count total subfolder size.
-3. When exceeding upload size, the script takes subfolder contents
-   and batch PUTs to Black Pearl using ds3 client.
+2. Collects sizes of items found top level in black_pearl_(netflix_)ingest
+   once, and plans their placement into part filled or new dated ingest
+   subfolders using first-fit-decreasing packing against upload size.
+   The move plan is logged before any file is moved.
+3. Moves files per the plan. When a subfolder is filled to FILL_RATIO
+   of upload size (or is over a day old) the script takes subfolder
+   contents and batch PUTs to Black Pearl using ds3 client.
 4. Once complete iterate returned job ids, and request that a
    notification JSON is issued to validate PUT success.
 5. Use receieved job_id to rename the PUT subfolder.
 
-Notes: Threads hardcoded to 3 per script run / 5000 objects per job
+Notes: Threads default to 3 per script run / 5000 objects per job.
+Worker threads, objects per job, blob size and retry policy can be
+set per host in dpi_ingest.yaml 'Put_options'. Throughput of each
+PUT is written to this script's log as PUT_* structured lines.
 
 2022
 """
@@ -27,7 +32,7 @@ import os
 import shutil
 import sys
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
 # Local import
 import bp_utils as bp
@@ -40,6 +45,8 @@ import utils
 LOG_PATH = os.environ["LOG_PATH"]
 CONTROL_JSON = os.environ["CONTROL_JSON"]
 INGEST_CONFIG = os.environ["INGEST_SIZE"]
+# Planned folders filled to this fraction of upload_size are PUT
+FILL_RATIO = 0.9
 
 # Setup logging
 log_name = sys.argv[1].replace("/", "_")
@@ -53,33 +60,93 @@ logger.addHandler(HDLR)
 logger.setLevel(logging.INFO)
 
 
+def get_file_sizes(autoingest: str, file_list: list[str]) -> dict[str, int]:
+    """
+    Collect file sizes once for all
+    files awaiting move to ingest folders
+    """
+    sizes = {}
+    for file in file_list:
+        if ".DS_Store" in file:
+            continue
+        file_size = utils.get_size(os.path.join(autoingest, file))
+        if file_size is None:
+            logger.warning("get_file_sizes(): Unable to retrieve size for %s", file)
+            continue
+        sizes[file] = file_size
+
+    return sizes
+
+
+def plan_ingest_folders(
+    autoingest: str, sizes: dict[str, int], upload_size: int
+) -> list[dict[str, Any]]:
+    """
+    Plan placement of files into ingest folders using
+    first-fit-decreasing packing against upload_size.
+    Existing ingest_ folders are filled first, then new
+    folders are planned (folder value "") as needed.
+    Returns list of dicts with folder, size and files
+    """
+    plan: list[dict[str, Any]] = []
+    folders = sorted(
+        d
+        for d in os.listdir(autoingest)
+        if os.path.isdir(os.path.join(autoingest, d)) and d.startswith("ingest_")
+    )
+    for folder in folders:
+        folder_size = utils.get_size(os.path.join(autoingest, folder))
+        if folder_size is None:
+            continue
+        plan.append({"folder": folder, "size": folder_size, "files": []})
+
+    for file, file_size in sorted(sizes.items(), key=lambda x: x[1], reverse=True):
+        for ingest_folder in plan:
+            if ingest_folder["size"] + file_size <= upload_size:
+                ingest_folder["files"].append(file)
+                ingest_folder["size"] += file_size
+                break
+        else:
+            plan.append({"folder": "", "size": file_size, "files": [file]})
+
+    return plan
+
+
+def log_move_plan(plan: list[dict[str, Any]], upload_size: int) -> None:
+    """
+    Output move plan before any files move
+    """
+    logger.info("Move plan for %s ingest folders:", len(plan))
+    for ingest_folder in plan:
+        folder = ingest_folder["folder"] or "<new folder>"
+        fill = ingest_folder["size"] / upload_size * 100
+        logger.info(
+            "%s\t%s bytes (%.1f%% of upload size)\t%s",
+            folder,
+            ingest_folder["size"],
+            fill,
+            ", ".join(ingest_folder["files"]),
+        )
+        print(f"Planned: {folder} {ingest_folder['size']} bytes {fill:.1f}%")
+
+
 def move_to_ingest_folder(
     folderpth: str,
-    upload_size: int,
     autoingest: str,
     file_list: list[str],
     bucket_list: list[str],
-) -> list[str]:
+    sizes: dict[str, int],
+) -> int:
     """
-    Runs while loop and moves upto 2TB folder size
-    End when 2TB reached or files run out
+    Move planned files into folderpth, skipping
+    any already found in Black Pearl. Returns
+    size in bytes of files not moved
     """
-    remove_list = []
     print("Move to ingest folder found....")
     logger.info("move_to_ingest_folder(): Moving files to %s", folderpth)
 
-    folder_size = utils.get_size(folderpth)
-    if folder_size is None:
-        folder_size = 0
-    max_fill_size = upload_size - folder_size
+    skipped_size = 0
     for file in file_list:
-        if ".DS_Store" in file:
-            continue
-        if not max_fill_size >= 0:
-            logger.info(
-                "move_to_ingest_folder(): Folder at capacity. Breaking move to ingest folder."
-            )
-            break
         status = bp.check_no_bp_status(file, bucket_list)
         if status is False:
             print(f"bp.check_no_bp_status: {status}")
@@ -87,36 +154,33 @@ def move_to_ingest_folder(
                 "move_to_ingest_folder(): Skipping. File already found in Black Pearl: %s",
                 file,
             )
+            skipped_size += sizes.get(file, 0)
             continue
         fpath = os.path.join(autoingest, file)
-        file_size = utils.get_size(fpath)
-        if file_size is None:
-            file_size = 0
-        max_fill_size -= file_size
-        shutil.move(fpath, os.path.join(folderpth, file))
+        try:
+            shutil.move(fpath, os.path.join(folderpth, file))
+        except OSError as err:
+            logger.warning(
+                "move_to_ingest_folder(): Failed to move file %s\n%s", file, err
+            )
+            skipped_size += sizes.get(file, 0)
+            continue
         logger.info(
             "move_to_ingest_folder(): Moved file into new Ingest folder: %s", file
         )
-        remove_list.append(file)
-
-    for remove_file in remove_list:
-        if remove_file in file_list:
-            file_list.remove(remove_file)
-    logger.info(
-        "move_to_ingest_folder(): Revised file list in Black Pearl ingest folder: %s",
-        file_list,
-    )
 
-    return file_list
+    return skipped_size
 
 
-def create_folderpth(autoingest: str) -> str:
+def create_folderpth(autoingest: str, suffix: str = "") -> str:
     """
     Create new folderpth for ingest
+    suffix keeps names unique when several
+    folders are created in one pass
     """
 
     fname = format_dt()
-    folderpth = os.path.join(autoingest, f"ingest_{fname}")
+    folderpth = os.path.join(autoingest, f"ingest_{fname}{suffix}")
     try:
         os.mkdir(folderpth, mode=0o777)
     except OSError as err:
@@ -136,6 +200,21 @@ def format_dt() -> str:
     return now.strftime("%Y-%m-%d_%H-%M-%S")
 
 
+def get_host_put_options(host_arg: str) -> dict[str, Any]:
+    """
+    Retrieve PUT tuning for host from
+    dpi_ingest.yaml 'Put_options', eg:
+    Put_options:
+      - /mnt/qnap_08: {max_threads: 6, blob_size: 68719476736, retries: 3}
+    """
+    data = utils.read_yaml(INGEST_CONFIG)
+    for host in data.get("Put_options") or []:
+        for key, val in host.items():
+            if host_arg in key and isinstance(val, dict):
+                return val
+    return {}
+
+
 def check_folder_age(fname: str) -> int:
     """
     Retrieve date time stamp from folder
@@ -207,6 +286,8 @@ def main():
     bucket, bucket_list = bp.get_buckets(bucket_collection)
     print(f"bp.get_buckets: {bucket} {bucket_list}")
     logger.info("Key bucket selected %s, bucket list %s", bucket, bucket_list)
+    put_options = get_host_put_options(str(sys.argv[1]))
+    logger.info("PUT options: %s", bp.get_put_options(put_options))
     if "blobbing" in str(bucket):
         logger.warning("Blobbing bucket selected. Aborting PUT")
         sys.exit()
@@ -249,7 +330,7 @@ def main():
                     days_old,
                     bucket,
                 )
-                job_list = put_dir(folderpth, bucket)
+                job_list = put_dir(folderpth, bucket, put_options)
             else:
                 logger.info(
                     "Ingest folder not over 24 hours old. Leaving for more files to be added."
@@ -273,69 +354,46 @@ def main():
         logger.info("======== END Black Pearl ingest %s END ========", sys.argv[1])
         sys.exit()
 
-    while files:
+    # Plan all folder placements before any file is moved
+    sizes = get_file_sizes(autoingest, files)
+    plan = plan_ingest_folders(autoingest, sizes, upload_size)
+    log_move_plan(plan, upload_size)
+
+    for num, ingest_folder in enumerate(plan):
         if not utils.check_control("black_pearl"):
             sys.exit("Script run prevented by downtime_control.json. Script exiting.")
-        folderpth = ""
-        # Autoingest check for ingest_ path under 2TB
-        folders = [
-            d
-            for d in os.listdir(autoingest)
-            if os.path.isdir(os.path.join(autoingest, d)) and d.startswith("ingest_")
-        ]
-        if len(folders) >= 1:
-            logger.info("One or more ingest folders found. Checking size of each")
-            for folder in folders:
-                folder_check_pth = os.path.join(autoingest, folder)
-                logger.info(
-                    "** Ingest folder found (and files present): %s", folder_check_pth
-                )
-                fsize = utils.get_size(folder_check_pth)
-                if fsize < upload_size:
-                    logger.info(
-                        "Folder will have more files added to reach maximum upload size."
-                    )
-                    folderpth = folder_check_pth
-                else:
-                    logger.info(
-                        "Already over maximum upload size, will not add more files: %s",
-                        folder_check_pth,
-                    )
-
-        # If found ingest_ paths not selected for further ingest
-        if folderpth == "":
+        if ingest_folder["folder"]:
+            folderpth = os.path.join(autoingest, ingest_folder["folder"])
+        else:
             logger.info("No suitable ingest folder exists, creating new one...")
-            folderpth = create_folderpth(autoingest)
+            folderpth = create_folderpth(autoingest, f"_{str(num).zfill(2)}")
+            if not folderpth:
+                continue
 
         # Start move to folderpth now identified
         logger.info("Ingest folder selected: %s", folderpth)
-        print(
-            f"move_to_ingest_folder: {folderpth}, {autoingest}, {files}, {bucket_list}"
-        )
-        files_remaining = move_to_ingest_folder(
-            folderpth, upload_size, autoingest, files, bucket_list
-        )
-        if files_remaining is None:
-            logger.info("Problem with folder size extraction in get_size().")
+        folder_size = ingest_folder["size"]
+        if ingest_folder["files"]:
+            print(f"move_to_ingest_folder: {folderpth}, {ingest_folder['files']}")
+            folder_size -= move_to_ingest_folder(
+                folderpth, autoingest, ingest_folder["files"], bucket_list, sizes
+            )
+        if len(os.listdir(folderpth)) == 0:
+            logger.info("Folderpath remains empty after move: %s", folderpth)
+            if not ingest_folder["folder"]:
+                os.rmdir(folderpth)
             continue
 
         job_list = []
-        fsize = utils.get_size(folderpth)
         print(
-            f"Folder identified is {fsize} bytes, and upload size limit is {upload_size} bytes"
+            f"Folder identified is {folder_size} bytes, and upload size limit is {upload_size} bytes"
         )
-        if len(os.listdir(folderpth)) == 0:
-            logger.info(
-                "Script exiting: Folderpath still remains empty after move_to_ingest function: %s",
-                folderpth,
-            )
-            sys.exit()
-        if fsize > upload_size:
+        if folder_size >= upload_size * FILL_RATIO:
             # Ensure ingest folder is now pushed to black pearl
             logger.info(
                 "Starting move of folder path to Black Pearl ingest bucket %s", bucket
             )
-            job_list = put_dir(folderpth, bucket)
+            job_list = put_dir(folderpth, bucket, put_options)
         else:
             # Check how old ingest folder is, if over 1 day push anyway
             fname = os.path.split(folderpth)[1]
@@ -348,10 +406,9 @@ def main():
                 logger.info(
                     "Over one day old, moving to Black Pearl ingest bucket %s", bucket
                 )
-                job_list = put_dir(folderpth, bucket)
+                job_list = put_dir(folderpth, bucket, put_options)
             else:
                 logger.info("Skipping: Folder not over 1 day old.")
-                files = None
                 continue
 
         # Rename folder path with job_list so it is bypassed
@@ -369,24 +426,21 @@ def main():
             "Successfully written data to BP. Job list for folder: %s", job_list
         )
 
-        if not files_remaining:
-            logger.info(
-                "No files remaining in Black Pearl ingest folder, script exiting."
-            )
-
-        logger.info("More files to process, restarting move sequence.\n")
-        files = files_remaining
-
     logger.info(f"======== END Black Pearl ingest %s END ========", sys.argv[1])
 
 
-def put_dir(directory_pth: str, bucket_choice: str) -> list[str]:
+def put_dir(
+    directory_pth: str, bucket_choice: str, put_options: Optional[dict[str, Any]] = None
+) -> list[str]:
     """
-    Add the directory to black pearl using helper (no MD5)
+    Add the directory to black pearl (no MD5) logging throughput
     Retrieve job number and launch json notification
     """
+    job_list = None
     try:
-        job_list = bp.put_directory(directory_pth, bucket_choice)
+        job_list = bp.put_directory(
+            directory_pth, bucket_choice, put_options, log=logger.info
+        )
         print(f"bp.put_directory: {job_list}")
     except Exception as err:
         logger.error("Exception: %s", err)
@@ -15,8 +15,11 @@ Script PUT actions:
 
 Script VALIDATE actions:
 1. Download items again from Black Pearl into download check folder (to be identified)
-2. Checksum generated for downloaded file
+2. Checksum generated for downloaded file as blobs are received
 3. Checksums compared to ensure that the PUT item is a perfect match
+   With BP_BLOB_VERIFY=blob steps 1-3 are replaced by comparing BP blob
+   checksums to local range checksums, restoring only mismatched blobs,
+   then checking the whole file MD5 against the local checksum_md5
 4. Write output to persistence_queue.csv
     'Ready for persistence checking'
 5. Create CID media record and link to Item record
@@ -62,6 +65,9 @@ EMAIL = os.environ.get("DEV_EMAIL")
 CID_API = utils.get_current_api()
 TODAY = str(datetime.today())
 CODE = os.environ["CODE"]
+# 'restore' downloads whole file, 'blob' compares BP blob checksums
+VERIFY_MODE = os.environ.get("BP_BLOB_VERIFY", "restore")
+VERIFY_WORKERS = int(os.environ.get("BP_BLOB_VERIFY_WORKERS", "4"))
 
 # Setup logging
 LOGGER = logging.getLogger(
@@ -137,14 +143,14 @@ def get_buckets(bucket_collection: str) -> str:
 
 
 def make_check_md5(
-    fpath: str, dpath: str, fname: str
+    fpath: str, dpath: str, fname: str, download_checksum: Optional[str] = None
 ) -> Optional[tuple[Optional[str], Optional[str]]]:
     """
     Generate MD5/metadata docs for fpath
     Locate matching file in CID/checksum_md5 folder
     and see if checksums match. If not, write to log
+    download_checksum supplied when hashed during GET
     """
-    download_checksum = ""
     local_checksum = get_md5(fname)
     print(f"Local checksum found: {local_checksum}")
     checksum_path = os.path.join(CHECKSUM_PATH, f"{fname}.md5")
@@ -156,11 +162,13 @@ def make_check_md5(
             make_metadata(fpath, fname, MEDIAINFO_PATH)
         except Exception as err:
             print(err)
-    try:
-        download_checksum = utils.create_md5_65536(dpath)
-        print(f"Downloaded checksum {download_checksum}")
-    except Exception as err:
-        print(err)
+    if not download_checksum:
+        try:
+            download_checksum = utils.create_md5_65536(dpath)
+        except Exception as err:
+            print(err)
+            download_checksum = ""
+    print(f"Downloaded checksum {download_checksum}")
 
     if len(local_checksum) > 10 and len(download_checksum) > 10:
         print(
@@ -170,6 +178,53 @@ def make_check_md5(
     return None, None
 
 
+def verify_blob_put(fpath: str, fname: str, bucket: str) -> tuple[bool, str]:
+    """
+    Blob verify mode: compare BP blob checksums to local
+    ranges. Whole file MD5 is only read when checksum_md5
+    is absent, and written with metadata docs. No full
+    restore. Returns True/False and failure reason
+    """
+    try:
+        verification = bp.verify_blobs(
+            fpath, fname, bucket, max_workers=VERIFY_WORKERS, log=LOGGER.info
+        )
+    except Exception as err:
+        LOGGER.warning("Blob verification could not complete for %s: %s", fname, err)
+        return False, f"Blob verification error: {err}"
+    if not verification["verified"]:
+        return (
+            False,
+            f"Blob checksums do not match at offsets: {verification['failed']}",
+        )
+    LOGGER.info(
+        "Blob checksums match for file >1TB local and stored on Black Pearl: %s blobs, %s restored",
+        len(verification["blobs"]),
+        len(verification["restored"]),
+    )
+
+    local_checksum = get_md5(fname)
+    if local_checksum:
+        # Blob checksums already cover every byte, no second full read
+        LOGGER.info("Local MD5 checksum found: %s", local_checksum)
+        return True, ""
+    try:
+        local_checksum = utils.create_md5_65536(fpath)
+    except Exception as err:
+        print(err)
+        local_checksum = None
+    if not local_checksum:
+        return False, "Local MD5 checksum absent and could not be created"
+    checksum_path = os.path.join(CHECKSUM_PATH, f"{fname}.md5")
+    try:
+        utils.checksum_write(checksum_path, local_checksum, fpath, fname)
+        make_metadata(fpath, fname, MEDIAINFO_PATH)
+    except Exception as err:
+        print(err)
+    LOGGER.info("Local MD5 checksum created: %s", local_checksum)
+    return True, ""
+
+
 def make_metadata(fpath: str, fname: str, mediainfo_path: str) -> None:
     """
     Create mediainfo files
@@ -366,77 +421,108 @@ def main():
                 "Successfully written data to BP. Job ID for file: %s", put_job_id
             )
 
-            # Begin retrieval
-            delivery_path = os.path.join(download_folder, fname)
-            get_job_id = bp.download_blobbed_object(fname, download_folder, bucket)
-            print(f"File downloaded: {delivery_path}")
-            if not os.path.exists(delivery_path):
-                LOGGER.warning(
-                    "Skipping: Failed to download file from Black Pearl: %s",
-                    delivery_path,
+            if VERIFY_MODE == "blob":
+                # Compare BP blob checksums to local ranges, restore mismatches only
+                verified, reason = verify_blob_put(fpath, fname, bucket)
+                if not verified:
+                    send_email_alert(
+                        fname,
+                        fpath,
+                        "This was a blob checksum comparison failure for a new file.",
+                    )
+                    LOGGER.warning(reason)
+                    LOGGER.warning(
+                        "Skipping further actions with this file. Upload failed."
+                    )
+                    if not os.path.exists(error_folder):
+                        os.makedirs(error_folder, mode=0o777, exist_ok=True)
+                    LOGGER.warning("Moving file to error folder for human assessment")
+                    shutil.move(fpath, error_folder)
+                    persistence_log_message(
+                        "Failed fixity check: checksums do not match",
+                        fpath,
+                        wpath,
+                        fname,
+                    )
+                    continue
+            else:
+                # Begin retrieval
+                delivery_path = os.path.join(download_folder, fname)
+                download = bp.download_object_md5(
+                    fname, download_folder, bucket, log=LOGGER.info
+                )
+                get_job_id = download["job_id"]
+                print(f"File downloaded: {delivery_path}")
+                if not os.path.exists(delivery_path):
+                    LOGGER.warning(
+                        "Skipping: Failed to download file from Black Pearl: %s",
+                        delivery_path,
+                    )
+                    continue
+                LOGGER.info("Retrieved asset again. GET job ID: %s", get_job_id)
+                toc2 = time.perf_counter()
+                checksum_put_time2 = (toc2 - toc) // 60
+                LOGGER.info(
+                    "** Total time in minutes for retrieval of BP item: %s",
+                    checksum_put_time2,
                 )
-                continue
-            LOGGER.info("Retrieved asset again. GET job ID: %s", get_job_id)
-            toc2 = time.perf_counter()
-            checksum_put_time2 = (toc2 - toc) // 60
-            LOGGER.info(
-                "** Total time in minutes for retrieval of BP item: %s",
-                checksum_put_time2,
-            )
 
-            # Checksum validation
-            print(
-                "Obtaining checksum for local file and creating one for downloaded file..."
-            )
-            LOGGER.info(
-                "Generating checksum for downloaded file and comparing to existing local MD5."
-            )
-            local_checksum, remote_checksum = make_check_md5(
-                fpath, delivery_path, fname
-            )
-            print(local_checksum, remote_checksum)
-            if local_checksum is None or local_checksum != remote_checksum:
-                # EMAIL ALERT HERE
-                send_email_alert(
-                    fname,
-                    fpath,
-                    "This was a checksum comparison failure for a new file.",
+                # Checksum validation
+                print(
+                    "Obtaining checksum for local file and creating one for downloaded file..."
                 )
-                LOGGER.warning(
-                    "Checksums absent / do not match: \nLocal MD5: %s\nRemote download: %s",
-                    local_checksum,
-                    remote_checksum,
+                LOGGER.info(
+                    "Generating checksum for downloaded file and comparing to existing local MD5."
                 )
-                LOGGER.warning(
-                    "Skipping further actions with this file. Upload failed."
+                local_checksum, remote_checksum = make_check_md5(
+                    fpath, delivery_path, fname, download["md5"]
                 )
-                LOGGER.warning(
-                    "Deleting downloaded file to save space: %s", delivery_path
+                print(local_checksum, remote_checksum)
+                if local_checksum is None or local_checksum != remote_checksum:
+                    # EMAIL ALERT HERE
+                    send_email_alert(
+                        fname,
+                        fpath,
+                        "This was a checksum comparison failure for a new file.",
+                    )
+                    LOGGER.warning(
+                        "Checksums absent / do not match: \nLocal MD5: %s\nRemote download: %s",
+                        local_checksum,
+                        remote_checksum,
+                    )
+                    LOGGER.warning(
+                        "Skipping further actions with this file. Upload failed."
+                    )
+                    LOGGER.warning(
+                        "Deleting downloaded file to save space: %s", delivery_path
+                    )
+                    os.remove(delivery_path)
+                    if not os.path.exists(error_folder):
+                        os.makedirs(error_folder, mode=0o777, exist_ok=True)
+                    LOGGER.warning("Moving file to error folder for human assessment")
+                    shutil.move(fpath, error_folder)
+                    persistence_log_message(
+                        "Failed fixity check: checksums do not match",
+                        fpath,
+                        wpath,
+                        fname,
+                    )
+                    continue
+                LOGGER.info(
+                    "Checksums match for file >1TB local and stored on Black Pearl:\n%s\n%s",
+                    local_checksum,
+                    remote_checksum,
                 )
-                os.remove(delivery_path)
-                if not os.path.exists(error_folder):
-                    os.makedirs(error_folder, mode=0o777, exist_ok=True)
-                LOGGER.warning("Moving file to error folder for human assessment")
-                shutil.move(fpath, error_folder)
-                persistence_log_message(
-                    "Failed fixity check: checksums do not match", fpath, wpath, fname
+                toc3 = time.perf_counter()
+                checksum_put_time3 = (toc3 - toc2) // 60
+                LOGGER.info(
+                    "Total time in minutes for checksum creation and comparison: %s",
+                    checksum_put_time3,
                 )
-                continue
-            LOGGER.info(
-                "Checksums match for file >1TB local and stored on Black Pearl:\n%s\n%s",
-                local_checksum,
-                remote_checksum,
-            )
-            toc3 = time.perf_counter()
-            checksum_put_time3 = (toc3 - toc2) // 60
-            LOGGER.info(
-                "Total time in minutes for checksum creation and comparison: %s",
-                checksum_put_time3,
-            )
 
-            # Delete downloaded file and move to further validation checks
-            LOGGER.info("Deleting downloaded file: %s", delivery_path)
-            os.remove(delivery_path)
+                # Delete downloaded file and move to further validation checks
+                LOGGER.info("Deleting downloaded file: %s", delivery_path)
+                os.remove(delivery_path)
 
             # App size, duration data to CSV
             byte_size = utils.get_size(fpath)
@@ -602,60 +688,85 @@ def main():
             fname,
         )
 
-        # Begin retrieval
-        toc = time.perf_counter()
-        delivery_path = os.path.join(download_folder, fname)
-        get_job_id = bp.download_blobbed_object(fname, download_folder, bucket)
-        print(f"File downloaded: {delivery_path}")
-        if not os.path.exists(delivery_path):
-            LOGGER.warning(
-                "Skipping: Failed to download file from Black Pearl: %s", delivery_path
+        if VERIFY_MODE == "blob":
+            # Compare BP blob checksums to local ranges, restore mismatches only
+            verified, reason = verify_blob_put(fpath, fname, bucket)
+            if not verified:
+                message = (
+                    "This was a blob checksum comparison failure for an 'error/' retry!"
+                )
+                send_email_alert(fname, fpath, message)
+                LOGGER.warning("RETRY! %s", reason)
+                LOGGER.warning(
+                    "Skipping further actions with this file. Upload failed."
+                )
+                continue
+        else:
+            # Begin retrieval
+            toc = time.perf_counter()
+            delivery_path = os.path.join(download_folder, fname)
+            download = bp.download_object_md5(
+                fname, download_folder, bucket, log=LOGGER.info
+            )
+            get_job_id = download["job_id"]
+            print(f"File downloaded: {delivery_path}")
+            if not os.path.exists(delivery_path):
+                LOGGER.warning(
+                    "Skipping: Failed to download file from Black Pearl: %s",
+                    delivery_path,
+                )
+                continue
+            LOGGER.info("Retrieved asset again. GET job ID: %s", get_job_id)
+            toc2 = time.perf_counter()
+            checksum_put_time2 = (toc2 - toc) // 60
+            LOGGER.info(
+                "** Total time in minutes for retrieval of BP item: %s",
+                checksum_put_time2,
             )
-            continue
-        LOGGER.info("Retrieved asset again. GET job ID: %s", get_job_id)
-        toc2 = time.perf_counter()
-        checksum_put_time2 = (toc2 - toc) // 60
-        LOGGER.info(
-            "** Total time in minutes for retrieval of BP item: %s", checksum_put_time2
-        )
 
-        # Checksum validation
-        print(
-            "Obtaining checksum for local file and creating one for downloaded file..."
-        )
-        LOGGER.info(
-            "Generating checksum for downloaded file and comparing to existing local MD5."
-        )
-        local_checksum, remote_checksum = make_check_md5(fpath, delivery_path, fname)
-        print(local_checksum, remote_checksum)
-        if local_checksum is None or local_checksum != remote_checksum:
-            # EMAIL ALERT HERE
-            message = "This was a checksum download and comparison failure for an 'error/' retry!"
-            send_email_alert(fname, fpath, message)
-            LOGGER.warning(
-                "RETRY! Checksums absent / do not match: \nLocal MD5: %s\nRemote download: %s",
+            # Checksum validation
+            print(
+                "Obtaining checksum for local file and creating one for downloaded file..."
+            )
+            LOGGER.info(
+                "Generating checksum for downloaded file and comparing to existing local MD5."
+            )
+            local_checksum, remote_checksum = make_check_md5(
+                fpath, delivery_path, fname, download["md5"]
+            )
+            print(local_checksum, remote_checksum)
+            if local_checksum is None or local_checksum != remote_checksum:
+                # EMAIL ALERT HERE
+                message = "This was a checksum download and comparison failure for an 'error/' retry!"
+                send_email_alert(fname, fpath, message)
+                LOGGER.warning(
+                    "RETRY! Checksums absent / do not match: \nLocal MD5: %s\nRemote download: %s",
+                    local_checksum,
+                    remote_checksum,
+                )
+                LOGGER.warning(
+                    "Skipping further actions with this file. Upload failed."
+                )
+                LOGGER.warning(
+                    "Deleting downloaded file to save space: %s", delivery_path
+                )
+                os.remove(delivery_path)
+                continue
+            LOGGER.info(
+                "Checksums match for file >1TB local and stored on Black Pearl:\n%s\n%s",
                 local_checksum,
                 remote_checksum,
             )
-            LOGGER.warning("Skipping further actions with this file. Upload failed.")
-            LOGGER.warning("Deleting downloaded file to save space: %s", delivery_path)
-            os.remove(delivery_path)
-            continue
-        LOGGER.info(
-            "Checksums match for file >1TB local and stored on Black Pearl:\n%s\n%s",
-            local_checksum,
-            remote_checksum,
-        )
-        toc3 = time.perf_counter()
-        checksum_put_time3 = (toc3 - toc2) // 60
-        LOGGER.info(
-            "Total time in minutes for checksum creation and comparison: %s",
-            checksum_put_time3,
-        )
+            toc3 = time.perf_counter()
+            checksum_put_time3 = (toc3 - toc2) // 60
+            LOGGER.info(
+                "Total time in minutes for checksum creation and comparison: %s",
+                checksum_put_time3,
+            )
 
-        # Delete downloaded file and move to further validation checks
-        LOGGER.info("Deleting downloaded file: %s", delivery_path)
-        os.remove(delivery_path)
+            # Delete downloaded file and move to further validation checks
+            LOGGER.info("Deleting downloaded file: %s", delivery_path)
+            os.remove(delivery_path)
 
         # App size, duration data to CSV
         byte_size = utils.get_size(fpath)
@@ -24,12 +24,13 @@ via saved search filtered by DigiOps.
    v/  Using the extracted reference_number
        data proceeds to launch Python SDK command
        to retrieve BP object 'VersionID' as variable
-       then delete the object from the tape library.
+       then deletes objects from the tape library
+       per bucket in bulk, multi-object requests.
    vi/ Also pulls out MP4 data and deletes associated
        MP4 access proxy video. Does not delete thumb
        or large image.
    vii/ Updates completion of deletion to CID media
-       record and to screen/log.
+       records in batches and to screen/log.
 4. Closes up comms and script exits.
 
 NOTE: Accompanying 'undelete' script to be written
@@ -263,6 +264,9 @@ def main():
         "\nConfirmation to proceed received, deletion of approved assets will now begin.\n"
     )
     deleted = []
+    cid_updates: dict[str, list[str]] = {}
+    bucket_names: dict[str, list[str]] = {}
+    pending: dict[tuple[str, str], tuple[str, list[Optional[str]]]] = {}
     for key, val in deletion_dictionary.items():
         priref = key
         ref_num = val[0]
@@ -278,99 +282,22 @@ def main():
 
         confirmation = []
         confirmation.append(f"<notes>{approved}</notes>")
+        cid_updates[priref] = confirmation
 
         if "Confirmed for deletion" in str(approved) and len(ref_num) >= 7:
             print(f"Confirmed for deletion: {key}, {ref_num}, {approved}")
             LOGGER.info(
                 "Confirmed for deletion: %s - %s. Priref %s", ref_num, fname, priref
             )
-            LOGGER.info("Fetching version_id using reference number")
-            version_id = bp.get_version_id(ref_num)
-            if not version_id:
-                LOGGER.warning(
-                    "Deletion of file %s not possible, unable to retreive version_id",
-                    ref_num,
-                )
-                print(
-                    f"WARNING: Deletion impossible, version_id not found for file {ref_num}"
-                )
-                confirmation.append(
-                    "<notes>Black Pearl file was not deleted - version_id not found</notes>"
-                )
-                succ = cid_media_append(priref, confirmation)
-                if succ:
-                    print("CID media record notes field updated")
-                continue
-            print(f"Version id retrieved from Black Pearl: {version_id}")
-
-            success = bp.delete_black_pearl_object(ref_num, version_id, bucket)
-            if not success:
-                LOGGER.warning(
-                    "Deletion of asset failed: %s. Priref %s. Version id %s",
-                    ref_num,
-                    priref,
-                    version_id,
-                )
-                print(f"WARNING: Deletion of asset failed: {ref_num}.\n")
-                confirmation.append("<notes>Black Pearl file was not deleted</notes>")
-                succ = cid_media_append(priref, confirmation)
-                if succ:
-                    print("CID media record notes field updated")
-                continue
-
-            # Check for head object of deleted asset for confirmation
-            delete_check = bp.etag_deletion_confirmation(ref_num, bucket)
-            if delete_check == "Deleted":
-                print(f"** DELETED FROM BLACK PEARL: {ref_num} - from bucket {bucket}")
-                LOGGER.info(
-                    "** DELETED FROM BLACK PEARL: %s - from bucket %s", ref_num, bucket
-                )
-                deleted.append(f"{key} {ref_num}")
-                confirmation.append("<notes>Black Pearl asset deleted</notes>")
-                succ = cid_media_append(priref, confirmation)
-                if succ:
-                    print("CID media record notes field updated")
-
-            else:
-                print(f"** FILE NOT DELETED FROM BLACK PEARL. ETAG {delete_check}")
-                LOGGER.warning("** FILE NOT DELETED FROM BLACK PEARL: %s", ref_num)
-                confirmation.append("<notes>Black Pearl asset was not deleted</notes>")
-                succ = cid_media_append(priref, confirmation)
-                if succ:
-                    print("CID media record notes field updated")
-                continue
-
-            # Make MP4/thumb/image paths then attempt delete
-            if len(access_mp4) > 1:
-                mp4_path = get_mp4_path(input_date, access_mp4)
-            else:
-                print("Could not build MP4 access file paths for deletion")
-                mp4_path = None
-            if len(access_thumb) > 1:
-                thumb_path = get_mp4_path(input_date, access_thumb)
-            else:
-                print("Could not build MP4 thumbnail file paths for deletion")
-                thumb_path = None
-            if len(access_image) > 1:
-                image_path = get_mp4_path(input_date, access_image)
-            else:
-                print("Could not build MP4 large image file paths for deletion")
-                image_path = None
-
-            if mp4_path and os.path.exists(mp4_path):
-                LOGGER.info("** DELETED: Associated MP4 found: %s", mp4_path)
-                print(f"Associated MP4 found, deleting now: {mp4_path}.\n")
-                os.remove(mp4_path)
-
-            if thumb_path and os.path.exists(thumb_path):
-                LOGGER.info("** DELETED: Associated MP4 found: %s", thumb_path)
-                print(f"Associated MP4 found, deleting now: {thumb_path}.\n")
-                os.remove(thumb_path)
-
-            if image_path and os.path.exists(image_path):
-                LOGGER.info("** DELETED: Associated MP4 found: %s", image_path)
-                print(f"Associated MP4 found, deleting now: {image_path}.\n")
-                os.remove(image_path)
+            # Queue for version_id lookup and bulk deletion per bucket
+            bucket_names.setdefault(bucket, []).append(ref_num)
+            pending[(bucket, ref_num)] = (
+                priref,
+                [
+                    get_mp4_path(input_date, access) if len(access) > 1 else None
+                    for access in (access_mp4, access_thumb, access_image)
+                ],
+            )
 
         elif "Confirmed for deletion" in str(approved) and len(ref_num) < 7:
             LOGGER.warning(
@@ -380,10 +307,6 @@ def main():
             confirmation.append(
                 "<notes>Deletion skipped. Incomplete reference number.</notes>"
             )
-            succ = cid_media_append(priref, confirmation)
-            if succ:
-                print("CID media record notes field updated")
-            continue
         else:
             LOGGER.warning(
                 "Skipping deletion. Approval absent from CID media record: %s", priref
@@ -394,10 +317,61 @@ def main():
             confirmation.append(
                 "<notes>Deletion skipped. Confirmation not present in notes field.</notes>"
             )
-            succ = cid_media_append(priref, confirmation)
-            if succ:
-                print("CID media record notes field updated")
-            continue
+
+    for bucket, names in bucket_names.items():
+        LOGGER.info("Fetching version_ids for %s objects in %s", len(names), bucket)
+        version_ids = bp.get_latest_version_ids(names, bucket)
+        objects = []
+        for ref_num in names:
+            if ref_num not in version_ids:
+                LOGGER.warning(
+                    "Deletion of file %s not possible, unable to retreive version_id",
+                    ref_num,
+                )
+                print(
+                    f"WARNING: Deletion impossible, version_id not found for file {ref_num}"
+                )
+                cid_updates[pending[(bucket, ref_num)][0]].append(
+                    "<notes>Black Pearl file was not deleted - version_id not found</notes>"
+                )
+                continue
+            objects.append((ref_num, version_ids[ref_num]))
+
+        LOGGER.info("Deleting %s objects from bucket %s", len(objects), bucket)
+        success, failed = bp.delete_black_pearl_objects(objects, bucket)
+        for ref_num, version_id in failed:
+            priref = pending[(bucket, ref_num)][0]
+            print(f"** FILE NOT DELETED FROM BLACK PEARL: {ref_num}")
+            LOGGER.warning(
+                "** FILE NOT DELETED FROM BLACK PEARL: %s. Priref %s. Version id %s",
+                ref_num,
+                priref,
+                version_id,
+            )
+            cid_updates[priref].append(
+                "<notes>Black Pearl asset was not deleted</notes>"
+            )
+        for ref_num, _ in success:
+            priref, access_paths = pending[(bucket, ref_num)]
+            print(f"** DELETED FROM BLACK PEARL: {ref_num} - from bucket {bucket}")
+            LOGGER.info(
+                "** DELETED FROM BLACK PEARL: %s - from bucket %s", ref_num, bucket
+            )
+            deleted.append(f"{priref} {ref_num}")
+            cid_updates[priref].append("<notes>Black Pearl asset deleted</notes>")
+
+            # Delete MP4/thumb/image if paths built
+            for access_path in access_paths:
+                if access_path and os.path.exists(access_path):
+                    LOGGER.info("** DELETED: Associated MP4 found: %s", access_path)
+                    print(f"Associated MP4 found, deleting now: {access_path}.\n")
+                    os.remove(access_path)
+
+    # Write all notes to CID media records in batches
+    failed_prirefs = cid_media_append_batch(cid_updates)
+    print(
+        f"CID media record notes field updated for {len(cid_updates) - len(failed_prirefs)} records"
+    )
 
     print(f"Completed deletion of *{len(deleted)}* assets:")
     if len(deleted) == 0:
@@ -421,26 +395,35 @@ def get_mp4_path(input_date: str, access_mp4: str) -> tuple[str, str]:
     return mp4_path
 
 
-def cid_media_append(priref: str, data: str) -> bool:
+def cid_media_append_batch(
+    updates: dict[str, list[str]], batch_size: int = 100
+) -> list[str]:
     """
-    Receive data and priref and append to CID media record
+    Append data to many CID media records, posting
+    batch_size records per updaterecord call
+    Returns prirefs from any failed batches
     """
-    payload_head = f"<adlibXML><recordList><record priref='{priref}'>"
-    payload_mid = "".join(data)
-    payload_end = "</record></recordList></adlibXML>"
-    payload = payload_head + payload_mid + payload_end
-
-    record = adlib.post(CID_API, payload, "media", "updaterecord")
-    if not record:
-        LOGGER.warning(
-            "cid_media_append(): Post of data failed: %s - %s", priref, payload
+    failed: list[str] = []
+    prirefs = list(updates)
+    for num in range(0, len(prirefs), batch_size):
+        batch = prirefs[num : num + batch_size]
+        records = "".join(
+            f"<record priref='{priref}'>{''.join(updates[priref])}</record>"
+            for priref in batch
         )
-        return False
-    LOGGER.info(
-        "cid_media_append(): Write of access_rendition data appear successful for Priref %s",
-        priref,
-    )
-    return True
+        payload = f"<adlibXML><recordList>{records}</recordList></adlibXML>"
+        record = adlib.post(CID_API, payload, "media", "updaterecord")
+        if not record:
+            LOGGER.warning(
+                "cid_media_append_batch(): Post of data failed for prirefs: %s", batch
+            )
+            failed.extend(batch)
+            continue
+        LOGGER.info(
+            "cid_media_append_batch(): Write of notes appear successful for %s prirefs",
+            len(batch),
+        )
+    return failed
 
 
 if __name__ == "__main__":
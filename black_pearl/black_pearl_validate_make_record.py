@@ -31,6 +31,11 @@ Where a JSON matches, and all items have written successfully:
 2. Once completed above move JSON to Logs/black_pearl/completed folder.
    The empty job id folder is deleted if empty, if not prepended 'error_'
 
+Launch with 'worker' argument to run as a long running worker
+that claims completed jobs from the bp_job_queue SQLite queue
+(appended to by flask_server/app.py) and processes the matching
+folder as soon as the notification arrives.
+
 NOTE: Restriction in main() temporarily in place to allow second version of script
       to target specific (slow) paths, allowing the rest to move quickly. Eventually
       this will be set to QNAP-04 STORA full time.
@@ -45,9 +50,12 @@ import logging
 import os
 import shutil
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
+import bp_job_queue
 import bp_utils as bp
 import requests
 
@@ -69,6 +77,8 @@ INGEST_CONFIG = os.path.join(
 )
 MEDIA_REC_CSV = os.path.join(LOG_PATH, "duration_size_media_records.csv")
 PERSISTENCE_LOG = os.path.join(LOG_PATH, "autoingest", "persistence_queue.csv")
+# Files probed / media records created concurrently per job folder
+MAX_WORKERS = int(os.environ.get("BP_VALIDATE_WORKERS", "1"))
 
 # Setup logging
 logger = logging.getLogger("black_pearl_validate_make_record")
@@ -197,6 +207,42 @@ def check_for_media_record(fname: str, session: requests.Session) -> tuple[str,
     return priref, access_mp4
 
 
+def get_autoingest_list(ingest_data: dict) -> list[str]:
+    """
+    Build list of black_pearl_ingest paths
+    from dpi_ingest.yaml Host_size entries
+    """
+    autoingest_list = []
+    for host in ingest_data["Host_size"]:
+        # Paths to avoid processing
+        if "/mnt/qnap_04" in str(host):
+            continue
+
+        # Build autoingest list for separate iteration
+        for pth in host.keys():
+            autoingest_list.append(os.path.join(pth, BPINGEST))
+            if "/mnt/qnap_09" in pth:
+                autoingest_list.append(os.path.join(pth, BPINGEST_NETFLIX))
+                autoingest_list.append(os.path.join(pth, BPINGEST_AMAZON))
+                autoingest_list.append(os.path.join(pth, BPINGEST_DISNEY))
+
+    return autoingest_list
+
+
+def get_autoingest_buckets(autoingest: str) -> tuple[str, list[str]]:
+    """
+    Return preservation bucket and bucket
+    list for black_pearl_ingest path
+    """
+    if "black_pearl_netflix_ingest" in autoingest:
+        return bp.get_buckets("netflix")
+    elif "black_pearl_amazon_ingest" in autoingest:
+        return bp.get_buckets("amazon")
+    elif "black_pearl_disney_ingest" in autoingest:
+        return bp.get_buckets("disney")
+    return bp.get_buckets("bfi")
+
+
 def main():
     """
     Load dpi_ingest.yaml
@@ -212,21 +258,8 @@ def main():
         logger.critical("* Cannot establish CID session, exiting script")
         sys.exit("* Cannot establish CID session, exiting script")
     ingest_data = utils.read_yaml(INGEST_CONFIG)
-    hosts = ingest_data["Host_size"]
     sess = adlib.create_session()
-    autoingest_list = []
-    for host in hosts:
-        # Paths to avoid processing
-        if "/mnt/qnap_04" in str(host):
-            continue
-
-        # Build autoingest list for separate iteration
-        for pth in host.keys():
-            autoingest_list.append(os.path.join(pth, BPINGEST))
-            if "/mnt/qnap_09" in pth:
-                autoingest_list.append(os.path.join(pth, BPINGEST_NETFLIX))
-                autoingest_list.append(os.path.join(pth, BPINGEST_AMAZON))
-                autoingest_list.append(os.path.join(pth, BPINGEST_DISNEY))
+    autoingest_list = get_autoingest_list(ingest_data)
 
     print(autoingest_list)
     for autoingest in autoingest_list:
@@ -239,14 +272,7 @@ def main():
             )
             continue
 
-        if "black_pearl_netflix_ingest" in autoingest:
-            bucket, bucket_list = bp.get_buckets("netflix")
-        elif "black_pearl_amazon_ingest" in autoingest:
-            bucket, bucket_list = bp.get_buckets("amazon")
-        elif "black_pearl_disney_ingest" in autoingest:
-            bucket, bucket_list = bp.get_buckets("disney")
-        else:
-            bucket, bucket_list = bp.get_buckets("bfi")
+        bucket, bucket_list = get_autoingest_buckets(autoingest)
 
         folders = [
             x
@@ -266,196 +292,371 @@ def main():
                 )
             if folder.startswith(("ingest_", "error_", "blob", ".")):
                 continue
-            logger.info(
-                "======== START Black Pearl validate/CID Media record START ========"
-            )
-            logger.info(
-                "Folder found that is not an ingest folder, or has failed or errored files within: %s",
-                folder,
-            )
-            json_file = success = ""
-
-            failed_folder = None
-            if folder.startswith("pending_"):
-                fpath = os.path.join(autoingest, folder)
-                logger.info(
-                    "Failed folder found, will pass on for repeat processing. No JSON needed: %s",
-                    folder,
-                )
-                failed_folder = folder.split("_")[-1]
-
-            elif len(folder) == 73:
-                logger.info("Concatenated job IDs! %s", folder)
-
-                folders = folder.split("_")
-                if not len(folders) == 2:
-                    success = None
-                    continue
-                if len(folders[0]) != 36 or len(folders[1]) != 36:
-                    success = None
-                    continue
-
-                # Iterate through JOB IDs
-                for fld in folders:
-                    fpath = os.path.join(autoingest, fld)
-                    json_file = retrieve_json_data(fld)
-                    if not json_file:
-                        logger.info("No matching JSON found for folder.")
-                        continue
-
-                    logger.info("Matching JSON found for BP Job ID: %s", fld)
-                    # Check in JSON for failed BP job object
-                    failed_files = json_check(json_file)
-                    if failed_files:
-                        for ffile in failed_files:
-                            for key, value in ffile.items():
-                                if key == "Name":
-                                    logger.info(
-                                        "FAILED: Moving back into Black Pearl ingest folder:\n%s",
-                                        value,
-                                    )
-                                    print(
-                                        f"shutil.move({os.path.join(fpath, value)}, {os.path.join(autoingest, value)})"
-                                    )
-                                    try:
-                                        shutil.move(
-                                            os.path.join(fpath, value),
-                                            os.path.join(autoingest, value),
-                                        )
-                                    except Exception as exc:
-                                        print(exc)
-                                        logger.warning(
-                                            "Failed ingest file %s couldn't be moved out of path: %s",
-                                            value,
-                                            fpath,
-                                        )
-                                        pass
+            # Claim folder's jobs so a queue worker can't process it too
+            job_ids = folder_job_ids(folder)
+            claimed = []
+            for job_id in job_ids:
+                if not bp_job_queue.claim_job_id(job_id):
+                    break
+                claimed.append(job_id)
+            if len(claimed) < len(job_ids):
+                logger.info("Skipping folder claimed by job queue worker: %s", folder)
+                for job_id in claimed:
+                    bp_job_queue.release_job(job_id)
+                continue
+            success = None
+            try:
+                success = process_folder(autoingest, folder, bucket, bucket_list, sess)
+            finally:
+                for job_id in claimed:
+                    if isinstance(success, str) and "Job complete" in success:
+                        bp_job_queue.complete_job(job_id)
                     else:
-                        logger.info("No files failed transfer to BP data tape")
+                        bp_job_queue.release_job(job_id)
+
+    logger.info("======== END Black Pearl validate/CID media record END ========")
+
+
+def folder_job_ids(folder: str) -> list[str]:
+    """
+    Job IDs held in folder name, from pending_
+    and concatenated job ID folders
+    """
+    if folder.startswith("pending_"):
+        return [folder.split("_")[-1]]
+    if len(folder) == 73:
+        return folder.split("_")
+    return [folder]
+
+
+def find_job_folder(
+    job_id: str, autoingest_list: list[str]
+) -> Optional[tuple[str, str]]:
+    """
+    Locate job folder for job_id across black_pearl_ingest
+    paths, checking exact folder name before concatenated
+    or pending_ folder names
+    """
+    for autoingest in autoingest_list:
+        if os.path.isdir(os.path.join(autoingest, job_id)):
+            return autoingest, job_id
+    for autoingest in autoingest_list:
+        if not os.path.exists(autoingest):
+            continue
+        for folder in os.listdir(autoingest):
+            if job_id in folder and not folder.startswith("error_"):
+                return autoingest, folder
+    return None
+
+
+def worker(poll_seconds: int = 30) -> None:
+    """
+    Claim job completion notifications from bp_job_queue
+    and process matching folder immediately, in place of
+    waiting for the next cron pass of main()
+    """
+    if not utils.cid_check(CID_API):
+        logger.critical("* Cannot establish CID session, exiting script")
+        sys.exit("* Cannot establish CID session, exiting script")
+    ingest_data = utils.read_yaml(INGEST_CONFIG)
+    sess = adlib.create_session()
+    autoingest_list = get_autoingest_list(ingest_data)
+
+    while True:
+        if not utils.check_control("black_pearl") or not utils.check_control(
+            "pause_scripts"
+        ):
+            sys.exit("Script run prevented by downtime_control.json. Script exiting.")
+        job = bp_job_queue.claim_job()
+        if job is None:
+            time.sleep(poll_seconds)
+            continue
+
+        job_id = job[0]
+        logger.info("Job %s claimed from job queue", job_id)
+        found = find_job_folder(job_id, autoingest_list)
+        if found is None:
+            logger.info("No folder found yet for job %s, releasing to queue", job_id)
+            bp_job_queue.release_job(job_id)
+            continue
+        autoingest, folder = found
+        if not utils.check_storage(autoingest):
+            bp_job_queue.release_job(job_id)
+            continue
+        # Concatenated folders hold other jobs, claim those too
+        others = [other for other in folder_job_ids(folder) if other != job_id]
+        claimed = [job_id]
+        for other in others:
+            if not bp_job_queue.claim_job_id(other):
+                break
+            claimed.append(other)
+        if len(claimed) <= len(others):
+            logger.info("Folder %s claimed by another process, releasing", folder)
+            for claimed_id in claimed:
+                bp_job_queue.release_job(claimed_id)
+            continue
 
+        bucket, bucket_list = get_autoingest_buckets(autoingest)
+        try:
+            success = process_folder(autoingest, folder, bucket, bucket_list, sess)
+        except Exception as err:
+            logger.exception("Processing of job %s failed: %s", job_id, err)
+            for claimed_id in claimed:
+                bp_job_queue.complete_job(claimed_id, "failed")
+            continue
+        for claimed_id in claimed:
+            if isinstance(success, str) and "Job complete" in success:
+                bp_job_queue.complete_job(claimed_id)
             else:
-                fpath = os.path.join(autoingest, folder)
+                # Tape persistence not confirmed, or files left in
+                # pending_ folder, retry job after delay
                 logger.info(
-                    "Folder found that is not ingest or errored folder. Checking if JSON exists for %s.",
-                    folder,
+                    "Job %s not complete, releasing to queue: %s", claimed_id, success
                 )
-                json_file = retrieve_json_data(folder)
-                if not json_file:
-                    logger.info("No matching JSON found for folder.")
-                    continue
-
-                logger.info("Matching JSON found for BP Job ID: %s", folder)
-                # Check in JSON for failed BP job object
-                failed_files = json_check(json_file)
-                if failed_files:
-                    for ffile in failed_files:
-                        for key, value in ffile.items():
-                            if key == "Name":
-                                logger.info(
-                                    "FAILED: Moving back into Black Pearl ingest folder:\n%s",
-                                    value,
+                bp_job_queue.release_job(claimed_id)
+
+
+def process_folder(
+    autoingest: str,
+    folder: str,
+    bucket: str,
+    bucket_list: list[str],
+    sess: requests.Session,
+) -> Optional[str | list[str]]:
+    """
+    Check JSON for job folder, return failed objects to
+    black_pearl_ingest, then process files and tidy folder
+    Returns process_files outcome, or None if not processed
+    """
+    logger.info("======== START Black Pearl validate/CID Media record START ========")
+    logger.info(
+        "Folder found that is not an ingest folder, or has failed or errored files within: %s",
+        folder,
+    )
+    json_file = success = ""
+
+    failed_folder = None
+    if folder.startswith("pending_"):
+        fpath = os.path.join(autoingest, folder)
+        logger.info(
+            "Failed folder found, will pass on for repeat processing. No JSON needed: %s",
+            folder,
+        )
+        failed_folder = folder.split("_")[-1]
+
+    elif len(folder) == 73:
+        logger.info("Concatenated job IDs! %s", folder)
+
+        folders = folder.split("_")
+        if not len(folders) == 2:
+            return None
+        if len(folders[0]) != 36 or len(folders[1]) != 36:
+            return None
+
+        # Iterate through JOB IDs
+        for fld in folders:
+            fpath = os.path.join(autoingest, fld)
+            json_file = retrieve_json_data(fld)
+            if not json_file:
+                logger.info("No matching JSON found for folder.")
+                continue
+
+            logger.info("Matching JSON found for BP Job ID: %s", fld)
+            # Check in JSON for failed BP job object
+            failed_files = json_check(json_file)
+            if failed_files:
+                for ffile in failed_files:
+                    for key, value in ffile.items():
+                        if key == "Name":
+                            logger.info(
+                                "FAILED: Moving back into Black Pearl ingest folder:\n%s",
+                                value,
+                            )
+                            print(
+                                f"shutil.move({os.path.join(fpath, value)}, {os.path.join(autoingest, value)})"
+                            )
+                            try:
+                                shutil.move(
+                                    os.path.join(fpath, value),
+                                    os.path.join(autoingest, value),
                                 )
-                                print(
-                                    f"shutil.move({os.path.join(fpath, value)}, {os.path.join(autoingest, value)})"
+                            except Exception as exc:
+                                print(exc)
+                                logger.warning(
+                                    "Failed ingest file %s couldn't be moved out of path: %s",
+                                    value,
+                                    fpath,
                                 )
-                                try:
-                                    shutil.move(
-                                        os.path.join(fpath, value),
-                                        os.path.join(autoingest, value),
-                                    )
-                                except Exception as exc:
-                                    print(exc)
-                                    logger.warning(
-                                        "Failed ingest file %s couldn't be moved out of path: %s",
-                                        value,
-                                        fpath,
-                                    )
-                                    pass
-                else:
-                    logger.info("No files failed transfer to BP data tape")
-
-            success = process_files(autoingest, folder, bucket, bucket_list, sess)
-            if not success:
-                continue
+                                pass
+            else:
+                logger.info("No files failed transfer to BP data tape")
 
-            if "Job complete" in success:
-                logger.info(
-                    "All files in %s have completed processing successfully", folder
-                )
-                # Check job folder is empty, if so delete else leave and prepend 'error_'
-                if len(os.listdir(fpath)) == 0:
-                    logger.info(
-                        "All files moved to completed. Deleting empty job folder: %s.",
-                        folder,
-                    )
-                    os.rmdir(fpath)
-                else:
-                    logger.warning(
-                        "Folder %s is not empty as expected. Adding 'error_{}' to folder and leaving.",
-                        folder,
-                    )
-                    if folder.startswith("failed_"):
-                        efolder = f"error_{failed_folder}"
-                    else:
-                        efolder = f"error_{folder}"
-                    try:
-                        os.rename(
-                            os.path.join(autoingest, folder),
-                            os.path.join(autoingest, efolder),
+    else:
+        fpath = os.path.join(autoingest, folder)
+        logger.info(
+            "Folder found that is not ingest or errored folder. Checking if JSON exists for %s.",
+            folder,
+        )
+        json_file = retrieve_json_data(folder)
+        if not json_file:
+            logger.info("No matching JSON found for folder.")
+            return None
+
+        logger.info("Matching JSON found for BP Job ID: %s", folder)
+        # Check in JSON for failed BP job object
+        failed_files = json_check(json_file)
+        if failed_files:
+            for ffile in failed_files:
+                for key, value in ffile.items():
+                    if key == "Name":
+                        logger.info(
+                            "FAILED: Moving back into Black Pearl ingest folder:\n%s",
+                            value,
                         )
-                    except Exception:
-                        logger.warning(
-                            "Unable to rename folder %s to %s - please handle this manually.",
-                            folder,
-                            efolder,
+                        print(
+                            f"shutil.move({os.path.join(fpath, value)}, {os.path.join(autoingest, value)})"
                         )
+                        try:
+                            shutil.move(
+                                os.path.join(fpath, value),
+                                os.path.join(autoingest, value),
+                            )
+                        except Exception as exc:
+                            print(exc)
+                            logger.warning(
+                                "Failed ingest file %s couldn't be moved out of path: %s",
+                                value,
+                                fpath,
+                            )
+                            pass
+        else:
+            logger.info("No files failed transfer to BP data tape")
 
-            elif "Not complete" in success:
+    success = process_files(autoingest, folder, bucket, bucket_list, sess)
+    if not success:
+        return None
+
+    if "Job complete" in success:
+        logger.info("All files in %s have completed processing successfully", folder)
+        # Check job folder is empty, if so delete else leave and prepend 'error_'
+        if len(os.listdir(fpath)) == 0:
+            logger.info(
+                "All files moved to completed. Deleting empty job folder: %s.",
+                folder,
+            )
+            os.rmdir(fpath)
+        else:
+            logger.warning(
+                "Folder %s is not empty as expected. Adding 'error_{}' to folder and leaving.",
+                folder,
+            )
+            if folder.startswith("failed_"):
+                efolder = f"error_{failed_folder}"
+            else:
+                efolder = f"error_{folder}"
+            try:
+                os.rename(
+                    os.path.join(autoingest, folder),
+                    os.path.join(autoingest, efolder),
+                )
+            except Exception:
                 logger.warning(
-                    "BP tape confirmation not yet complete. Leaving until next pass: %s",
+                    "Unable to rename folder %s to %s - please handle this manually.",
                     folder,
+                    efolder,
                 )
-                continue
 
+    elif "Not complete" in success:
+        logger.warning(
+            "BP tape confirmation not yet complete. Leaving until next pass: %s",
+            folder,
+        )
+        return success
+
+    else:
+        if len(success) > 0:
+            # Where CID records not made, files in this list left in job folder and folder renamed
+            logger.warning(
+                "List of files returned that didn't get CID media records: %s.",
+                success,
+            )
+            logger.warning("Leaving in job folder. Prepending folder with 'pending_{}.")
+            if folder.startswith("pending_"):
+                ffolder = f"pending_{failed_folder}"
             else:
-                if len(success) > 0:
-                    # Where CID records not made, files in this list left in job folder and folder renamed
-                    logger.warning(
-                        "List of files returned that didn't get CID media records: %s.",
-                        success,
-                    )
-                    logger.warning(
-                        "Leaving in job folder. Prepending folder with 'pending_{}."
-                    )
-                    if folder.startswith("pending_"):
-                        ffolder = f"pending_{failed_folder}"
-                    else:
-                        ffolder = f"pending_{folder}"
-                    try:
-                        os.rename(
-                            os.path.join(autoingest, folder),
-                            os.path.join(autoingest, ffolder),
-                        )
-                    except Exception:
-                        logger.warning(
-                            "Unable to rename folder %s to %s - please handle this manually",
-                            folder,
-                            ffolder,
-                        )
+                ffolder = f"pending_{folder}"
+            try:
+                os.rename(
+                    os.path.join(autoingest, folder),
+                    os.path.join(autoingest, ffolder),
+                )
+            except Exception:
+                logger.warning(
+                    "Unable to rename folder %s to %s - please handle this manually",
+                    folder,
+                    ffolder,
+                )
 
-            # Moving JSON to completed folder
-            if json_file:
-                logger.info("Moving JSON file to completed folder: %s", json_file)
-                pth, jsn = os.path.split(json_file)
-                move_path = os.path.join(pth, "completed", jsn)
-                try:
-                    shutil.move(json_file, move_path)
-                except Exception:
-                    logger.warning(
-                        "JSON file failed to move to completed folder: %s.", json_file
-                    )
+    # Moving JSON to completed folder
+    if json_file:
+        logger.info("Moving JSON file to completed folder: %s", json_file)
+        pth, jsn = os.path.split(json_file)
+        move_path = os.path.join(pth, "completed", jsn)
+        try:
+            shutil.move(json_file, move_path)
+        except Exception:
+            logger.warning(
+                "JSON file failed to move to completed folder: %s.", json_file
+            )
+
+    return success
 
-    logger.info("======== END Black Pearl validate/CID media record END ========")
+
+def probe_file(
+    autoingest: str, job_id: str, file: str, bucket: str, bucket_list: list[str]
+) -> dict[str, Any]:
+    """
+    Collect local metadata, BP confirmation and local MD5
+    for one file. Read only, so safe to run in worker pool
+    """
+    fpath = os.path.join(autoingest, job_id, file)
+    logger.info("*** %s - processing file", fpath)
+    byte_size = utils.get_size(fpath)
+    object_number = utils.get_object_number(file)
+    duration = utils.get_duration(fpath)
+    duration_ms = utils.get_ms(fpath)
+    if duration or duration_ms:
+        logger.info("Duration: %s MS: %s", duration, duration_ms)
+
+    # Handle string returns - back up to CSV
+    if not duration:
+        duration = ""
+    elif "N/A" in str(duration):
+        duration = ""
+    if not duration_ms:
+        duration_ms = ""
+    elif "N/A" in str(duration_ms):
+        duration_ms = ""
+    if not byte_size:
+        byte_size = ""
+    print(file, object_number, duration, byte_size, duration_ms)
+
+    confirmed, remote_md5, length = bp.get_confirmation_length_md5(
+        file, bucket, bucket_list
+    )
+    local_md5 = get_md5(file) if confirmed is True else None
+
+    return {
+        "file": file,
+        "fpath": fpath,
+        "byte_size": byte_size,
+        "object_number": object_number,
+        "duration": duration,
+        "confirmed": confirmed,
+        "remote_md5": remote_md5,
+        "length": length,
+        "local_md5": local_md5,
+    }
 
 
 def process_files(
@@ -464,20 +665,27 @@ def process_files(
     bucket: str,
     bucket_list: list[str],
     session: requests.Session,
+    max_workers: Optional[int] = None,
 ) -> str | list[str]:
     """
     Receive ingest fpath then JSON has confirmed files ingested to tape
     and this function handles CID media record check/creation and move
+    File probing/BP checks and media record creation run across
+    max_workers threads, moves and logging stay serial in file order
     """
+    if max_workers is None:
+        max_workers = MAX_WORKERS
     wpath = ""
     for key, val in LOG_PATHS.items():
         if key in autoingest:
             wpath = val
 
     folderpath = os.path.join(autoingest, job_id)
-    file_list = [
-        x for x in os.listdir(folderpath) if os.path.isfile(os.path.join(folderpath, x))
-    ]
+    file_list = sorted(
+        x.strip()
+        for x in os.listdir(folderpath)
+        if os.path.isfile(os.path.join(folderpath, x))
+    )
     logger.info("%s files found in folderpath %s", len(file_list), folderpath)
     logger.info(
         "Preservation bucket: %s Buckets in use for validation checks: %s",
@@ -485,41 +693,34 @@ def process_files(
         ", ".join(bucket_list),
     )
 
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        probes = list(
+            executor.map(
+                lambda f: probe_file(autoingest, job_id, f, bucket, bucket_list),
+                file_list,
+            )
+        )
+
     check_list = []
-    adjusted_list = file_list
-    for file in file_list:
-        file = file.strip()
-        fpath = os.path.join(autoingest, job_id, file)
-        logger.info("*** %s - processing file", fpath)
-        byte_size = utils.get_size(fpath)
-        object_number = utils.get_object_number(file)
-        duration = utils.get_duration(fpath)
-        duration_ms = utils.get_ms(fpath)
-        if duration or duration_ms:
-            logger.info("Duration: %s MS: %s", duration, duration_ms)
-
-        # Handle string returns - back up to CSV
-        if not duration:
-            duration = ""
-        elif "N/A" in str(duration):
-            duration = ""
-        if not duration_ms:
-            duration_ms = ""
-        elif "N/A" in str(duration_ms):
-            duration_ms = ""
-        if not byte_size:
-            byte_size = ""
-        print(file, object_number, duration, byte_size, duration_ms)
+    adjusted_list = list(file_list)
+    to_create = []
+    awaiting_tape = []
+    for probe in probes:
+        file = probe["file"]
+        fpath = probe["fpath"]
+        byte_size = probe["byte_size"]
+        confirmed = probe["confirmed"]
+        remote_md5 = probe["remote_md5"]
+        length = probe["length"]
 
         # Run series of BP checks here - any failures no CID media record made
-        confirmed, remote_md5, length = bp.get_confirmation_length_md5(
-            file, bucket, bucket_list
-        )
         if confirmed is None:
             logger.warning("Problem retrieving Black Pearl TapeList. Skipping")
+            awaiting_tape.append(file)
             continue
         elif confirmed is False:
             logger.warning("Assigned to storage domain is FALSE: %s", fpath)
+            awaiting_tape.append(file)
             persistence_log_message(
                 "BlackPearl has not persisted file to data tape but ObjectList exists",
                 fpath,
@@ -570,7 +771,7 @@ def process_files(
                 )
             continue
 
-        local_md5 = get_md5(file)
+        local_md5 = probe["local_md5"]
         if not local_md5:
             logger.warning("No Local MD5 found: %s", fpath)
             continue
@@ -701,23 +902,19 @@ def process_files(
         # Create CID media record only if all BP checks pass and no CID Media record already exists
         if not md5_match:
             continue
-        logger.info("No Media record found for file: %s", file)
-        logger.info(
-            "Creating media record and linking via object_number: %s", object_number
-        )
-        logger.info(
-            "** Attempting creation of media record for %s, %s, %s, %s, %s",
-            file,
-            object_number,
-            duration,
-            byte_size,
-            bucket,
-        )
-        media_priref = create_media_record(
-            object_number, duration, byte_size, file, bucket, session
+        to_create.append((probe, move_path))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        media_prirefs = list(
+            executor.map(
+                lambda item: make_media_record(item[0], bucket, session), to_create
+            )
         )
-        logger.info("Media priref created: %s", media_priref)
 
+    for (probe, move_path), media_priref in zip(to_create, media_prirefs):
+        file = probe["file"]
+        fpath = probe["fpath"]
+        logger.info("Media priref created for %s: %s", file, media_priref)
         if media_priref:
             check_list.append(file)
             # Move file to transcode folder
@@ -747,9 +944,41 @@ def process_files(
         return f"Job complete {job_id}"
     # For mismatched lists, some failed to create CID records return filenames
     set_diff = set(adjusted_list) - set(check_list)
+    if set_diff <= set(awaiting_tape):
+        # Only waiting on tape persistence, leave folder for next pass
+        return f"Not complete {job_id}"
     return list(set_diff)
 
 
+def make_media_record(
+    probe: dict[str, Any], bucket: str, session: requests.Session
+) -> Optional[str]:
+    """
+    Create CID media record from probed file data
+    """
+    logger.info("No Media record found for file: %s", probe["file"])
+    logger.info(
+        "Creating media record and linking via object_number: %s",
+        probe["object_number"],
+    )
+    logger.info(
+        "** Attempting creation of media record for %s, %s, %s, %s, %s",
+        probe["file"],
+        probe["object_number"],
+        probe["duration"],
+        probe["byte_size"],
+        bucket,
+    )
+    return create_media_record(
+        probe["object_number"],
+        probe["duration"],
+        probe["byte_size"],
+        probe["file"],
+        bucket,
+        session,
+    )
+
+
 def persistence_log_message(message: str, path: str, wpath: str, file: str) -> None:
     """
     Output confirmation to persistence_queue.csv
@@ -845,4 +1074,7 @@ def create_media_record(
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        worker()
+    else:
+        main()
@@ -0,0 +1,204 @@
+"""
+Durable Black Pearl job-completion queue
+
+SQLite table shared by the flask_server notification
+handler (appends jobs) and black_pearl_validate_make_record
+worker (claims jobs and processes the matching folder).
+Uses the default rollback journal as the database sits
+on shared Logs storage accessed from more than one host.
+
+2026
+"""
+
+import os
+import socket
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Optional
+
+QUEUE_DB = os.path.join(os.environ["LOG_PATH"], "black_pearl", "job_queue.db")
+# Claimed jobs not completed/released within this time are re-offered
+LEASE_MINUTES = 60
+# Released jobs are retried until claimed this many times
+MAX_ATTEMPTS = 144
+TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS JOBS (
+    job_id TEXT PRIMARY KEY,
+    notification TEXT,
+    received TEXT,
+    status TEXT,
+    worker TEXT,
+    claimed TEXT,
+    available TEXT,
+    attempts INTEGER DEFAULT 0
+)
+"""
+
+
+def _now() -> str:
+    """
+    Return now formatted for SQLite comparison
+    """
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def connect(db_path: str = QUEUE_DB) -> sqlite3.Connection:
+    """
+    Open queue database, creating table if needed
+    """
+    conn = sqlite3.connect(db_path, timeout=TIMEOUT, isolation_level=None)
+    conn.execute(SCHEMA)
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON JOBS (status, available)")
+    return conn
+
+
+def append_job(job_id: str, notification: str, db_path: str = QUEUE_DB) -> None:
+    """
+    Add job completion notification to queue
+    Repeat notifications for a job re-queue it,
+    unless a worker currently holds the claim
+    """
+    conn = connect(db_path)
+    try:
+        conn.execute(
+            """INSERT INTO JOBS (job_id, notification, received, status, available)
+            VALUES (?, ?, ?, 'queued', ?)
+            ON CONFLICT(job_id) DO UPDATE SET notification=excluded.notification,
+            received=excluded.received, status='queued', available=excluded.available
+            WHERE JOBS.status != 'claimed'""",
+            (job_id, notification, _now(), _now()),
+        )
+    finally:
+        conn.close()
+
+
+def claim_job(
+    worker: Optional[str] = None, db_path: str = QUEUE_DB
+) -> Optional[tuple[str, str]]:
+    """
+    Atomically claim oldest available job, including
+    claimed jobs whose lease has expired
+    Returns job_id and notification JSON string
+    """
+    if worker is None:
+        worker = f"{socket.gethostname()}_{os.getpid()}"
+    expired = (datetime.now() - timedelta(minutes=LEASE_MINUTES)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            """SELECT job_id, notification FROM JOBS
+            WHERE (status='queued' AND available<=?)
+            OR (status='claimed' AND claimed<=?)
+            ORDER BY received LIMIT 1""",
+            (_now(), expired),
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            """UPDATE JOBS SET status='claimed', worker=?, claimed=?,
+            attempts=attempts+1 WHERE job_id=?""",
+            (worker, _now(), row[0]),
+        )
+        conn.execute("COMMIT")
+        return row[0], row[1]
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def claim_job_id(
+    job_id: str, worker: Optional[str] = None, db_path: str = QUEUE_DB
+) -> bool:
+    """
+    Atomically claim job_id, adding it if no
+    notification was queued for it. Returns False
+    if another worker holds an unexpired lease
+    """
+    if worker is None:
+        worker = f"{socket.gethostname()}_{os.getpid()}"
+    expired = (datetime.now() - timedelta(minutes=LEASE_MINUTES)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT 1 FROM JOBS WHERE job_id=? AND status='claimed' AND claimed>?",
+            (job_id, expired),
+        ).fetchone()
+        if row is not None:
+            conn.execute("COMMIT")
+            return False
+        conn.execute(
+            """INSERT INTO JOBS (job_id, received, status, worker, claimed,
+            available, attempts) VALUES (?, ?, 'claimed', ?, ?, ?, 1)
+            ON CONFLICT(job_id) DO UPDATE SET status='claimed',
+            worker=excluded.worker, claimed=excluded.claimed,
+            attempts=JOBS.attempts+1""",
+            (job_id, _now(), worker, _now(), _now()),
+        )
+        conn.execute("COMMIT")
+        return True
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def complete_job(job_id: str, status: str = "done", db_path: str = QUEUE_DB) -> None:
+    """
+    Mark claimed job finished (done/failed)
+    """
+    conn = connect(db_path)
+    try:
+        conn.execute("UPDATE JOBS SET status=? WHERE job_id=?", (status, job_id))
+    finally:
+        conn.close()
+
+
+def release_job(job_id: str, delay_minutes: int = 10, db_path: str = QUEUE_DB) -> None:
+    """
+    Return claimed job to queue, available
+    again after delay_minutes. Jobs claimed
+    MAX_ATTEMPTS times are marked failed
+    """
+    available = (datetime.now() + timedelta(minutes=delay_minutes)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    conn = connect(db_path)
+    try:
+        conn.execute(
+            """UPDATE JOBS SET available=?,
+            status=CASE WHEN attempts>=? THEN 'failed' ELSE 'queued' END
+            WHERE job_id=?""",
+            (available, MAX_ATTEMPTS, job_id),
+        )
+    finally:
+        conn.close()
+
+
+def get_claimed_jobs(db_path: str = QUEUE_DB) -> set[str]:
+    """
+    Return job_ids currently claimed by a worker
+    with unexpired lease
+    """
+    expired = (datetime.now() - timedelta(minutes=LEASE_MINUTES)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT job_id FROM JOBS WHERE status='claimed' AND claimed>?", (expired,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return {row[0] for row in rows}
@@ -5,9 +5,13 @@ to one utility module
 2024
 """
 
+import base64
+import hashlib
 import json
 import os
-from typing import Optional, Union, List, Dict, Any
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from ds3 import ds3, ds3Helpers
 
@@ -16,6 +20,15 @@ HELPER = ds3Helpers.Helper(client=CLIENT)
 DPI_BUCKETS = os.environ["DPI_BUCKET"]
 JSON_END = os.environ["JSON_END_POINT"]
 
+# PUT settings, override per host in dpi_ingest.yaml 'Put_options'
+PUT_DEFAULTS: Dict[str, Any] = {
+    "max_threads": 3,
+    "objects_per_bp_job": 5000,
+    "blob_size": None,
+    "retries": 3,
+    "retry_delay": 60,
+}
+
 
 def get_buckets(bucket_collection: str) -> tuple[str, list[str]]:
     """
@@ -241,25 +254,207 @@ def get_object_list_items(fname: str) -> Optional[List[Dict[str, Any]]]:
     return obj_list
 
 
-def put_directory(directory_pth: str, bucket: str) -> Optional[list[str]]:
+def get_put_options(put_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Merge supplied PUT options over defaults
+    """
+    options = dict(PUT_DEFAULTS)
+    if put_options:
+        options.update({k: v for k, v in put_options.items() if k in PUT_DEFAULTS})
+    return options
+
+
+def _report(log: Optional[Callable[[str], None]], message: str) -> None:
+    """
+    Send structured progress line to supplied
+    log callable, or print if none given
+    """
+    if log is None:
+        print(message)
+    else:
+        log(message)
+
+
+def _put_blob(
+    bucket: str,
+    job_id: str,
+    blob: Dict[str, Any],
+    fpath: str,
+    options: Dict[str, Any],
+    calculate_checksum: bool,
+) -> tuple[int, float]:
+    """
+    PUT one blob from file offset with retries
+    Returns bytes sent and seconds taken
+    """
+    offset = int(blob["Offset"])
+    length = int(blob["Length"])
+    headers = None
+    if calculate_checksum:
+        hash_md5 = hashlib.md5()
+        with open(fpath, "rb") as data:
+            data.seek(offset, 0)
+            remaining = length
+            while remaining > 0:
+                chunk = data.read(min(65536, remaining))
+                if not chunk:
+                    break
+                hash_md5.update(chunk)
+                remaining -= len(chunk)
+        headers = {"Content-MD5": base64.b64encode(hash_md5.digest()).decode("utf-8")}
+
+    attempt = 0
+    while True:
+        start = time.monotonic()
+        try:
+            with open(fpath, "rb") as stream:
+                stream.seek(offset, 0)
+                CLIENT.put_object(
+                    ds3.PutObjectRequest(
+                        bucket,
+                        blob["Name"],
+                        length,
+                        stream,
+                        offset=offset,
+                        job=job_id,
+                        headers=headers,
+                    )
+                )
+            return length, time.monotonic() - start
+        except Exception as err:
+            attempt += 1
+            if attempt > int(options["retries"]):
+                raise
+            print(f"PUT retry {attempt} for {blob['Name']} offset {offset}: {err}")
+            time.sleep(int(options["retry_delay"]))
+
+
+def put_objects_with_progress(
+    put_objects: list[ds3Helpers.HelperPutObject],
+    bucket: str,
+    put_options: Optional[Dict[str, Any]] = None,
+    calculate_checksum: bool = False,
+    log: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Bulk PUT objects as one BP job, sending blobs
+    with max_threads workers as chunks become ready.
+    Emits structured lines per blob, per object
+    and per job: bytes sent, seconds and MB/s
     """
-    Add the directory to black pearl using helper (no MD5)
+    options = get_put_options(put_options)
+    file_paths = {obj.object_name: obj.file_path for obj in put_objects}
+    ds3_objects = [ds3.Ds3PutObject(obj.object_name, obj.size) for obj in put_objects]
+    if options["blob_size"]:
+        request = ds3.PutBulkJobSpectraS3Request(
+            bucket, ds3_objects, max_upload_size=int(options["blob_size"])
+        )
+    else:
+        request = ds3.PutBulkJobSpectraS3Request(bucket, ds3_objects)
+    bulk_put = CLIENT.put_bulk_job_spectra_s3(request)
+    job_id = bulk_put.result["JobId"]
+    chunk_ids = {chunk["ChunkId"] for chunk in bulk_put.result["ObjectsList"]}
+    _report(
+        log,
+        f"PUT_JOB_START\tjob={job_id}\tobjects={len(put_objects)}\tthreads={options['max_threads']}\tblob_size={options['blob_size']}",
+    )
+
+    job_start = time.monotonic()
+    job_bytes = 0
+    object_stats: Dict[str, list[float]] = {}
+    with ThreadPoolExecutor(max_workers=int(options["max_threads"])) as executor:
+        while chunk_ids:
+            ready = CLIENT.get_job_chunks_ready_for_client_processing_spectra_s3(
+                ds3.GetJobChunksReadyForClientProcessingSpectraS3Request(job_id)
+            )
+            chunks = ready.result["ObjectsList"]
+            if not chunks:
+                time.sleep(ready.retryAfter)
+                continue
+            futures = []
+            for chunk in chunks:
+                if chunk["ChunkId"] not in chunk_ids:
+                    continue
+                chunk_ids.remove(chunk["ChunkId"])
+                for blob in chunk["ObjectList"]:
+                    if blob.get("InCache") == "true":
+                        continue
+                    futures.append(
+                        (
+                            blob,
+                            executor.submit(
+                                _put_blob,
+                                bucket,
+                                job_id,
+                                blob,
+                                file_paths[blob["Name"]],
+                                options,
+                                calculate_checksum,
+                            ),
+                        )
+                    )
+            for blob, future in futures:
+                sent, seconds = future.result()
+                job_bytes += sent
+                stats = object_stats.setdefault(blob["Name"], [0, 0.0])
+                stats[0] += sent
+                stats[1] += seconds
+                _report(
+                    log,
+                    f"PUT_BLOB\tjob={job_id}\tobject={blob['Name']}\toffset={blob['Offset']}\tbytes={sent}\tseconds={seconds:.2f}\tMBps={sent / 1048576 / max(seconds, 0.001):.2f}",
+                )
+
+    for name, (sent, seconds) in object_stats.items():
+        _report(
+            log,
+            f"PUT_OBJECT\tjob={job_id}\tobject={name}\tbytes={int(sent)}\tseconds={seconds:.2f}\tMBps={sent / 1048576 / max(seconds, 0.001):.2f}",
+        )
+    elapsed = time.monotonic() - job_start
+    _report(
+        log,
+        f"PUT_JOB_END\tjob={job_id}\tbytes={job_bytes}\tseconds={elapsed:.2f}\tMBps={job_bytes / 1048576 / max(elapsed, 0.001):.2f}",
+    )
+
+    return job_id
+
+
+def put_directory(
+    directory_pth: str,
+    bucket: str,
+    put_options: Optional[Dict[str, Any]] = None,
+    log: Optional[Callable[[str], None]] = None,
+) -> Optional[list[str]]:
+    """
+    Add the directory to black pearl (no MD5) split into
+    jobs of objects_per_bp_job, reporting throughput
     Retrieve job number and launch json notification
     """
+    options = get_put_options(put_options)
+    put_objects: list[ds3Helpers.HelperPutObject] = []
+    for root, _, files in os.walk(directory_pth):
+        for file in sorted(files):
+            fpath = os.path.join(root, file)
+            object_name = os.path.relpath(fpath, directory_pth).replace(os.sep, "/")
+            put_objects.append(
+                ds3Helpers.HelperPutObject(
+                    object_name=object_name,
+                    file_path=fpath,
+                    size=os.path.getsize(fpath),
+                )
+            )
+
+    job_list: list[str] = []
+    per_job = int(options["objects_per_bp_job"])
     try:
-        put_job_ids: list[str] = HELPER.put_all_objects_in_directory(
-            source_dir=directory_pth,
-            bucket=bucket,
-            objects_per_bp_job=5000,
-            max_threads=3,
-        )
+        for num in range(0, len(put_objects), per_job):
+            job_id = put_objects_with_progress(
+                put_objects[num : num + per_job], bucket, options, log=log
+            )
+            job_list.append(job_id)
     except Exception as err:
         print("Exception: %s", err)
         return None
-    print(f"PUT COMPLETE - JOB ID retrieved: {put_job_ids}")
-    job_list = []
-    for job_id in put_job_ids:
-        job_list.append(job_id)
+    print(f"PUT COMPLETE - JOB ID retrieved: {job_list}")
     return job_list
 
 
@@ -321,6 +516,676 @@ def download_blobbed_object(fname: str, outpath: str, bucket: str) -> str:
     return get_job_id
 
 
+class _HashingWriter:
+    """
+    Stream target for GetObjectRequest, writes
+    blob to file at its offset and hashes bytes
+    as they arrive. Whole-file digests are only
+    fed when the blob is next in sequence.
+    Hash only when stream is None
+    """
+
+    def __init__(self, stream, offset: int, digests: Optional[list] = None) -> None:
+        self.stream = stream
+        if self.stream is not None:
+            self.stream.seek(offset, 0)
+        self.blob_md5 = hashlib.md5()
+        self.digests = digests or []
+        self.length = 0
+
+    def write(self, data: bytes) -> int:
+        if self.stream is not None:
+            self.stream.write(data)
+        self.blob_md5.update(data)
+        for digest in self.digests:
+            digest.update(data)
+        self.length += len(data)
+        return len(data)
+
+
+def _hash_range(stream, offset: int, length: int, digests: list) -> None:
+    """
+    Read back a range already written to disk
+    and feed it to the whole-file digests
+    """
+    stream.flush()
+    with open(stream.name, "rb") as data:
+        data.seek(offset, 0)
+        remaining = length
+        while remaining > 0:
+            chunk = data.read(min(65536, remaining))
+            if not chunk:
+                raise Exception(f"Short read hashing {stream.name} at offset {offset}")
+            for digest in digests:
+                digest.update(chunk)
+            remaining -= len(chunk)
+
+
+def _get_blob(
+    bucket: str,
+    name: str,
+    job_id: str,
+    blob: Dict[str, Any],
+    state: Dict[str, Any],
+    retries: int,
+) -> None:
+    """
+    GET one blob into its object's file, feeding
+    whole-file digests when the blob is next in
+    sequence, else queueing it for reassembly
+    """
+    offset = int(blob["Offset"])
+    length = int(blob["Length"])
+    attempt = 0
+    while True:
+        # Hash copies so a failed attempt leaves digests untouched
+        live = (
+            [digest.copy() for digest in state["digests"]]
+            if offset == state["next_offset"]
+            else []
+        )
+        writer = _HashingWriter(state["stream"], offset, live)
+        try:
+            CLIENT.get_object(
+                ds3.GetObjectRequest(bucket, name, writer, job=job_id, offset=offset)
+            )
+            if writer.length != length:
+                raise Exception(f"received {writer.length} of {length} bytes")
+            break
+        except Exception as err:
+            attempt += 1
+            if attempt > retries:
+                raise
+            print(f"GET retry {attempt} for {name} offset {offset}: {err}")
+            time.sleep(10)
+
+    state["blobs"][offset] = writer.blob_md5.hexdigest()
+    state["lengths"][offset] = length
+    if live:
+        state["digests"] = live
+        state["next_offset"] += length
+    else:
+        state["pending"][offset] = length
+    _reassemble(state)
+    if state["sidecar"]:
+        # Blob on disk before it's recorded as received
+        state["stream"].flush()
+        os.fsync(state["stream"].fileno())
+        _write_sidecar(state)
+
+
+def _reassemble(state: Dict[str, Any]) -> None:
+    """
+    Feed whole-file digests any received
+    blobs now contiguous with next_offset
+    """
+    while state["next_offset"] in state["pending"]:
+        gap_length = state["pending"].pop(state["next_offset"])
+        _hash_range(state["stream"], state["next_offset"], gap_length, state["digests"])
+        state["next_offset"] += gap_length
+
+
+def _write_sidecar(state: Dict[str, Any]) -> None:
+    """
+    Record object size and received blob
+    lengths/MD5s for a .part download
+    """
+    data = {
+        "size": state["size"],
+        "blobs": {
+            str(offset): [state["lengths"][offset], md5]
+            for offset, md5 in state["blobs"].items()
+        },
+    }
+    tmp = f"{state['sidecar']}.tmp"
+    with open(tmp, "w") as sidecar:
+        json.dump(data, sidecar)
+    os.replace(tmp, state["sidecar"])
+
+
+def _read_sidecar(part_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Load sidecar for a .part download, if
+    both exist and are readable
+    """
+    sidecar = f"{part_path}.json"
+    if not os.path.isfile(part_path) or not os.path.isfile(sidecar):
+        return None
+    try:
+        with open(sidecar) as data:
+            record = json.load(data)
+        return {
+            "size": int(record["size"]),
+            "blobs": {int(key): value for key, value in record["blobs"].items()},
+        }
+    except (ValueError, KeyError, TypeError) as err:
+        print(f"Ignoring unreadable sidecar {sidecar}: {err}")
+        return None
+
+
+def _missing_ranges(size: int, received: Dict[int, list]) -> List[tuple]:
+    """
+    Return (offset, length) of ranges
+    not yet received, up to size
+    """
+    missing = []
+    position = 0
+    for offset in sorted(received):
+        if offset > position:
+            missing.append((position, offset - position))
+        position = max(position, offset + int(received[offset][0]))
+    if position < size:
+        missing.append((position, size - position))
+    return missing
+
+
+def complete_part(part_path: str, file_path: str) -> None:
+    """
+    Rename a verified .part download into
+    place and remove its sidecar
+    """
+    os.rename(part_path, file_path)
+    if os.path.exists(f"{part_path}.json"):
+        os.remove(f"{part_path}.json")
+
+
+def discard_part(part_path: str) -> None:
+    """
+    Remove a .part download and its sidecar
+    so the next attempt starts afresh
+    """
+    for path in (part_path, f"{part_path}.json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def download_objects_md5(
+    file_paths: Dict[str, str],
+    bucket: str,
+    second_digest: Optional[str] = None,
+    retries: int = 3,
+    log: Optional[Callable[[str], None]] = None,
+    on_object: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    resume: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Download BP objects as one bulk GET job, blob by
+    blob, calculating the MD5 (and optional second
+    hashlib digest, eg 'sha256') while bytes are written
+    so no re-read of restored files is needed. Blobs
+    arriving out of order are hashed per blob, and read
+    back into the whole-file digest once the gap is filled.
+    file_paths maps object name to destination path.
+    on_object(name, result) is called as each object
+    completes, or fails, while the job continues.
+    With resume, objects are written to <path>.part
+    with a .part.json sidecar of received blobs, and
+    a rerun requests only the missing ranges. Caller
+    verifies then calls complete_part (or discard_part).
+    Returns dict per object name of job_id, path written,
+    md5, second digest, blob MD5s keyed by offset and
+    error (None if successful). Raises if the job can't
+    be created
+    """
+    if bucket == "":
+        bucket = "imagen"
+
+    # Resumed objects request only ranges missing from their .part file
+    resumed: Dict[str, Dict[str, Any]] = {}
+    get_objects = []
+    for name, file_path in file_paths.items():
+        sidecar = _read_sidecar(f"{file_path}.part") if resume else None
+        if sidecar is None:
+            get_objects.append(ds3.Ds3GetObject(name))
+            continue
+        resumed[name] = sidecar
+        for offset, length in _missing_ranges(sidecar["size"], sidecar["blobs"]):
+            get_objects.append(ds3.Ds3GetObject(name, length=length, offset=offset))
+        _report(
+            log,
+            f"GET_RESUME\tobject={name}\treceived_blobs={len(sidecar['blobs'])}\tsize={sidecar['size']}",
+        )
+
+    job_id: Optional[str] = None
+    chunk_ids: set = set()
+    blob_counts: Dict[str, int] = {}
+    sizes: Dict[str, int] = {}
+    if get_objects:
+        try:
+            bulk_get = CLIENT.get_bulk_job_spectra_s3(
+                ds3.GetBulkJobSpectraS3Request(bucket, get_objects)
+            )
+            job_id = bulk_get.result["JobId"]
+        except Exception as err:
+            raise Exception(
+                f"Unable to retrieve files {list(file_paths)} from Black Pearl: {err}"
+            )
+        print(f"BP get job ID: {job_id}")
+        chunk_ids = {chunk["ChunkId"] for chunk in bulk_get.result["ObjectsList"]}
+        for chunk in bulk_get.result["ObjectsList"]:
+            for blob in chunk["ObjectList"]:
+                name = blob["Name"]
+                blob_counts[name] = blob_counts.get(name, 0) + 1
+                sizes[name] = sizes.get(name, 0) + int(blob["Length"])
+
+    states: Dict[str, Dict[str, Any]] = {}
+    for name, file_path in file_paths.items():
+        digests = [hashlib.md5()]
+        if second_digest:
+            digests.append(hashlib.new(second_digest))
+        path = f"{file_path}.part" if resume else file_path
+        states[name] = {
+            "path": path,
+            "stream": open(path, "r+b" if name in resumed else "wb"),
+            "digests": digests,
+            "next_offset": 0,
+            "pending": {},
+            "blobs": {},
+            "lengths": {},
+            "expected": blob_counts.get(name, 0),
+            "size": sizes.get(name, 0),
+            "sidecar": f"{path}.json" if resume else None,
+            "error": None,
+        }
+        if name in resumed:
+            # Hash state can't be saved, so re-read blobs already on disk
+            state = states[name]
+            state["size"] = resumed[name]["size"]
+            for offset, (length, md5) in resumed[name]["blobs"].items():
+                state["blobs"][offset] = md5
+                state["lengths"][offset] = int(length)
+                state["pending"][offset] = int(length)
+            state["expected"] += len(state["blobs"])
+            try:
+                _reassemble(state)
+            except Exception as err:
+                state["error"] = f"Unable to resume {name}: {err}"
+        elif resume:
+            _write_sidecar(states[name])
+
+    start = time.monotonic()
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def finish(name: str) -> None:
+        """
+        Close object file, build result and hand
+        to on_object, once only per object
+        """
+        if name in results:
+            return
+        state = states[name]
+        state["stream"].close()
+        if state["pending"] and not state["error"]:
+            state["error"] = (
+                f"Unable to verify {name}: blobs at offsets {sorted(state['pending'])} not contiguous"
+            )
+        elapsed = time.monotonic() - start
+        _report(
+            log,
+            f"GET_OBJECT\tjob={job_id}\tobject={name}\tbytes={state['next_offset']}\tblobs={len(state['blobs'])}\tseconds={elapsed:.2f}\tMBps={state['next_offset'] / 1048576 / max(elapsed, 0.001):.2f}",
+        )
+        results[name] = {
+            "job_id": job_id,
+            "path": state["path"],
+            "md5": state["digests"][0].hexdigest(),
+            "second": state["digests"][1].hexdigest() if second_digest else None,
+            "blobs": state["blobs"],
+            "error": state["error"],
+        }
+        if on_object:
+            on_object(name, results[name])
+
+    try:
+        # Resumed objects with nothing left to fetch
+        for name, state in states.items():
+            if len(state["blobs"]) >= state["expected"] and name in resumed:
+                finish(name)
+        while chunk_ids:
+            ready = CLIENT.get_job_chunks_ready_for_client_processing_spectra_s3(
+                ds3.GetJobChunksReadyForClientProcessingSpectraS3Request(job_id)
+            )
+            chunks = ready.result["ObjectsList"]
+            if not chunks:
+                time.sleep(ready.retryAfter)
+                continue
+            for chunk in chunks:
+                if chunk["ChunkId"] not in chunk_ids:
+                    continue
+                chunk_ids.remove(chunk["ChunkId"])
+                for blob in chunk["ObjectList"]:
+                    name = blob["Name"]
+                    state = states[name]
+                    if state["error"]:
+                        continue
+                    try:
+                        _get_blob(bucket, name, job_id, blob, state, retries)
+                    except Exception as err:
+                        state["error"] = (
+                            f"Unable to retrieve file {name} from Black Pearl: {err}"
+                        )
+                        print(state["error"])
+                        finish(name)
+                        continue
+                    if len(state["blobs"]) >= state["expected"]:
+                        finish(name)
+    finally:
+        for name, state in states.items():
+            if name not in results and not state["error"]:
+                state["error"] = f"BP get job {job_id} ended before {name} completed"
+            finish(name)
+
+    return results
+
+
+def download_object_md5(
+    fname: str,
+    outpath: str,
+    bucket: str,
+    second_digest: Optional[str] = None,
+    retries: int = 3,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Download one BP object, hashing as it is written
+    (see download_objects_md5). Returns job_id, md5,
+    second digest and blob MD5s. Raises on failure
+    """
+    result = download_objects_md5(
+        {fname: os.path.join(outpath, fname)}, bucket, second_digest, retries, log
+    )[fname]
+    if result["error"]:
+        raise Exception(result["error"])
+    return result
+
+
+def plan_restore(objects: list[tuple[str, str]]) -> list[Dict[str, Any]]:
+    """
+    Look up physical placement of (name, bucket) pairs
+    and group them by bucket and first tape holding
+    them, ordering each group by position on that tape
+    (as listed by Get Blobs On Tape), falling back to
+    object name. Objects not found on tape (cache/pool
+    only) group under tape None. Returns groups in tape
+    barcode order: dicts of bucket, tape and object names
+    """
+    buckets: Dict[str, list[str]] = {}
+    for name, bucket in objects:
+        buckets.setdefault(bucket, []).append(name)
+
+    groups: Dict[tuple[str, Optional[str]], list[str]] = {}
+    tape_ids: Dict[str, str] = {}
+    for bucket, names in buckets.items():
+        placement: Dict[str, Optional[str]] = {}
+        try:
+            result = (
+                CLIENT.get_physical_placement_for_objects_with_full_details_spectra_s3(
+                    ds3.GetPhysicalPlacementForObjectsWithFullDetailsSpectraS3Request(
+                        bucket or "imagen", [ds3.Ds3GetObject(name) for name in names]
+                    )
+                )
+            )
+            for obj in result.result.get("ObjectList", []):
+                tapes = (obj.get("PhysicalPlacement") or {}).get("TapeList") or []
+                if tapes and obj.get("Name") not in placement:
+                    placement[obj["Name"]] = tapes[0].get("BarCode")
+                    if tapes[0].get("Id"):
+                        tape_ids[tapes[0].get("BarCode")] = tapes[0]["Id"]
+        except Exception as err:
+            print(f"Unable to retrieve physical placement for bucket {bucket}: {err}")
+        for name in dict.fromkeys(names):
+            groups.setdefault((bucket, placement.get(name)), []).append(name)
+
+    plan = [
+        {
+            "bucket": bucket,
+            "tape": tape,
+            "objects": _tape_order(names, tape_ids.get(tape) if tape else None),
+        }
+        for (bucket, tape), names in groups.items()
+    ]
+    return sorted(plan, key=lambda group: (group["tape"] or "", group["bucket"]))
+
+
+def _tape_order(names: list[str], tape_id: Optional[str]) -> list[str]:
+    """
+    Sort names by first blob position in the tape's blob
+    listing, by name where tape or object not listed
+    """
+    position: Dict[str, int] = {}
+    if tape_id:
+        try:
+            result = CLIENT.get_blobs_on_tape_spectra_s3(
+                ds3.GetBlobsOnTapeSpectraS3Request(tape_id)
+            )
+            for num, blob in enumerate(result.result.get("ObjectList", [])):
+                position.setdefault(blob.get("Name"), num)
+        except Exception as err:
+            print(f"Unable to list blobs on tape {tape_id}, ordering by name: {err}")
+    return sorted(names, key=lambda name: (position.get(name, len(position)), name))
+
+
+def restore_planned(
+    plan: list[Dict[str, Any]],
+    file_paths: Dict[tuple[str, str], str],
+    max_jobs: int = 2,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[tuple[str, str], Dict[str, Any]]:
+    """
+    Submit one bulk GET job per plan group, in plan
+    order, running up to max_jobs at once. file_paths
+    maps (name, bucket) to destination path. Returns
+    download_objects_md5 results keyed (name, bucket)
+    """
+    results: Dict[tuple[str, str], Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+        futures = []
+        for group in plan:
+            group_paths = {
+                name: file_paths[(name, group["bucket"])] for name in group["objects"]
+            }
+            _report(
+                log,
+                f"GET_GROUP\tbucket={group['bucket']}\ttape={group['tape']}\tobjects={len(group_paths)}",
+            )
+            futures.append(
+                (
+                    group,
+                    executor.submit(
+                        download_objects_md5, group_paths, group["bucket"], log=log
+                    ),
+                )
+            )
+        for group, future in futures:
+            try:
+                group_results = future.result()
+            except Exception as err:
+                group_results = {
+                    name: {"job_id": None, "md5": None, "error": str(err)}
+                    for name in group["objects"]
+                }
+            for name, result in group_results.items():
+                results[(name, group["bucket"])] = result
+
+    return results
+
+
+def hash_file_range(fpath: str, offset: int, length: int) -> str:
+    """
+    Base64 MD5 of one byte range of fpath,
+    matching Black Pearl blob checksum format
+    """
+    hash_md5 = hashlib.md5()
+    with open(fpath, "rb") as data:
+        data.seek(offset, 0)
+        remaining = length
+        while remaining > 0:
+            chunk = data.read(min(1048576, remaining))
+            if not chunk:
+                break
+            hash_md5.update(chunk)
+            remaining -= len(chunk)
+    return base64.b64encode(hash_md5.digest()).decode("utf-8")
+
+
+def get_blob_checksums(fname: str, bucket: str) -> List[Dict[str, Any]]:
+    """
+    Retrieve blob list for latest version of object
+    with checksums recorded by Black Pearl at PUT.
+    Returns list of dicts: offset, length, checksum
+    and checksum_type (checksum None if unavailable)
+    """
+    details = CLIENT.get_objects_with_full_details_spectra_s3(
+        ds3.GetObjectsWithFullDetailsSpectraS3Request(
+            bucket_id=bucket, name=fname, latest=True
+        )
+    )
+    blobs: List[Dict[str, Any]] = []
+    for obj in details.result.get("ObjectList", []):
+        if obj.get("Name") != fname:
+            continue
+        for blob in obj.get("Blobs", {}).get("ObjectList", []):
+            blobs.append(
+                {
+                    "id": blob.get("Id"),
+                    "offset": int(blob["Offset"]),
+                    "length": int(blob["Length"]),
+                    "checksum": None,
+                    "checksum_type": None,
+                }
+            )
+    if not blobs:
+        return blobs
+
+    blob_ids = [blob["id"] for blob in blobs if blob["id"]]
+    try:
+        persistence = CLIENT.get_blob_persistence_spectra_s3(
+            ds3.GetBlobPersistenceSpectraS3Request(json.dumps({"blobIds": blob_ids}))
+        )
+        found = {
+            item["blobId"]: item
+            for item in json.loads(persistence.result).get("blobs", [])
+        }
+    except Exception as err:
+        print(f"Unable to retrieve blob checksums for {fname}: {err}")
+        found = {}
+    for blob in blobs:
+        item = found.get(blob["id"])
+        if item:
+            blob["checksum"] = item.get("blobChecksum")
+            blob["checksum_type"] = item.get("blobChecksumType")
+
+    return sorted(blobs, key=lambda blob: blob["offset"])
+
+
+def restore_range_md5(fname: str, bucket: str, offset: int, length: int) -> str:
+    """
+    GET one byte range of an object, hashing
+    without writing to disk. Returns base64 MD5
+    """
+    bulk_get = CLIENT.get_bulk_job_spectra_s3(
+        ds3.GetBulkJobSpectraS3Request(
+            bucket, [ds3.Ds3GetObject(fname, length=length, offset=offset)]
+        )
+    )
+    job_id = bulk_get.result["JobId"]
+    chunk_ids = {chunk["ChunkId"] for chunk in bulk_get.result["ObjectsList"]}
+    received: Dict[int, Any] = {}
+    while chunk_ids:
+        ready = CLIENT.get_job_chunks_ready_for_client_processing_spectra_s3(
+            ds3.GetJobChunksReadyForClientProcessingSpectraS3Request(job_id)
+        )
+        chunks = ready.result["ObjectsList"]
+        if not chunks:
+            time.sleep(ready.retryAfter)
+            continue
+        for chunk in chunks:
+            if chunk["ChunkId"] not in chunk_ids:
+                continue
+            chunk_ids.remove(chunk["ChunkId"])
+            for blob in chunk["ObjectList"]:
+                writer = _HashingWriter(None, int(blob["Offset"]))
+                CLIENT.get_object(
+                    ds3.GetObjectRequest(
+                        bucket, fname, writer, job=job_id, offset=int(blob["Offset"])
+                    )
+                )
+                received[int(blob["Offset"])] = writer.blob_md5
+
+    if offset not in received or len(received) != 1:
+        raise Exception(f"Range {offset}:{length} of {fname} did not map to one blob")
+    return base64.b64encode(received[offset].digest()).decode("utf-8")
+
+
+def verify_blobs(
+    fpath: str,
+    fname: str,
+    bucket: str,
+    max_workers: int = 4,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Verify a PUT without a full restore: compare
+    Black Pearl per-blob MD5s with MD5s of the same
+    local ranges, hashed in parallel processes.
+    Only blobs that mismatch, or have no MD5 recorded,
+    are restored and compared. Returns dict with
+    verified bool, blobs, restored and failed offsets
+    """
+    blobs = get_blob_checksums(fname, bucket)
+    if not blobs:
+        raise Exception(f"No blobs found in Black Pearl for {fname} in {bucket}")
+    total = sum(blob["length"] for blob in blobs)
+    if total != os.path.getsize(fpath):
+        _report(
+            log,
+            f"BLOB_VERIFY_FAIL\tobject={fname}\treason=size\tbp_bytes={total}\tlocal_bytes={os.path.getsize(fpath)}",
+        )
+        return {"verified": False, "blobs": blobs, "restored": [], "failed": []}
+
+    start = time.monotonic()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        local = list(
+            executor.map(
+                hash_file_range,
+                [fpath] * len(blobs),
+                [blob["offset"] for blob in blobs],
+                [blob["length"] for blob in blobs],
+            )
+        )
+
+    restored: list[int] = []
+    failed: list[int] = []
+    for blob, local_md5 in zip(blobs, local):
+        blob["local_checksum"] = local_md5
+        if blob["checksum_type"] == "MD5" and blob["checksum"] == local_md5:
+            continue
+        _report(
+            log,
+            f"BLOB_RESTORE\tobject={fname}\toffset={blob['offset']}\tbytes={blob['length']}\tbp_checksum={blob['checksum']}\tlocal_checksum={local_md5}",
+        )
+        restored.append(blob["offset"])
+        try:
+            remote_md5 = restore_range_md5(
+                fname, bucket, blob["offset"], blob["length"]
+            )
+        except Exception as err:
+            print(f"Unable to restore blob {blob['offset']} of {fname}: {err}")
+            remote_md5 = None
+        if remote_md5 != local_md5:
+            failed.append(blob["offset"])
+
+    _report(
+        log,
+        f"BLOB_VERIFY\tobject={fname}\tblobs={len(blobs)}\trestored={len(restored)}\tfailed={len(failed)}\tseconds={time.monotonic() - start:.2f}",
+    )
+    return {
+        "verified": not failed,
+        "blobs": blobs,
+        "restored": restored,
+        "failed": failed,
+    }
+
+
 def get_buckets_blob(bucket_collection: str) -> str:
     """
     Read JSON list return
@@ -349,21 +1214,29 @@ def get_buckets_blob(bucket_collection: str) -> str:
     return key_bucket
 
 
-def put_single_file(fpath: str, ref_num, bucket_name, check=False) -> Optional[str]:
+def put_single_file(
+    fpath: str,
+    ref_num,
+    bucket_name,
+    check=False,
+    put_options: Optional[Dict[str, Any]] = None,
+    log: Optional[Callable[[str], None]] = None,
+) -> Optional[str]:
     """
-    Add the file to black pearl using helper
+    Add the file to black pearl, single thread
+    unless put_options say otherwise
     Fine for < or > 1TB
     """
+    options = {"max_threads": 1}
+    if put_options:
+        options.update(put_options)
     file_size: int = os.path.getsize(fpath)
-    put_obj: ds3Helpers.HelperPutObject = [
+    put_obj: list[ds3Helpers.HelperPutObject] = [
         ds3Helpers.HelperPutObject(object_name=ref_num, file_path=fpath, size=file_size)
     ]
     try:
-        put_job_id: str = HELPER.put_objects(
-            put_objects=put_obj,
-            bucket=bucket_name,
-            max_threads=1,
-            calculate_checksum=bool(check),
+        put_job_id: str = put_objects_with_progress(
+            put_obj, bucket_name, options, calculate_checksum=bool(check), log=log
         )
         print(f"PUT COMPLETE - JOB ID retrieved: {put_job_id}")
         return put_job_id
@@ -388,6 +1261,133 @@ def delete_black_pearl_object(
         return None
 
 
+def prefix_groups(names: list[str], min_prefix: int = 6) -> list[tuple[str, list[str]]]:
+    """
+    Group sorted names under shared prefixes of at least
+    min_prefix characters, so each group is listed with
+    one prefix search rather than a listing per name
+    """
+    groups: list[tuple[str, list[str]]] = []
+    for name in sorted(set(names)):
+        if groups:
+            prefix = os.path.commonprefix([groups[-1][0], name])
+            if len(prefix) >= min_prefix:
+                groups[-1][1].append(name)
+                groups[-1] = (prefix, groups[-1][1])
+                continue
+        groups.append((name, [name]))
+    return groups
+
+
+def list_object_versions(bucket: str, prefix: str = "") -> dict[str, dict[str, bool]]:
+    """
+    List every version of objects in bucket under
+    prefix, following page markers. Returns
+    name > version_id > is latest
+    """
+    versions: dict[str, dict[str, bool]] = {}
+    marker = None
+    while True:
+        result = CLIENT.get_bucket(
+            ds3.GetBucketRequest(
+                bucket, prefix=prefix or None, marker=marker, versions=True
+            )
+        )
+        contents = result.result.get("ContentsList", []) + result.result.get(
+            "VersionList", []
+        )
+        for item in contents:
+            latest = str(item.get("IsLatest", "true")).lower() == "true"
+            versions.setdefault(item["Key"], {})[item.get("VersionId") or ""] = latest
+        if str(result.result.get("IsTruncated")).lower() != "true" or not contents:
+            break
+        marker = result.result.get("NextMarker") or contents[-1]["Key"]
+    return versions
+
+
+def list_versions_for(bucket: str, names: list[str]) -> dict[str, dict[str, bool]]:
+    """
+    Versions of names in bucket, one listing per prefix group
+    """
+    versions: dict[str, dict[str, bool]] = {}
+    for prefix, group in prefix_groups(names):
+        listed = list_object_versions(bucket, prefix)
+        versions.update({name: listed[name] for name in group if name in listed})
+    return versions
+
+
+def get_latest_version_ids(names: list[str], bucket: str) -> dict[str, str]:
+    """
+    Version_id of latest version for each name found in
+    bucket, in place of a get_version_id call per name
+    """
+    latest: dict[str, str] = {}
+    for name, versions in list_versions_for(bucket, names).items():
+        for version_id, is_latest in versions.items():
+            if is_latest and version_id:
+                latest[name] = version_id
+    return latest
+
+
+def delete_black_pearl_objects(
+    objects: list[tuple[str, Optional[str]]], bucket: str, chunk_size: int = 1000
+) -> tuple[list[tuple[str, Optional[str]]], list[tuple[str, Optional[str]]]]:
+    """
+    Delete (name, version_id) pairs with one multi-object
+    delete request per chunk. Each chunk's deletions are
+    confirmed against a listing including versions: a
+    version_id must no longer be listed, an object without
+    version_id must have no latest version. Chunks the bulk
+    request rejects fall back to single deletes. Returns
+    deleted and failed lists
+    """
+    deleted: list[tuple[str, Optional[str]]] = []
+    failed: list[tuple[str, Optional[str]]] = []
+    objects = sorted(objects, key=lambda obj: (obj[0], obj[1] or ""))
+    for num in range(0, len(objects), chunk_size):
+        chunk = objects[num : num + chunk_size]
+        try:
+            result = CLIENT.delete_objects(
+                ds3.DeleteObjectsRequest(
+                    bucket,
+                    [ds3.Ds3DeleteObject(name, version_id=ver) for name, ver in chunk],
+                )
+            )
+            errors = {
+                (item.get("Key"), item.get("VersionId") or None)
+                for item in result.result.get("ErrorList", [])
+            }
+            # Errors without VersionId fail every version of that name
+            errored = [
+                obj for obj in chunk if obj in errors or (obj[0], None) in errors
+            ]
+            chunk_deleted = [obj for obj in chunk if obj not in errored]
+            failed.extend(errored)
+        except Exception as exc:
+            print(f"Bulk deletion failed, deleting objects singly: {exc}")
+            chunk_deleted = []
+            for name, ver in chunk:
+                if delete_black_pearl_object(name, ver, bucket):
+                    chunk_deleted.append((name, ver))
+                else:
+                    failed.append((name, ver))
+
+        if chunk_deleted:
+            remaining = list_versions_for(bucket, [name for name, _ in chunk_deleted])
+            confirmed = []
+            for name, ver in chunk_deleted:
+                versions = remaining.get(name, {})
+                if (ver and ver in versions) or (not ver and any(versions.values())):
+                    failed.append((name, ver))
+                else:
+                    confirmed.append((name, ver))
+            chunk_deleted = confirmed
+        deleted.extend(chunk_deleted)
+        print(f"Deleted {len(chunk_deleted)} of {len(chunk)} objects from {bucket}")
+
+    return deleted, failed
+
+
 def etag_deletion_confirmation(ref_num: str, bucket: str) -> Optional[str]:
     """
     Get confirmation of deletion
@@ -7,6 +7,8 @@ successful PUT of data from new DPI BP scripts.
 
 Outputs notification of arrival to shared log
 and dumps data received to JSON file in Isilon Logs.
+Job is appended to the bp_job_queue SQLite queue so
+validation workers can claim it straight away.
 
 Stephen McConnachie
 2022
@@ -15,9 +17,13 @@ Stephen McConnachie
 import json
 import logging
 import os
+import sys
 
 from flask import Flask, jsonify, render_template, request
 
+sys.path.append(os.path.join(os.environ["CODE"], "black_pearl"))
+import bp_job_queue
+
 LOG_PATH = os.environ["LOG_PATH"]
 FLASK_HOST = os.environ["FLASK_HOST"]
 
@@ -47,8 +53,12 @@ def postJsonHandler():
     with open(json_filename, "w") as json_file:
         json_file.write(notification_string)
     os.chmod(json_filename, 0o777)
-    return "JSON posted", 200
+    try:
+        bp_job_queue.append_job(jobID, notification_string)
+    except Exception as err:
+        logging.warning("Unable to append job %s to job queue: %s", jobID, err)
     logging.info("%s %s", notification_string, jobID)
+    return "JSON posted", 200
 
 
 if __name__ == "__main__":
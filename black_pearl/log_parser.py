@@ -4,6 +4,10 @@
 Parse `global.log` and report on files with outstanding
 WARNING alerts issued for the given day.
 
+Only lines appended since the last run are read, into
+a SQLite table of the latest WARNING per file per day,
+and current_errors.csv is rendered from that table.
+
 2022
 """
 # Python library imports
@@ -13,6 +17,7 @@ import datetime
 # Python library imports
 import os
 import shutil
+import sqlite3
 import sys
 from typing import Final
 
@@ -20,6 +25,7 @@ csv.field_size_limit(10000000)
 
 # Local imports
 sys.path.append(os.environ["CODE"])
+import log_tail
 import utils
 
 # Date variable for use in ordering error outputs
@@ -34,6 +40,8 @@ GLOBAL_LOG: Final = os.path.join(LOGS, "autoingest/global.log")
 CURRENT_ERROR_FOLD: Final = os.environ["CURRENT_ERRORS"]
 CURRENT_ERRORS: Final = os.path.join(CURRENT_ERROR_FOLD, "current_errors.csv")
 CURRENT_ERRORS_NEW: Final = os.path.join(CURRENT_ERROR_FOLD, "current_errors_new.csv")
+# Latest WARNING per file per day, updated from new global.log lines
+ERRORS_DB: Final = os.path.join(LOGS, "autoingest/current_errors.db")
 
 FILEPATHS = [
     "AUTOINGEST_QNAP01",
@@ -72,71 +80,117 @@ def main():
     create_current_errors_logs()
 
 
-def create_current_errors_logs() -> None:
+def connect(db_path: str = ERRORS_DB) -> sqlite3.Connection:
     """
-    Parse global.log entries
+    Open current errors database, creating tables if needed
     """
-    data: dict = {}
-    with open(GLOBAL_LOG, "r") as file:
-        rows = csv.reader(file, delimiter="\n")
-        for row in rows:
-            row = row[0].split("\t")
-            print(row)
-            # Temp addition to reduce current_errors.csv
-            if "MD5 checksum does not yet exist for this file." in str(row):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS WARNINGS (
+            file TEXT,
+            day TEXT,
+            timedate TEXT,
+            status TEXT,
+            message TEXT,
+            local_p TEXT,
+            remote_p TEXT,
+            PRIMARY KEY (file, day)
+        )"""
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS CHECKPOINT (log_path TEXT PRIMARY KEY, inode INTEGER, offset INTEGER)"
+    )
+    return conn
+
+
+def update_warnings(conn: sqlite3.Connection, log_path: str = GLOBAL_LOG) -> int:
+    """
+    Add WARNING lines appended to global.log since
+    the last update, keeping the latest per file per
+    day. Returns count of new lines read
+    """
+    row = conn.execute(
+        "SELECT inode, offset FROM CHECKPOINT WHERE log_path=?", (log_path,)
+    ).fetchone()
+    checkpoint = {"inode": row[0], "offset": row[1]} if row else None
+    position = checkpoint
+    count = 0
+    with conn:
+        for line, position in log_tail.tail_lines(log_path, checkpoint):
+            count += 1
+            entry = log_tail.parse_line(line)
+            if not entry or "filename" not in entry:
                 continue
-            try:
-                timedate = row[0]
-                local_p = row[2]
-                remote_p = row[3]
-                status = row[1]
-                file_ = row[4]
-                message = row[5]
-            except (IndexError, KeyError):
+            # Temp addition to reduce current_errors.csv
+            if "MD5 checksum does not yet exist for this file." in line:
                 continue
-            print(timedate, status, local_p, remote_p, file_, message)
+            file_ = entry["filename"]
             if ".tmp" in file_ or ".ini" in file_ or ".DS_Store" in file_:
                 continue
+            if "WARNING" not in entry["log_level"]:
+                continue
+            conn.execute(
+                """INSERT INTO WARNINGS VALUES (?,?,?,?,?,?,?)
+                ON CONFLICT(file, day) DO UPDATE SET timedate=excluded.timedate,
+                status=excluded.status, message=excluded.message,
+                local_p=excluded.local_p, remote_p=excluded.remote_p
+                WHERE excluded.timedate >= WARNINGS.timedate""",
+                (
+                    file_,
+                    entry["timestamp"][:10],
+                    entry["timestamp"],
+                    entry["log_level"],
+                    entry["message"],
+                    entry["local_path"],
+                    entry["remote_path"],
+                ),
+            )
+        if position and position != checkpoint:
+            conn.execute(
+                "INSERT OR REPLACE INTO CHECKPOINT VALUES (?,?,?)",
+                (log_path, position["inode"], position["offset"]),
+            )
+        # Only the reported days are needed
+        conn.execute("DELETE FROM WARNINGS WHERE day < ?", (DATE_VAR2,))
+    return count
 
-            # Add items from today only that have WARNING status file still in path
-            if timedate.startswith(DATE_VAR) and "WARNING" in status:
-                print(
-                    f"File exists in date range with 'WARNING', adding to dictionary: {file}"
-                )
-                # Aggregate all messages for select files.
-                if file_ in data:
-                    data[file_][timedate] = (status, message, local_p, remote_p)
-                else:
-                    data[file_] = {timedate: (status, message, local_p, remote_p)}
-            elif timedate.startswith(DATE_VAR2) and "WARNING" in status:
-                print(
-                    f"File exists in date range with 'WARNING', adding to dictionary: {file}"
-                )
-                # Aggregate all messages for select files.
-                if file_ in data:
-                    data[file_][timedate] = (status, message, local_p, remote_p)
-                else:
-                    data[file_] = {timedate: (status, message, local_p, remote_p)}
-
-    print(data)
-    append_rows: list = []
-    for file_ in data.items():
-        # This section removes duplicates entries, writing just last entry to csv
-        latest_timedate = sorted(data[file_[0]].keys())[-1]
-        latest_message = data[file_[0]][latest_timedate]
-        (status, message, local_p, remote_p) = latest_message
-
-        # Remove non-files, like .tmp, .ini and .DS_Store
-        if ".tmp" in file_ or ".ini" in file_ or ".DS_Store" in file_:
-            pass
-        else:
-            print(f"* Adding {local_p} to error log")
-            local_p2 = local_p.replace("/", " | ")
-            local_p2 = local_p2.lstrip(" | ")
-            append_rows.append((latest_timedate[:16], local_p2, file_[0], message))
+
+def current_warnings(conn: sqlite3.Connection) -> list[tuple[str, str, str, str]]:
+    """
+    Latest WARNING per file from yesterday or the day
+    before, as CSV rows newest first
+    """
+    rows = conn.execute(
+        """SELECT file, timedate, message, local_p FROM WARNINGS AS w
+        WHERE day IN (?, ?) AND timedate = (
+            SELECT MAX(timedate) FROM WARNINGS
+            WHERE file = w.file AND day IN (?, ?))""",
+        (DATE_VAR, DATE_VAR2, DATE_VAR, DATE_VAR2),
+    ).fetchall()
+    append_rows = []
+    for file_, timedate, message, local_p in rows:
+        print(f"* Adding {local_p} to error log")
+        local_p2 = local_p.replace("/", " | ")
+        local_p2 = local_p2.lstrip(" | ")
+        append_rows.append((timedate[:16], local_p2, file_, message))
+    append_rows.sort(reverse=True)
+    return append_rows
+
+
+def create_current_errors_logs() -> None:
+    """
+    Update warnings from new global.log
+    entries and render current_errors.csv
+    """
+    conn = connect()
+    try:
+        count = update_warnings(conn)
+        print(f"* {count} new global.log lines read")
+        append_rows = current_warnings(conn)
+    finally:
+        conn.close()
 
     if append_rows:
-        append_rows.sort(reverse=True)
         print("* Creating CSV file current_errors.csv in current_errors folder...")
         with open(CURRENT_ERRORS, "w+") as of:
             writer = csv.writer(of)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+"""
+Ship autoingest global.log and Black Pearl script
+logs to Elasticsearch for the filename search apps.
+
+Tails each log from its inode/offset checkpoint,
+parses the tab separated fields and bulk indexes
+batches into daily indices (autoingest-YYYY.MM.DD for
+global.log, autoingest-bp-YYYY.MM.DD for script logs),
+created with an explicit mapping. Document IDs are
+derived from inode and offset so re-shipping a batch
+after a failure does not duplicate entries.
+
+Runs once through all logs, or with 'follow'
+argument keeps polling every SHIP_INTERVAL seconds.
+
+2026
+"""
+
+# Python library imports
+import datetime
+import glob
+import logging
+import os
+import sys
+import time
+from typing import Final, Iterator, Optional
+
+from elasticsearch import Elasticsearch, helpers
+
+# Local imports
+sys.path.append(os.environ["CODE"])
+import utils
+from log_tail import parse_line, read_checkpoints, tail_lines, write_checkpoints
+
+LOGS: Final = os.environ["LOG_PATH"]
+GLOBAL_LOG: Final = os.path.join(LOGS, "autoingest/global.log")
+CHECKPOINTS: Final = os.path.join(LOGS, "autoingest/log_shipper_checkpoints.json")
+ELASTIC_PATH: Final = os.environ["ELASTIC_PATH"]
+ELASTIC_PASS: Final = os.environ["ELASTIC_PASS"]
+BP_LOGS: Final = [
+    "black_pearl_*.log",
+    "bp_*.log",
+    "Access_rendition_deletion_clean_up.log",
+    "legacy_filename_updater.log",
+]
+BATCH_LINES = 5000
+CHUNK_SIZE = 1000
+SHIP_INTERVAL = int(os.environ.get("SHIP_INTERVAL", "30"))
+
+MAPPING: Final = {
+    "properties": {
+        "timestamp": {"type": "date", "format": "yyyy-MM-dd HH:mm:ss,SSS"},
+        "log_level": {"type": "keyword"},
+        "local_path": {"type": "keyword", "ignore_above": 2048},
+        "remote_path": {"type": "keyword", "ignore_above": 2048},
+        "filename": {
+            "type": "text",
+            "fields": {
+                "keyword": {"type": "keyword", "ignore_above": 1024},
+                "wildcard": {"type": "wildcard"},
+            },
+        },
+        "message": {"type": "text"},
+        "source": {"type": "keyword"},
+    }
+}
+
+# Setup logging
+LOGGER = logging.getLogger("log_shipper")
+HDLR = logging.FileHandler(os.path.join(LOGS, "autoingest/log_shipper.log"))
+FORMATTER = logging.Formatter("%(asctime)s\t%(levelname)s\t%(message)s")
+HDLR.setFormatter(FORMATTER)
+LOGGER.addHandler(HDLR)
+LOGGER.setLevel(logging.INFO)
+
+
+def log_paths() -> list[str]:
+    """
+    global.log then Black Pearl script logs
+    """
+    paths = [GLOBAL_LOG]
+    for pattern in BP_LOGS:
+        paths.extend(sorted(glob.glob(os.path.join(LOGS, pattern))))
+    return paths
+
+
+def index_name(log_path: str, timestamp: str) -> str:
+    """
+    Daily index for log entry
+    """
+    day = timestamp[:10].replace("-", ".")
+    if log_path == GLOBAL_LOG:
+        return f"autoingest-{day}"
+    return f"autoingest-bp-{day}"
+
+
+def ensure_index(es: Elasticsearch, index: str, created: set[str]) -> None:
+    """
+    Create daily index with explicit mapping
+    if not already seen this run
+    """
+    if index in created:
+        return
+    if not es.indices.exists(index=index):
+        es.indices.create(index=index, mappings=MAPPING)
+        LOGGER.info("Created index %s", index)
+    created.add(index)
+
+
+def read_batches(
+    log_path: str, checkpoint: Optional[dict[str, int]]
+) -> Iterator[tuple[list[dict], dict[str, int]]]:
+    """
+    Yield batches of parsed entries with the checkpoint
+    after the batch. Lines without a timestamp (eg
+    tracebacks) are added to the previous message, so
+    batches are only cut before a timestamped line. The
+    last batch checkpoints at the start of its last entry,
+    which is read again (same _id) with any lines added
+    to it later, 'end' marking where the read stopped
+    """
+    source = os.path.basename(log_path)
+    batch: list[dict] = []
+    before = start = position = None
+    for line, position in tail_lines(log_path, checkpoint):
+        if before is None:
+            before = resume_position(checkpoint, position)
+        entry = parse_line(line)
+        if entry is None:
+            if batch and line.strip():
+                batch[-1]["message"] += f"\n{line}"
+            before = position
+            continue
+        if len(batch) >= BATCH_LINES:
+            yield batch, before
+            batch = []
+        entry["source"] = source
+        entry["_id"] = f"{position['inode']}-{position['offset']}"
+        batch.append(entry)
+        start = before
+        before = position
+    if position is None:
+        return
+    if (
+        checkpoint
+        and checkpoint.get("inode") == position["inode"]
+        and checkpoint.get("end") == position["offset"]
+    ):
+        # Nothing added since last entry was shipped
+        return
+    if batch:
+        yield batch, {**start, "end": position["offset"]}
+    else:
+        yield batch, position
+
+
+def resume_position(
+    checkpoint: Optional[dict[str, int]], first: dict[str, int]
+) -> dict[str, int]:
+    """
+    Position tail_lines read from, given position
+    after the first line read
+    """
+    if (
+        checkpoint
+        and checkpoint.get("inode") == first["inode"]
+        and checkpoint.get("offset", 0) < first["offset"]
+    ):
+        return {"inode": first["inode"], "offset": checkpoint["offset"]}
+    return {"inode": first["inode"], "offset": 0}
+
+
+def ship_batch(
+    es: Elasticsearch, log_path: str, batch: list[dict], created: set[str]
+) -> tuple[int, int]:
+    """
+    Bulk index batch, returning counts indexed and failed
+    """
+    actions = []
+    for entry in batch:
+        index = index_name(log_path, entry["timestamp"])
+        ensure_index(es, index, created)
+        doc_id = entry.pop("_id")
+        actions.append({"_index": index, "_id": doc_id, "_source": entry})
+
+    indexed = failed = 0
+    for ok, item in helpers.streaming_bulk(
+        es, actions, chunk_size=CHUNK_SIZE, raise_on_error=False
+    ):
+        if ok:
+            indexed += 1
+            continue
+        failed += 1
+        result = item.get("index", item)
+        LOGGER.warning(
+            "Failed to index %s line %s: %s",
+            log_path,
+            result.get("_id"),
+            result.get("error"),
+        )
+    return indexed, failed
+
+
+def ship_logs(es: Elasticsearch, created: set[str]) -> int:
+    """
+    Ship new lines from every log, saving checkpoint
+    after each batch. Returns entries indexed
+    """
+    checkpoints = read_checkpoints(CHECKPOINTS)
+    total = 0
+    for log_path in log_paths():
+        if not os.path.isfile(log_path):
+            continue
+        for batch, position in read_batches(log_path, checkpoints.get(log_path)):
+            indexed, failed = ship_batch(es, log_path, batch, created)
+            total += indexed
+            if failed:
+                LOGGER.warning("%s entries from %s not indexed", failed, log_path)
+            checkpoints[log_path] = position
+            write_checkpoints(CHECKPOINTS, checkpoints)
+    return total
+
+
+def main():
+    """
+    Ship logs once, or keep polling with 'follow'
+    """
+    if not utils.check_control("pause_scripts"):
+        sys.exit("Script run prevented by downtime_control.json. Script exiting.")
+    follow = "follow" in sys.argv[1:]
+    es = Elasticsearch(
+        ELASTIC_PATH, basic_auth=("elastic", ELASTIC_PASS), verify_certs=False
+    )
+    created: set[str] = set()
+    LOGGER.info("Log shipper start ===================")
+    while True:
+        try:
+            total = ship_logs(es, created)
+        except Exception as err:
+            # Checkpoint not advanced, batch is re-shipped next poll
+            LOGGER.error("Log shipping failed: %s", err)
+            if not follow:
+                raise
+            total = 0
+        if total:
+            LOGGER.info(
+                "%s entries shipped at %s", total, datetime.datetime.now().isoformat()
+            )
+        if not follow or not utils.check_control("pause_scripts"):
+            break
+        time.sleep(SHIP_INTERVAL)
+    LOGGER.info("Log shipper end =====================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Read lines appended to logs since last read
+
+Checkpoints hold the inode and byte offset reached
+for each log path, so each run reads only new complete
+lines. A changed inode, or a file shorter than the
+offset, means the log was rotated/truncated and is read
+again from the start. Shared by log_shipper and
+log_parser.
+
+2026
+"""
+
+import json
+import os
+from typing import Iterator, Optional
+
+# Python logging asctime, eg '2026-01-01 10:00:00,123'
+TIMESTAMP_LEN = 23
+READ_SIZE = 1024 * 1024
+
+
+def read_checkpoints(checkpoint_path: str) -> dict[str, dict[str, int]]:
+    """
+    Load checkpoints for all logs
+    """
+    if not os.path.isfile(checkpoint_path):
+        return {}
+    with open(checkpoint_path) as data:
+        return json.load(data)
+
+
+def write_checkpoints(
+    checkpoint_path: str, checkpoints: dict[str, dict[str, int]]
+) -> None:
+    """
+    Replace checkpoints, writing to temp
+    file and renaming into place
+    """
+    tmp = f"{checkpoint_path}.tmp"
+    with open(tmp, "w") as data:
+        json.dump(checkpoints, data, indent=2)
+    os.replace(tmp, checkpoint_path)
+
+
+def start_offset(stat: os.stat_result, checkpoint: Optional[dict[str, int]]) -> int:
+    """
+    Offset to resume from, 0 if log rotated or truncated
+    """
+    if not checkpoint or checkpoint.get("inode") != stat.st_ino:
+        return 0
+    if checkpoint.get("offset", 0) > stat.st_size:
+        return 0
+    return checkpoint["offset"]
+
+
+def tail_lines(
+    log_path: str, checkpoint: Optional[dict[str, int]]
+) -> Iterator[tuple[str, dict[str, int]]]:
+    """
+    Yield each complete line appended since checkpoint
+    with the checkpoint reached after that line.
+    A partly written last line is left for next read
+    """
+    with open(log_path, "rb") as log:
+        stat = os.fstat(log.fileno())
+        offset = start_offset(stat, checkpoint)
+        log.seek(offset)
+        pending = b""
+        while True:
+            chunk = log.read(READ_SIZE)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                offset += len(line) + 1
+                yield line.decode("utf-8", errors="replace").rstrip("\r"), {
+                    "inode": stat.st_ino,
+                    "offset": offset,
+                }
+
+
+def parse_line(line: str) -> Optional[dict[str, str]]:
+    """
+    Split tab separated log line into fields. global.log
+    lines hold local path, remote path and filename before
+    the message, other logs just the message. Returns None
+    for lines not starting with a timestamp (eg tracebacks)
+    """
+    fields = line.split("\t")
+    if len(fields) < 3 or len(fields[0]) != TIMESTAMP_LEN or fields[0][4] != "-":
+        return None
+    entry = {"timestamp": fields[0], "log_level": fields[1]}
+    if len(fields) >= 6:
+        entry["local_path"] = fields[2]
+        entry["remote_path"] = fields[3]
+        entry["filename"] = fields[4]
+        entry["message"] = "\t".join(fields[5:])
+    else:
+        entry["message"] = "\t".join(fields[2:])
+    return entry
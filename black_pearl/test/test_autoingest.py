@@ -171,3 +171,21 @@ def test_get_media_ingest():
         "N_6839629_03of03.mkv",
     ]
     assert fname3 is False
+
+
+def test_build_ingest_index():
+    """
+    Check local parts indexed by object_number
+    with no CID session supplied
+    """
+    files = [
+        "/mnt/qnap/autoingest/ingest/N_123456_01of03.mkv",
+        "/mnt/qnap/autoingest/ingest/N_123456_02of03.mkv",
+        "/mnt/qnap/autoingest/ingest/N_123456_01of03.mkv.md5",
+        "/mnt/qnap/autoingest/ingest/JAR_2_1_1_0002of0300.tif",
+    ]
+    index = autoingest.build_ingest_index(files)
+    assert autoingest.get_index_key("N_123456_02of03.mkv") == "N-123456"
+    assert index["local"]["N-123456"] == {"N_123456_01of03.mkv", "N_123456_02of03.mkv"}
+    assert index["local"]["JAR-2-1-1"] == {"JAR_2_1_1_0002of0300.tif"}
+    assert index["cid"] == {}
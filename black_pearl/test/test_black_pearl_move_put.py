@@ -76,3 +76,21 @@ def test_check_folder_age():
     fmt = "%Y-%m-%d %H:%M:%S.%f"
 
     day_diff1 = bp.check_folder_age("ingest_2023-10-24_00-01-00")
+
+
+def test_plan_ingest_folders(tmp_path):
+    """
+    Supply file sizes and check first-fit-decreasing
+    packing fills existing folder before new ones
+    """
+    folder = tmp_path / "ingest_2023-10-24_00-01-00"
+    folder.mkdir()
+    (folder / "N_1_01of01.mkv").write_bytes(b"0" * 40)
+    sizes = {"a.mkv": 30, "b.mkv": 70, "c.mkv": 60, "d.mkv": 20}
+    plan = bp.plan_ingest_folders(str(tmp_path), sizes, 100)
+    assert plan[0]["folder"] == "ingest_2023-10-24_00-01-00"
+    assert plan[0]["files"] == ["c.mkv"]
+    assert plan[0]["size"] == 100
+    assert plan[1]["folder"] == ""
+    assert plan[1]["files"] == ["b.mkv", "a.mkv"]
+    assert plan[2]["files"] == ["d.mkv"]
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.environ["CODE"], "black_pearl"))
+import bp_job_queue
+
+
+def test_claim_release_complete(tmp_path):
+    """
+    Append jobs to temporary queue and check
+    claims are exclusive and released jobs return
+    """
+    db = str(tmp_path / "job_queue.db")
+    bp_job_queue.append_job("job-1", '{"Notification": {}}', db)
+    claimed = bp_job_queue.claim_job("worker-1", db)
+    assert claimed == ("job-1", '{"Notification": {}}')
+    assert bp_job_queue.claim_job("worker-2", db) is None
+    assert bp_job_queue.get_claimed_jobs(db) == {"job-1"}
+    bp_job_queue.release_job("job-1", 0, db)
+    assert bp_job_queue.claim_job("worker-2", db)[0] == "job-1"
+    bp_job_queue.complete_job("job-1", db_path=db)
+    assert bp_job_queue.claim_job("worker-1", db) is None
+
+
+def test_repeat_notification_keeps_claim(tmp_path):
+    """
+    Check a duplicate notification does not re-queue
+    a claimed job, but does re-queue a finished one
+    """
+    db = str(tmp_path / "job_queue.db")
+    bp_job_queue.append_job("job-1", "{}", db)
+    assert bp_job_queue.claim_job("worker-1", db)[0] == "job-1"
+    bp_job_queue.append_job("job-1", "{}", db)
+    assert bp_job_queue.claim_job("worker-2", db) is None
+    bp_job_queue.complete_job("job-1", db_path=db)
+    bp_job_queue.append_job("job-1", "{}", db)
+    assert bp_job_queue.claim_job("worker-2", db)[0] == "job-1"
+
+
+def test_claim_job_id(tmp_path):
+    """
+    Check a job_id claimed by folder is exclusive
+    with queue claims, and added if not queued
+    """
+    db = str(tmp_path / "job_queue.db")
+    bp_job_queue.append_job("job-1", "{}", db)
+    assert bp_job_queue.claim_job("worker-1", db)[0] == "job-1"
+    assert bp_job_queue.claim_job_id("job-1", "cron", db) is False
+    bp_job_queue.release_job("job-1", 0, db)
+    assert bp_job_queue.claim_job_id("job-1", "cron", db) is True
+    assert bp_job_queue.claim_job("worker-1", db) is None
+    assert bp_job_queue.claim_job_id("job-2", "cron", db) is True
+    assert bp_job_queue.get_claimed_jobs(db) == {"job-1", "job-2"}
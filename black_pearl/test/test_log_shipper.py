@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.environ["CODE"], "black_pearl"))
+import log_shipper
+
+LINE = "2026-01-01 10:00:00,123\tERROR\tCopy failed"
+
+
+def test_read_batches_keeps_traceback(tmp_path, monkeypatch):
+    """
+    Traceback lines after a full batch, or written
+    after a run ends, stay with their log entry
+    """
+    monkeypatch.setattr(log_shipper, "BATCH_LINES", 1)
+    log = tmp_path / "bp_test.log"
+    log.write_text(f"{LINE}\nTraceback (most recent call last):\n{LINE}\n")
+    batches = list(log_shipper.read_batches(str(log), None))
+    assert [len(batch) for batch, _ in batches] == [1, 1]
+    assert batches[0][0][0]["message"].endswith("Traceback (most recent call last):")
+    last_id = batches[-1][0][0]["_id"]
+    checkpoint = batches[-1][1]
+    assert list(log_shipper.read_batches(str(log), checkpoint)) == []
+
+    with open(log, "a") as data:
+        data.write("ValueError: bad\n")
+    batches = list(log_shipper.read_batches(str(log), checkpoint))
+    entry = batches[0][0][0]
+    assert entry["message"] == "Copy failed\nValueError: bad"
+    assert entry["_id"] == last_id
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.environ["CODE"], "black_pearl"))
+import log_tail
+
+LINE = "2026-01-01 10:00:00,123\tWARNING\t/mnt/qnap/autoingest/\tingest/\tN_123_01of01.mkv\tCannot parse partWhole from filename"
+
+
+def test_parse_line():
+    """
+    Check global.log and script log lines split to
+    fields, and continuation lines are rejected
+    """
+    entry = log_tail.parse_line(LINE)
+    assert entry["log_level"] == "WARNING"
+    assert entry["filename"] == "N_123_01of01.mkv"
+    assert entry["message"] == "Cannot parse partWhole from filename"
+    entry = log_tail.parse_line("2026-01-01 10:00:00,123\tINFO\t===== START")
+    assert entry == {
+        "timestamp": "2026-01-01 10:00:00,123",
+        "log_level": "INFO",
+        "message": "===== START",
+    }
+    assert log_tail.parse_line("Traceback (most recent call last):") is None
+
+
+def test_tail_lines_resume_and_rotate(tmp_path):
+    """
+    Read only complete new lines from checkpoint,
+    and from start again once log is replaced
+    """
+    log = tmp_path / "global.log"
+    log.write_text(f"{LINE}\n{LINE}\npartial")
+    lines = list(log_tail.tail_lines(str(log), None))
+    assert len(lines) == 2
+    checkpoint = lines[-1][1]
+    assert checkpoint["offset"] == (len(LINE) + 1) * 2
+
+    with open(log, "a") as data:
+        data.write(" line\n")
+    lines = list(log_tail.tail_lines(str(log), checkpoint))
+    assert [line for line, _ in lines] == ["partial line"]
+
+    os.remove(log)
+    log.write_text("new\n")
+    lines = list(log_tail.tail_lines(str(log), lines[-1][1]))
+    assert [line for line, _ in lines] == ["new"]
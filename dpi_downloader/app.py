@@ -10,9 +10,10 @@ using GET requests, and statuses updated as download progresses.
 import datetime
 import os
 import re
-import sqlite3
 
-from flask import Flask, render_template, request
+from flask import Flask, g, jsonify, render_template, request
+
+import download_queue as dq
 
 app = Flask(__name__)
 
@@ -24,13 +25,43 @@ def index():
 
 
 DBASE = os.environ.get("DATABASE_TRANSCODE")
-CONNECT = sqlite3.connect(DBASE)
-CONNECT.execute(
-    "CREATE TABLE IF NOT EXISTS DOWNLOADS (name TEXT, email TEXT, download_type TEXT, fname TEXT, download_path TEXT, fpath TEXT, transcode TEXT, status TEXT, date TEXT)"
-)
+# Creates table, lease columns, indexes and sets WAL
+POOL = dq.ConnectionPool(DBASE)
+POOL.put(POOL.get())
 FLASK_HOST = os.environ["FLASK_HOST"]
 
 
+def get_db():
+    """
+    Borrow pooled connection for this request
+    """
+    if "db" not in g:
+        g.db = POOL.get()
+    return g.db
+
+
+@app.teardown_appcontext
+def return_db(exception):
+    """
+    Return request's connection to pool
+    """
+    conn = g.pop("db", None)
+    if conn is not None:
+        POOL.put(conn)
+
+
+def parse_cursor(cursor):
+    """
+    Split 'date|rowid' page cursor
+    """
+    if not cursor or "|" not in cursor:
+        return None
+    date, rowid = cursor.rsplit("|", 1)
+    if not rowid.isnumeric():
+        return None
+    return date, int(rowid)
+
+
 @app.route("/dpi_download_request", methods=["GET", "POST"])
 def dpi_download_request():
     """
@@ -61,23 +92,20 @@ def dpi_download_request():
         # Check for non-BFI email and reject
         if "bfi.org.uk" not in email:
             return render_template("email_error_transcode.html")
-        with sqlite3.connect(DBASE) as users:
-            cursor = users.cursor()
-            cursor.execute(
-                "INSERT INTO DOWNLOADS (name,email,download_type,fname,download_path,fpath,transcode,status,date) VALUES (?,?,?,?,?,?,?,?,?)",
-                (
-                    name,
-                    email,
-                    download_type,
-                    fname,
-                    download_path,
-                    fpath,
-                    transcode,
-                    status,
-                    date_stamp,
-                ),
-            )
-            users.commit()
+        dq.append_request(
+            get_db(),
+            (
+                name,
+                email,
+                download_type,
+                fname,
+                download_path,
+                fpath,
+                transcode,
+                status,
+                date_stamp,
+            ),
+        )
         return render_template("index_transcode.html")
     else:
         return render_template("initiate_transcode.html")
@@ -88,11 +116,39 @@ def dpi_download():
     """
     Return the View all requested page
     """
-    connect = sqlite3.connect(DBASE)
-    cursor = connect.cursor()
-    cursor.execute("SELECT * FROM DOWNLOADS where date >= datetime('now','-14 days')")
-    data = cursor.fetchall()
-    return render_template("downloads_transcode.html", data=data)
+    data = dq.get_requests(
+        get_db(),
+        before=parse_cursor(request.args.get("before")),
+        email=request.args.get("email"),
+    )
+    next_page = None
+    if len(data) == dq.PAGE_SIZE:
+        next_page = f"{data[-1][8]}|{data[-1][9]}"
+    return render_template(
+        "downloads_transcode.html",
+        data=data,
+        next_page=next_page,
+        refreshed=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    )
+
+
+@app.route("/dpi_download/updates")
+def dpi_download_updates():
+    """
+    Return requests added or changed since
+    'since' timestamp as JSON, for page refresh
+    """
+    since = request.args.get("since", "")
+    rows = dq.get_updated(get_db(), since)
+    fields = dq.COLUMNS.split(", ")
+    return jsonify(
+        {
+            "rows": [
+                dict(zip(fields, row[:9]), id=row[9], updated=row[10]) for row in rows
+            ],
+            "since": rows[-1][10] if rows else since,
+        }
+    )
 
 
 if __name__ == "__main__":
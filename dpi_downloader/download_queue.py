@@ -0,0 +1,279 @@
+"""
+DPI download request queue
+
+Shared by the Flask app (appends requests) and the
+download/transcode workers (claim requests with a lease).
+Workers keep one connection open for the run, extend
+their lease on every status update and heartbeat, and
+release their rows when the run completes. Rows held by
+a worker whose lease expires part way through download
+are offered to the next worker to claim.
+
+The app borrows pooled connections per web request,
+and pages request history by (date, rowid) keyset.
+Uses WAL so the app can read/insert while a worker writes,
+override with DPI_QUEUE_JOURNAL=DELETE where the database
+is reached by workers over network storage.
+
+2026
+"""
+
+import os
+import queue
+import socket
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+JOURNAL_MODE = os.environ.get("DPI_QUEUE_JOURNAL", "WAL")
+# Claimed rows without update/heartbeat for this long are re-offered
+LEASE_MINUTES = 60
+HEARTBEAT_SECONDS = 300
+TIMEOUT = 30
+PAGE_SIZE = 100
+COLUMNS = (
+    "name, email, download_type, fname, download_path, fpath, transcode, status, date"
+)
+# Statuses a row is left in when a worker stops part way through
+INTERRUPTED = """(status='Requested' OR status LIKE 'Downloading%'
+    OR status LIKE 'Transcoding%'
+    OR (status='Download complete' AND transcode!='none'))"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS DOWNLOADS (
+    name TEXT,
+    email TEXT,
+    download_type TEXT,
+    fname TEXT,
+    download_path TEXT,
+    fpath TEXT,
+    transcode TEXT,
+    status TEXT,
+    date TEXT
+)
+"""
+
+
+class _Connection(sqlite3.Connection):
+    """
+    Connection with lock for statements from
+    a worker's threads sharing it
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+
+
+def _stamp(minutes: int = 0) -> str:
+    """
+    Return now plus minutes formatted for SQLite comparison
+    """
+    return (datetime.now() + timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def worker_name() -> str:
+    """
+    Identify this worker by host and process
+    """
+    return f"{socket.gethostname()}_{os.getpid()}"
+
+
+def connect(db_path: str) -> _Connection:
+    """
+    Open queue database, creating table, lease
+    columns and status index if needed. Connection
+    may be shared between a worker's threads
+    """
+    conn = sqlite3.connect(
+        db_path,
+        timeout=TIMEOUT,
+        isolation_level=None,
+        check_same_thread=False,
+        factory=_Connection,
+    )
+    conn.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+    conn.execute(SCHEMA)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(DOWNLOADS)")]
+    for column in ("worker", "lease", "updated"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE DOWNLOADS ADD COLUMN {column} TEXT")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS downloads_status ON DOWNLOADS (status, date)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS downloads_date ON DOWNLOADS (date)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS downloads_email ON DOWNLOADS (email, date)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS downloads_updated ON DOWNLOADS (updated)")
+    conn.execute("CREATE INDEX IF NOT EXISTS downloads_worker ON DOWNLOADS (worker)")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Reuse open connections between web requests,
+    opening more when all are borrowed
+    """
+
+    def __init__(self, db_path: str, size: int = 4) -> None:
+        self.db_path = db_path
+        self.idle: queue.LifoQueue = queue.LifoQueue(maxsize=size)
+
+    def get(self) -> _Connection:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return connect(self.db_path)
+
+    def put(self, conn: _Connection) -> None:
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def append_request(conn: _Connection, values: tuple[str, ...]) -> None:
+    """
+    Add new download request, values ordered as COLUMNS
+    """
+    with conn.lock:
+        conn.execute(
+            f"INSERT INTO DOWNLOADS ({COLUMNS}, updated) VALUES (?,?,?,?,?,?,?,?,?,?)",
+            (*values, values[-1]),
+        )
+
+
+def claim_requests(
+    conn: _Connection, worker: str, limit: int = -1
+) -> list[tuple[str, ...]]:
+    """
+    Atomically claim unheld 'Requested' rows, plus rows
+    left downloading or transcoding by a worker whose
+    lease expired (eg after a crash without release).
+    Returns rows ordered as COLUMNS, oldest first
+    """
+    with conn.lock:
+        rows = conn.execute(
+            f"""UPDATE DOWNLOADS SET status='Requested', worker=?, lease=?, updated=?
+            WHERE rowid IN (
+                SELECT rowid FROM DOWNLOADS
+                WHERE (status='Requested' AND worker IS NULL)
+                OR (worker IS NOT NULL AND lease<=? AND {INTERRUPTED})
+                ORDER BY date LIMIT ?)
+            RETURNING {COLUMNS}""",
+            (worker, _stamp(LEASE_MINUTES), _stamp(), _stamp(), limit),
+        ).fetchall()
+    return sorted(rows, key=lambda row: row[-1])
+
+
+def update_status(
+    conn: _Connection, worker: str, fname: str, transcode: str, status: str
+) -> int:
+    """
+    Set status on this worker's rows for fname/transcode
+    and extend their lease. Returns rows updated
+    """
+    with conn.lock:
+        cursor = conn.execute(
+            """UPDATE DOWNLOADS SET status=?, lease=?, updated=?
+            WHERE fname=? AND transcode=? AND worker=?""",
+            (status, _stamp(LEASE_MINUTES), _stamp(), fname, transcode, worker),
+        )
+    return cursor.rowcount
+
+
+def heartbeat(conn: _Connection, worker: str) -> None:
+    """
+    Extend lease on all rows held by worker
+    """
+    with conn.lock:
+        conn.execute(
+            "UPDATE DOWNLOADS SET lease=? WHERE worker=?",
+            (_stamp(LEASE_MINUTES), worker),
+        )
+
+
+def start_heartbeat(
+    conn: _Connection, worker: str, interval: int = HEARTBEAT_SECONDS
+) -> threading.Event:
+    """
+    Heartbeat from a daemon thread every interval
+    seconds, until returned event is set
+    """
+    stop = threading.Event()
+
+    def beat() -> None:
+        while not stop.wait(interval):
+            try:
+                heartbeat(conn, worker)
+            except sqlite3.Error as err:
+                print(f"Queue heartbeat failed: {err}")
+
+    threading.Thread(target=beat, daemon=True).start()
+    return stop
+
+
+def release(conn: _Connection, worker: str) -> None:
+    """
+    Release all rows held by worker. Rows left
+    downloading or transcoding are set back to
+    'Requested' so they are claimable by other workers
+    """
+    with conn.lock:
+        conn.execute(
+            f"""UPDATE DOWNLOADS SET status='Requested', updated=?
+            WHERE worker=? AND {INTERRUPTED} AND status!='Requested'""",
+            (_stamp(), worker),
+        )
+        conn.execute(
+            "UPDATE DOWNLOADS SET worker=NULL, lease=NULL WHERE worker=?", (worker,)
+        )
+
+
+def get_requests(
+    conn: _Connection,
+    days: int = 14,
+    before: Optional[tuple[str, int]] = None,
+    email: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+) -> list[tuple[str, ...]]:
+    """
+    Return one page of requests made within days,
+    newest first, as COLUMNS plus rowid. Pass the
+    (date, rowid) of the last row seen as before
+    for the next page
+    """
+    where = ["date >= datetime('now', ?)"]
+    params: list = [f"-{days} days"]
+    if before:
+        where.append("(date, rowid) < (?, ?)")
+        params.extend(before)
+    if email:
+        where.append("email = ?")
+        params.append(email)
+    params.append(limit)
+    with conn.lock:
+        return conn.execute(
+            f"""SELECT {COLUMNS}, rowid FROM DOWNLOADS WHERE {' AND '.join(where)}
+            ORDER BY date DESC, rowid DESC LIMIT ?""",
+            params,
+        ).fetchall()
+
+
+def get_updated(conn: _Connection, since: str, days: int = 14) -> list[tuple[str, ...]]:
+    """
+    Return requests within days added or changed
+    at or after since, as COLUMNS plus rowid and
+    updated. Updates are stamped to the second, so
+    rows from the since second are returned again
+    and callers update rows by rowid
+    """
+    with conn.lock:
+        return conn.execute(
+            f"""SELECT {COLUMNS}, rowid, updated FROM DOWNLOADS
+            WHERE updated >= ? AND date >= datetime('now', ?)
+            ORDER BY updated""",
+            (since, f"-{days} days"),
+        ).fetchall()
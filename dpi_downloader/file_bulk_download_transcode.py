@@ -2,7 +2,8 @@
 
 """
 Looks to database.db for downloadable files
-Retrieves items with status 'Requested'
+Claims items with status 'Requested' for this
+worker (see download_queue.py)
 Stores username, email, download path, folder
 filename and status.
 
@@ -45,6 +46,15 @@ Single:
 9. Sends notification email to user who requested download
    with unique transcode message when complete.
 
+All requested files (single and bulk) are collected
+first, objects requested more than once downloaded once,
+and downloads made per bucket in bulk GET jobs. Each file
+is written to a resumable .part file, checked and renamed
+into place, then transcoded as soon as it lands. Downloads,
+MD5 verification and transcodes run on separate worker
+pools with bounded queues between them, ProRes in its own
+lane (sizes set by DPI_*_WORKERS environment variables).
+
 Blocks download from 'netflix' or 'amazon' buckets.
 
 2023
@@ -57,15 +67,21 @@ import logging
 
 # Python packages
 import os
+import shutil
 import sqlite3
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Final, Optional
+from typing import Any, Final, Optional
 
-from ds3 import ds3, ds3Helpers
+from ds3 import ds3
 
 # Local packages
 sys.path.append(os.environ["CODE"])
+sys.path.append(os.path.join(os.environ["CODE"], "black_pearl/"))
+import bp_utils as bp
+import download_queue as dq
 from downloaded_transcode_mp4 import transcode_mp4
 from downloaded_transcode_mp4_watermark import transcode_mp4_access
 from downloaded_transcode_prores import transcode_mov
@@ -75,7 +91,6 @@ import adlib_v3 as adlib
 # GLOBAL VARIABLES
 CID_API: Final = os.environ["CID_API3"]
 CLIENT: Final = ds3.createClientFromEnv()
-HELPER: Final = ds3Helpers.Helper(client=CLIENT)
 LOG_PATH: Final = os.environ["LOG_PATH"]
 CONTROL_JSON: Final = os.environ["CONTROL_JSON"]
 CODEPTH: Final = os.environ["CODE"]
@@ -83,6 +98,19 @@ DATABASE: Final = os.path.join(CODEPTH, "dpi_downloader/database_transcode.db")
 EMAIL_SENDER: Final = os.environ["EMAIL_SEND"]
 EMAIL_PSWD: Final = os.environ["EMAIL_PASS"]
 FMT: Final = "%Y-%m-%d %H:%M:%s"
+# Objects per bulk GET job
+BULK_JOB_MAX: Final = 100
+# Worker pool sizes per stage, transcodes bounded by cores
+DOWNLOAD_WORKERS: Final = int(os.environ.get("DPI_DOWNLOAD_WORKERS", "2"))
+VERIFY_WORKERS: Final = int(os.environ.get("DPI_VERIFY_WORKERS", "2"))
+TRANSCODE_WORKERS: Final = int(
+    os.environ.get("DPI_TRANSCODE_WORKERS", str(max(1, (os.cpu_count() or 4) // 4)))
+)
+PRORES_WORKERS: Final = int(os.environ.get("DPI_PRORES_WORKERS", "1"))
+STAGE_QUEUE: Final = 20
+PROGRESS_LOCK: Final = threading.Lock()
+QUEUE: Final = dq.connect(DATABASE)
+WORKER: Final = dq.worker_name()
 
 # Set up logging
 LOGGER = logging.getLogger("schedule_database_downloader_transcode")
@@ -95,6 +123,16 @@ LOGGER.addHandler(HDLR)
 LOGGER.setLevel(logging.INFO)
 
 
+def downtime_requested() -> bool:
+    """
+    Check control json for downtime requests,
+    without exiting, for use between pool items
+    """
+    with open(CONTROL_JSON) as control:
+        j = json.load(control)
+    return not j["black_pearl"] or not j["pause_scripts"]
+
+
 def check_control() -> None:
     """
     Check control json for downtime requests
@@ -264,22 +302,23 @@ def get_bp_md5(fname: str, bucket: str) -> str:
         return md5.replace('"', "")
 
 
-def make_check_md5(fpath: str, fname: str, bucket: str) -> tuple[str, str]:
+def make_check_md5(
+    fpath: str, fname: str, bucket: str, download_checksum: str = ""
+) -> tuple[str, str]:
     """
-    Generate MD5 for fpath
-    Locate matching file in CID/checksum_md5 folder
-    and see if checksums match. If not, write to log
+    Generate MD5 for fpath, unless supplied
+    from hashing during download, and compare
+    to MD5 retrieved from Black Pearl
     """
-    download_checksum = ""
-
-    try:
-        hash_md5 = hashlib.md5()
-        with open(fpath, "rb") as file:
-            for chunk in iter(lambda: file.read(65536), b""):
-                hash_md5.update(chunk)
-        download_checksum = hash_md5.hexdigest()
-    except Exception as err:
-        print(err)
+    if not download_checksum:
+        try:
+            hash_md5 = hashlib.md5()
+            with open(fpath, "rb") as file:
+                for chunk in iter(lambda: file.read(65536), b""):
+                    hash_md5.update(chunk)
+            download_checksum = hash_md5.hexdigest()
+        except Exception as err:
+            print(err)
 
     bp_checksum = get_bp_md5(fname, bucket)
     print(
@@ -290,29 +329,16 @@ def make_check_md5(fpath: str, fname: str, bucket: str) -> tuple[str, str]:
 
 def retrieve_requested() -> list[str]:
     """
-    Access database.db and retrieve
-    recently requested downloads
+    Claim 'Requested' downloads from database.db
+    for this worker, so no other worker on any
+    host processes the same rows
     """
     requested_data = []
     try:
-        sqlite_connection = sqlite3.connect(DATABASE)
-        cursor = sqlite_connection.cursor()
-        print("Database connected successfully")
-
-        cursor.execute('''SELECT * FROM DOWNLOADS WHERE status = "Requested"''')
-        data = cursor.fetchall()
-        print(data)
-        for row in data:
-            print(type(row), row)
-            if row[-2] == "Requested":
-                requested_data.append(row)
-        cursor.close()
+        requested_data = dq.claim_requests(QUEUE, WORKER)
+        print(f"Claimed {len(requested_data)} requests as {WORKER}")
     except sqlite3.Error as err:
         LOGGER.warning("%s", err)
-    finally:
-        if sqlite_connection:
-            sqlite_connection.close()
-            print("Database connection closed")
 
     # Sort for unique tuples only in list
     sorted_data = remove_duplicates(requested_data)
@@ -332,26 +358,14 @@ def remove_duplicates(list_data: list[str]) -> list[str]:
 
 def update_table(fname: str, trans: str, new_status: str) -> None:
     """
-    Update specific row with new
-    data, for fname match
+    Update this worker's rows with new
+    status, for fname match
     """
     try:
-        sqlite_connection = sqlite3.connect(DATABASE)
-        cursor = sqlite_connection.cursor()
-        # Update row with new status
-        sql_query = (
-            """UPDATE DOWNLOADS SET status = ? WHERE fname = ? AND transcode = ?"""
-        )
-        data = (new_status, fname, trans)
-        cursor.execute(sql_query, data)
-        sqlite_connection.commit()
+        dq.update_status(QUEUE, WORKER, fname, trans, new_status)
         print(f"Record updated with new status {new_status}")
-        cursor.close()
     except sqlite3.Error as err:
         LOGGER.warning("Failed to update database: %s", err)
-    finally:
-        if sqlite_connection:
-            sqlite_connection.close()
 
 
 def check_download_exists(
@@ -381,20 +395,17 @@ def check_download_exists(
     return new_fpath, skip_download
 
 
-def main():
+def collect_tasks(
+    data: list[tuple[str, ...]],
+) -> tuple[list[dict[str, Any]], dict[tuple[str, str], dict[str, Any]]]:
     """
-    Retrieve 'Requested' rows from database.db as list of
-    tuples and process one at a time.
+    Validate 'Requested' rows, expanding bulk pointer
+    files to their media files. Returns one task per
+    file to download/transcode, and bulk request
+    progress keyed by (fname, transcode)
     """
-    data = retrieve_requested()
-    if len(data) == 0:
-        sys.exit("No data found in DOWNLOADS database")
-
-    LOGGER.info(
-        "================ DPI DOWNLOAD REQUESTS RETRIEVED: %s. Date: %s =================",
-        len(data),
-        datetime.now().strftime(FMT)[:19],
-    )
+    tasks: list[dict[str, Any]] = []
+    requests: dict[tuple[str, str], dict[str, Any]] = {}
     for row in data:
         check_control()
         username = row[0].strip()
@@ -462,238 +473,492 @@ def main():
                     "Downloaded file (no transcode) in location already. Skipping further processing."
                 )
                 continue
-            if not skip_download:
-                # Download from BP
-                LOGGER.info("Beginning download of file %s to download path", fname)
-                update_table(fname, transcode, "Downloading")
-                download_job_id = download_bp_object(fname, download_fpath, bucket)
-                if download_job_id == "404":
-                    LOGGER.warning(
-                        "Download of file %s failed. File not found in Black Pearl tape library.",
-                        fname,
-                    )
-                    update_table(fname, transcode, "Filename not found in Black Pearl")
-                    continue
-                if not download_job_id:
-                    LOGGER.warning(
-                        "Download of file %s failed. Resetting download status and script exiting.",
-                        fname,
+            tasks.append(
+                {
+                    "request": fname,
+                    "dtype": dtype,
+                    "email": email,
+                    "transcode": transcode,
+                    "filename": fname,
+                    "orig_fname": orig_fname,
+                    "bucket": bucket,
+                    "download_fpath": download_fpath,
+                    "new_fpath": new_fpath,
+                    "skip_download": skip_download,
+                }
+            )
+            continue
+
+        # dtype is bulk
+        print(f"Finding prirefs from Pointer file with number: {fname}")
+        if not fname.isnumeric():
+            update_table(fname, transcode, "Error with pointer file number")
+            LOGGER.warning(
+                "Bulk download request. Error with pointer file number: %s.", fname
+            )
+            continue
+        priref_list = get_prirefs(fname)
+        if len(priref_list) > 50:
+            update_table(fname, transcode, "Pointer file over 50 CID items")
+            LOGGER.warning(
+                "Bulk download request. Too many pointer file entries for download maximum of 50: %s.",
+                len(priref_list),
+            )
+            continue
+        LOGGER.info(
+            "Bulk download requested with %s item prirefs to process.",
+            len(priref_list),
+        )
+        pointer_dct = get_dictionary(priref_list)
+        if not any(pointer_dct.values()):
+            update_table(
+                fname, transcode, "Pointer file found no digital media records"
+            )
+            LOGGER.warning(
+                "CID item number supplied in pointer file have no associated CID digital media records: %s",
+                pointer_dct,
+            )
+            continue
+        progress = requests.setdefault(
+            (fname, transcode),
+            {
+                "email": email,
+                "download_fpath": download_fpath,
+                "files_processed": {},
+                "pending": 0,
+            },
+        )
+        for media_priref, download_dct in pointer_dct.items():
+            LOGGER.info(
+                "** Downloading digital items for CID item record %s", media_priref
+            )
+            for file in download_dct:
+                for filename, (orig_fname, bucket) in file.items():
+                    print(
+                        f"Media priref {media_priref} Filename {filename} Original name {orig_fname} in bucket {bucket}"
                     )
-                    update_table(fname, transcode, "Requested")
-                    continue
-                LOGGER.info(
-                    "Downloaded file retrieved successfully. Job ID: %s",
-                    download_job_id,
-                )
-                if str(orig_fname).strip() != str(fname).strip():
+                    if not len(filename) > 0:
+                        LOGGER.warning(
+                            "Filename is not recognised, no matching CID Media record"
+                        )
+                        continue
+                    if "netflix" in str(bucket) or "amazon" in str(bucket):
+                        LOGGER.warning(
+                            "Filename is a Netflix/Amazon item and will not be downloaded"
+                        )
+                        update_table(fname, transcode, "Filename not accessible")
+                        continue
                     LOGGER.info(
-                        "Updating download UMID filename with item filename: %s",
+                        "Download file request matched to CID file %s media record %s",
                         orig_fname,
+                        media_priref,
                     )
-                    umid_fpath = os.path.join(download_fpath, fname)
-                    os.rename(umid_fpath, new_fpath)
-
-                # MD5 Verification
-                local_md5, bp_md5 = make_check_md5(new_fpath, fname, bucket)
-                LOGGER.info(
-                    "MD5 checksum validation check:\n\t%s - Downloaded file MD5\n\t%s - Black Pearl retrieved MD5",
-                    local_md5,
-                    bp_md5,
-                )
-                if local_md5 == bp_md5:
-                    LOGGER.info(
-                        "MD5 checksums match. Updating Download status to Download database"
+
+                    # Check if download already exists
+                    new_fpath, skip_download = check_download_exists(
+                        download_fpath, orig_fname, filename, transcode
                     )
-                else:
-                    LOGGER.warning(
-                        "MD5 checksums DO NOT match. Updating Download status to Download database"
+                    if not new_fpath:
+                        LOGGER.warning(
+                            "Download path exists and no transcode required. Skipping."
+                        )
+                        continue
+                    tasks.append(
+                        {
+                            "request": fname,
+                            "dtype": dtype,
+                            "email": email,
+                            "transcode": transcode,
+                            "filename": filename,
+                            "orig_fname": orig_fname,
+                            "bucket": bucket,
+                            "download_fpath": download_fpath,
+                            "new_fpath": new_fpath,
+                            "skip_download": skip_download,
+                        }
                     )
-                update_table(fname, transcode, "Download complete")
+                    progress["pending"] += 1
 
-            # Transcode
-            trans, failed_trans = create_transcode(new_fpath, transcode, fname)
+    return tasks, requests
 
-            # Delete source download from DPI if not failed transcode/already found in path
-            if trans == "no_transcode":
-                LOGGER.info("No transcode requested for this asset.")
-            elif not skip_download or not failed_trans:
-                LOGGER.info("Deleting downloaded asset: %s", new_fpath)
-                os.remove(new_fpath)
-            # Send notification email
-            send_email_update(email, fname, new_fpath, trans)
 
-        # dtype is bulk
-        else:
-            files_processed = {}
-            print(f"Finding prirefs from Pointer file with number: {fname}")
-            if not fname.isnumeric():
-                update_table(fname, transcode, "Error with pointer file number")
-                LOGGER.warning(
-                    "Bulk download request. Error with pointer file number: %s.", fname
-                )
-                continue
-            priref_list = get_prirefs(fname)
-            if len(priref_list) > 50:
-                update_table(fname, transcode, "Pointer file over 50 CID items")
-                LOGGER.warning(
-                    "Bulk download request. Too many pointer file entries for download maximum of 50: %s.",
-                    len(priref_list),
-                )
-                continue
-            LOGGER.info(
-                "Bulk download requested with %s item prirefs to process.",
-                len(priref_list),
-            )
-            pointer_dct = get_dictionary(priref_list)
-            if not any(pointer_dct.values()):
-                update_table(
-                    fname, transcode, "Pointer file found no digital media records"
-                )
-                LOGGER.warning(
-                    "CID item number supplied in pointer file have no associated CID digital media records: %s",
-                    pointer_dct,
-                )
-                continue
-            # update_table(fname, transcode, 'Processing bulk request')
-            for key, value in pointer_dct.items():
-                media_priref = key
-                print(key)
-                LOGGER.info(
-                    "** Downloading digital items for CID item record %s", media_priref
-                )
-                download_dct = value
-                print(value)
-                for file in download_dct:
-                    for k, v in file.items():
-                        filename = k
-                        orig_fname = v[0]
-                        bucket = v[1]
-                        print(
-                            f"Media priref {media_priref} Filename {filename} Original name {orig_fname} in bucket {bucket}"
-                        )
-                        if not len(filename) > 0:
-                            LOGGER.warning(
-                                "Filename is not recognised, no matching CID Media record"
-                            )
-                            continue
-                        if "netflix" in str(bucket) or "amazon" in str(bucket):
-                            LOGGER.warning(
-                                "Filename is a Netflix/Amazon item and will not be downloaded"
-                            )
-                            update_table(fname, transcode, "Filename not accessible")
-                            continue
-                        LOGGER.info(
-                            "Download file request matched to CID file %s media record %s",
-                            orig_fname,
-                            media_priref,
-                        )
+def main():
+    """
+    Retrieve 'Requested' rows from database.db as list of
+    tuples, collect every file requested (single and bulk),
+    and download each object once in bulk GET jobs. Files
+    are transcoded as soon as they land
+    """
+    data = retrieve_requested()
+    if len(data) == 0:
+        dq.release(QUEUE, WORKER)
+        sys.exit("No data found in DOWNLOADS database")
 
-                        # Check if download already exists
-                        new_fpath, skip_download = check_download_exists(
-                            download_fpath, orig_fname, filename, transcode
+    LOGGER.info(
+        "================ DPI DOWNLOAD REQUESTS RETRIEVED: %s. Date: %s =================",
+        len(data),
+        datetime.now().strftime(FMT)[:19],
+    )
+    stop_heartbeat = dq.start_heartbeat(QUEUE, WORKER)
+    try:
+        tasks, requests = collect_tasks(data)
+        LOGGER.info("%s files to process from %s requests", len(tasks), len(data))
+        download_tasks(tasks, requests)
+    finally:
+        stop_heartbeat.set()
+        dq.release(QUEUE, WORKER)
+
+    LOGGER.info(
+        "================ DPI DOWNLOAD REQUESTS COMPLETED. Date: %s =================\n",
+        datetime.now().strftime(FMT)[:19],
+    )
+
+
+class _Stage:
+    """
+    Thread pool with bounded queue. Submit blocks
+    while workers plus STAGE_QUEUE items are pending
+    """
+
+    def __init__(self, name: str, workers: int) -> None:
+        self.name = name
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.slots = threading.BoundedSemaphore(workers + STAGE_QUEUE)
+
+    def submit(self, func, *args) -> None:
+        self.slots.acquire()
+        self.pool.submit(self._run, func, *args)
+
+    def _run(self, func, *args) -> None:
+        try:
+            func(*args)
+        except Exception as err:
+            LOGGER.exception("%s stage failed in %s: %s", self.name, func.__name__, err)
+        finally:
+            self.slots.release()
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True)
+
+
+def download_tasks(
+    tasks: list[dict[str, Any]], requests: dict[tuple[str, str], dict[str, Any]]
+) -> None:
+    """
+    De-duplicate objects requested by several tasks
+    and download per bucket in bulk GET jobs of up to
+    BULK_JOB_MAX objects on download workers. Each
+    landed object moves to the verify stage then a
+    transcode lane, while the job continues
+    """
+    stages = {
+        "download": _Stage("download", DOWNLOAD_WORKERS),
+        "verify": _Stage("verify", VERIFY_WORKERS),
+        "transcode": _Stage("transcode", TRANSCODE_WORKERS),
+        "prores": _Stage("prores", PRORES_WORKERS),
+    }
+    objects: dict[tuple[str, str], list[dict[str, Any]]] = {}
+    existing: list[dict[str, Any]] = []
+    try:
+        for task in tasks:
+            if task["skip_download"]:
+                existing.append(task)
+            else:
+                objects.setdefault((task["filename"], task["bucket"]), []).append(task)
+        submit_transcodes(existing, requests, stages)
+
+        buckets: dict[str, list[str]] = {}
+        for filename, bucket in objects:
+            buckets.setdefault(bucket, []).append(filename)
+        for bucket, names in buckets.items():
+            names.sort()
+            for num in range(0, len(names), BULK_JOB_MAX):
+                check_control()
+                batch = names[num : num + BULK_JOB_MAX]
+                file_paths = {}
+                for name in batch:
+                    first = objects[(name, bucket)][0]
+                    file_paths[name] = os.path.join(first["download_fpath"], name)
+                    for task in objects[(name, bucket)]:
+                        LOGGER.info(
+                            "Beginning download of file %s to download path", name
                         )
-                        if not new_fpath:
-                            LOGGER.warning(
-                                "Download path exists and no transcode required. Skipping."
-                            )
-                            continue
-                        if not skip_download:
-                            # Download from BP
-                            LOGGER.info(
-                                "Beginning download of file %s to download path",
-                                filename,
-                            )
-                            update_table(fname, transcode, f"Downloading {orig_fname}")
-                            download_job_id = download_bp_object(
-                                filename, download_fpath, bucket
-                            )
-                            if download_job_id == "404":
-                                LOGGER.warning(
-                                    "Download of file %s failed. File not found in Black Pearl tape library.",
-                                    filename,
-                                )
-                                continue
-                            elif not download_job_id:
-                                LOGGER.warning(
-                                    "Download of file %s failed. Resetting download status and script exiting.",
-                                    filename,
-                                )
-                                continue
-                            LOGGER.info(
-                                "Downloaded file retrieved successfully. Job ID: %s",
-                                download_job_id,
-                            )
-                            if str(orig_fname).strip() != str(filename).strip():
-                                LOGGER.info(
-                                    "Updating download UMID filename with item filename: %s",
-                                    orig_fname,
-                                )
-                                umid_fpath = os.path.join(download_fpath, filename)
-                                os.rename(umid_fpath, new_fpath)
-
-                            # MD5 Verification
-                            local_md5, bp_md5 = make_check_md5(
-                                new_fpath, filename, bucket
+                        if task["dtype"] == "single":
+                            update_table(
+                                task["request"], task["transcode"], "Downloading"
                             )
-                            LOGGER.info(
-                                "MD5 checksum validation check:\n\t%s - Downloaded file MD5\n\t%s - Black Pearl retrieved MD5",
-                                local_md5,
-                                bp_md5,
+                        else:
+                            update_table(
+                                task["request"],
+                                task["transcode"],
+                                f"Downloading {task['orig_fname']}",
                             )
-                            if local_md5 == bp_md5:
-                                LOGGER.info(
-                                    "MD5 checksums match. Updating Download status to Download database"
-                                )
-                            else:
-                                LOGGER.warning(
-                                    "MD5 checksums DO NOT match. Updating Download status to Download database"
-                                )
-
-                        # Transcode
-                        trans, failed_trans = create_transcode(
-                            new_fpath, transcode, fname
-                        )
+                stages["download"].submit(
+                    download_batch, bucket, file_paths, objects, requests, stages
+                )
+    finally:
+        # Upstream stages finish first as they feed those after
+        for stage in stages.values():
+            stage.shutdown()
 
-                        # Delete source download from DPI if not failed transcode/already found in path
-                        if trans == "no_transcode":
-                            LOGGER.info("No transcode requested for this asset.")
-                        elif not skip_download or not failed_trans:
-                            LOGGER.info("Deleting downloaded asset: %s", new_fpath)
-                            os.remove(new_fpath)
-                        files_processed[orig_fname] = f"{trans}"
 
-            # Send notification email
-            if len(files_processed) == 0:
-                continue
-            LOGGER.info("Files processed: %s", files_processed)
-            send_email_update_bulk(email, download_fpath, files_processed)
+def download_batch(
+    bucket: str,
+    file_paths: dict[str, str],
+    objects: dict[tuple[str, str], list[dict[str, Any]]],
+    requests: dict[tuple[str, str], dict[str, Any]],
+    stages: dict[str, _Stage],
+) -> None:
+    """
+    Run one bulk GET job, handing each object
+    to the verify stage as it lands
+    """
+
+    def on_object(name: str, result: dict[str, Any]) -> None:
+        stages["verify"].submit(
+            land_object, objects[(name, bucket)], result, requests, stages
+        )
+
+    try:
+        bp.download_objects_md5(
+            file_paths, bucket, log=LOGGER.info, on_object=on_object, resume=True
+        )
+    except Exception as err:
+        LOGGER.warning("Bulk download from %s failed: %s", bucket, err)
+        if "Unable to retrieve files" not in str(err):
+            return
+        # Job never created, eg one object missing. Retry singly
+        for name, file_path in file_paths.items():
+            try:
+                bp.download_objects_md5(
+                    {name: file_path},
+                    bucket,
+                    log=LOGGER.info,
+                    on_object=on_object,
+                    resume=True,
+                )
+            except Exception as exc:
+                for task in objects[(name, bucket)]:
+                    download_failed(task, requests, str(exc))
+
+
+def land_object(
+    tasks: list[dict[str, Any]],
+    result: dict[str, Any],
+    requests: dict[tuple[str, str], dict[str, Any]],
+    stages: dict[str, _Stage],
+) -> None:
+    """
+    Object download finished: verify and move into
+    place, copy to any other requesters' paths then
+    pass to transcode. Failed downloads keep their
+    .part file so the next run resumes them
+    """
+    first = tasks[0]
+    if result["error"]:
+        for task in tasks:
+            download_failed(task, requests, result["error"])
+        return
+    LOGGER.info("Downloaded file retrieved successfully. Job ID: %s", result["job_id"])
+    verified = verify_task(first, result["path"], result["md5"])
+    if verified is not True:
+        for task in tasks:
+            download_failed(task, requests, verified)
+        return
+
+    for task in tasks[1:]:
+        if task["new_fpath"] == first["new_fpath"]:
+            # Same path requested again, transcoded after first task
+            task["skip_download"] = True
+            continue
+        shutil.copy2(first["new_fpath"], task["new_fpath"])
+        if task["dtype"] == "single":
+            update_table(task["request"], task["transcode"], "Download complete")
+    submit_transcodes(tasks, requests, stages)
+
+
+def submit_transcodes(
+    tasks: list[dict[str, Any]],
+    requests: dict[tuple[str, str], dict[str, Any]],
+    stages: dict[str, _Stage],
+) -> None:
+    """
+    Queue tasks for transcode, in order per file
+    path. ProRes runs in its own lane so long
+    transcodes don't hold up MP4s behind them
+    """
+    paths: dict[str, list[dict[str, Any]]] = {}
+    for task in tasks:
+        paths.setdefault(task["new_fpath"], []).append(task)
+    for path_tasks in paths.values():
+        if any(task["transcode"] == "prores" for task in path_tasks):
+            stages["prores"].submit(transcode_tasks, path_tasks, requests)
+        else:
+            stages["transcode"].submit(transcode_tasks, path_tasks, requests)
+
+
+def download_failed(
+    task: dict[str, Any],
+    requests: dict[tuple[str, str], dict[str, Any]],
+    error: str,
+) -> None:
+    """
+    Record failed download for task
+    """
+    if "NotFound[404]" in error:
+        LOGGER.warning(
+            "Download of file %s failed. File not found in Black Pearl tape library.",
+            task["filename"],
+        )
+        if task["dtype"] == "single":
             update_table(
-                fname, transcode, "Bulk download complete. See email for details"
+                task["request"], task["transcode"], "Filename not found in Black Pearl"
             )
+    else:
+        LOGGER.warning(
+            "Download of file %s failed. Resetting download status: %s",
+            task["filename"],
+            error,
+        )
+        if task["dtype"] == "single":
+            update_table(task["request"], task["transcode"], "Requested")
+    if task["dtype"] != "single":
+        finish_bulk(task, requests)
+
 
+def verify_task(
+    task: dict[str, Any], part_path: str, download_md5: str = ""
+) -> bool | str:
+    """
+    Verify .part download MD5 against BP ETag then
+    rename into place, with item filename if UMID.
+    Returns True, or reason download not accepted
+    """
+    filename = task["filename"]
+    new_fpath = task["new_fpath"]
+
+    # MD5 Verification
+    local_md5, bp_md5 = make_check_md5(
+        part_path, filename, task["bucket"], download_md5
+    )
     LOGGER.info(
-        "================ DPI DOWNLOAD REQUESTS COMPLETED. Date: %s =================\n",
-        datetime.now().strftime(FMT)[:19],
+        "MD5 checksum validation check:\n\t%s - Downloaded file MD5\n\t%s - Black Pearl retrieved MD5",
+        local_md5,
+        bp_md5,
     )
+    if bp_md5 == "None":
+        # Keep .part, rerun re-checks without fetching again
+        LOGGER.warning("Unable to retrieve Black Pearl MD5 for %s", filename)
+        return "Black Pearl MD5 not retrieved"
+    if local_md5 != bp_md5:
+        LOGGER.warning("MD5 checksums DO NOT match. Discarding download %s", part_path)
+        bp.discard_part(part_path)
+        return "MD5 checksums do not match"
+    LOGGER.info("MD5 checksums match. Updating Download status to Download database")
+
+    if str(task["orig_fname"]).strip() != str(filename).strip():
+        LOGGER.info(
+            "Updating download UMID filename with item filename: %s",
+            task["orig_fname"],
+        )
+    bp.complete_part(part_path, new_fpath)
+    if task["dtype"] == "single":
+        update_table(task["request"], task["transcode"], "Download complete")
+    return True
 
 
-def download_bp_object(fname: str, outpath: str, bucket: str) -> Optional[str]:
+def transcode_tasks(
+    tasks: list[dict[str, Any]], requests: dict[tuple[str, str], dict[str, Any]]
+) -> None:
     """
-    Download the BP object from SpectraLogic
-    tape library and save to outpath
+    Transcode tasks sharing one file path in turn,
+    requeueing any left when downtime is requested
     """
-    file_path = os.path.join(outpath, fname)
-    get_objects = [ds3Helpers.HelperGetObject(fname, file_path)]
-    try:
-        get_job_id = HELPER.get_objects(get_objects, bucket)
-        print(f"BP get job ID: {get_job_id}")
-    except Exception as err:
-        LOGGER.warning("Unable to retrieve file %s from Black Pearl", fname)
-        if "NotFound[404]: Could not find requested blobs" in str(err):
-            get_job_id = "404"
-        else:
-            get_job_id = None
-    return get_job_id
+    for task in tasks:
+        if downtime_requested():
+            LOGGER.info("Downtime requested, requeueing %s", task["request"])
+            requeue_task(task, requests)
+            continue
+        if not os.path.exists(task["new_fpath"]):
+            LOGGER.info(
+                "File %s removed by earlier transcode, requeued", task["new_fpath"]
+            )
+            requeue_task(task, requests)
+            continue
+        transcode_task(task, requests)
+
+
+def requeue_task(
+    task: dict[str, Any], requests: dict[tuple[str, str], dict[str, Any]]
+) -> None:
+    """
+    Return request to 'Requested' for the next run,
+    bulk requests once their other files are done
+    """
+    if task["dtype"] == "single":
+        update_table(task["request"], task["transcode"], "Requested")
+        return
+    requests[(task["request"], task["transcode"])]["requeue"] = True
+    finish_bulk(task, requests)
+
+
+def transcode_task(
+    task: dict[str, Any], requests: dict[tuple[str, str], dict[str, Any]]
+) -> None:
+    """
+    Transcode, clean up download and notify user
+    """
+    fname = task["request"]
+    new_fpath = task["new_fpath"]
+    trans, failed_trans = create_transcode(new_fpath, task["transcode"], fname)
+
+    # Delete source download from DPI if not failed transcode/already found in path
+    if trans == "no_transcode":
+        LOGGER.info("No transcode requested for this asset.")
+    elif not task["skip_download"] or not failed_trans:
+        LOGGER.info("Deleting downloaded asset: %s", new_fpath)
+        os.remove(new_fpath)
+
+    # Send notification email
+    if task["dtype"] == "single":
+        send_email_update(task["email"], fname, new_fpath, trans)
+    else:
+        finish_bulk(task, requests, trans)
+
+
+def finish_bulk(
+    task: dict[str, Any],
+    requests: dict[tuple[str, str], dict[str, Any]],
+    trans: Optional[str] = None,
+) -> None:
+    """
+    Record bulk file outcome, and once all files
+    for the request are done email the user
+    """
+    progress = requests[(task["request"], task["transcode"])]
+    with PROGRESS_LOCK:
+        if trans:
+            progress["files_processed"][task["orig_fname"]] = f"{trans}"
+        progress["pending"] -= 1
+        if progress["pending"] > 0:
+            return
+    if progress.get("requeue"):
+        update_table(task["request"], task["transcode"], "Requested")
+        return
+    if len(progress["files_processed"]) == 0:
+        # Final status, so release() doesn't requeue the request
+        LOGGER.warning("No files processed for bulk request %s", task["request"])
+        update_table(task["request"], task["transcode"], "Bulk download failed")
+        return
+    LOGGER.info("Files processed: %s", progress["files_processed"])
+    send_email_update_bulk(
+        progress["email"], progress["download_fpath"], progress["files_processed"]
+    )
+    update_table(
+        task["request"],
+        task["transcode"],
+        "Bulk download complete. See email for details",
+    )
 
 
 def create_transcode(
@@ -14,11 +14,13 @@ Requires elasticsearch v7 or 8 only.
 import datetime
 import itertools
 import os
+import queue
 import re
 import sqlite3
+import uuid
 
 from elasticsearch import Elasticsearch
-from flask import Flask, render_template, request
+from flask import Flask, g, jsonify, render_template, request
 
 # Initiate Flask app / Elastic search
 app = Flask(__name__)
@@ -35,19 +37,204 @@ ES = Elasticsearch([ES_SEARCH])
 
 if ES.ping():
     print("Connected to Elasticsearch")
+    # Map fields used for paging and refresh, adds new fields only
+    ES.indices.put_mapping(
+        index="dpi_downloads",
+        body={
+            "properties": {
+                "request_id": {"type": "keyword"},
+                "updated": {"type": "date", "format": "yyyy-MM-dd HH:mm:ss"},
+            }
+        },
+    )
 else:
     print("Something's wrong")
 
 # Global variables / connect or create database.db
 DBASE = os.environ["DATABASE_NEWS_PRESERVATION"]
-CONNECT = sqlite3.connect(DBASE)
-CONNECT.execute(
-    "CREATE TABLE IF NOT EXISTS DOWNLOADS (name TEXT, email TEXT, preservation_date TEXT, channel TEXT, status TEXT, date TEXT)"
-)
+PAGE_SIZE = 100
+# Most changed requests returned per refresh
+UPDATES_SIZE = 1000
+FMT = "%Y-%m-%d %H:%M:%S"
+MOVE_FIELDS = ["name", "email", "preservation_date", "channel", "status", "date"]
+DOWNLOAD_FIELDS = [
+    "name",
+    "email",
+    "download_type",
+    "fname",
+    "download_path",
+    "fpath",
+    "transcode",
+    "status",
+    "date",
+]
+# request_id breaks ties between requests made in the same
+# second, requests indexed before it existed sort as ""
+DOWNLOAD_SORT = [
+    {"date": "desc"},
+    {"request_id": {"order": "desc", "missing": "", "unmapped_type": "keyword"}},
+]
+# Idle connections kept for reuse between requests
+POOL = queue.LifoQueue(maxsize=4)
 
 FLASK_HOST = os.environ["FLASK_HOST"]
 
 
+def connect_db():
+    """
+    Open database in WAL mode so page views don't
+    block the move script's status updates, creating
+    table and indexes if needed
+    """
+    connect = sqlite3.connect(DBASE, timeout=30, check_same_thread=False)
+    connect.execute("PRAGMA journal_mode=WAL")
+    connect.execute(
+        "CREATE TABLE IF NOT EXISTS DOWNLOADS (name TEXT, email TEXT, preservation_date TEXT, channel TEXT, status TEXT, date TEXT)"
+    )
+    connect.execute("CREATE INDEX IF NOT EXISTS moves_date ON DOWNLOADS (date)")
+    connect.execute(
+        "CREATE INDEX IF NOT EXISTS moves_status ON DOWNLOADS (status, date)"
+    )
+    connect.execute("CREATE INDEX IF NOT EXISTS moves_email ON DOWNLOADS (email, date)")
+    columns = [row[1] for row in connect.execute("PRAGMA table_info(DOWNLOADS)")]
+    if "updated" not in columns:
+        connect.execute("ALTER TABLE DOWNLOADS ADD COLUMN updated TEXT")
+    connect.execute("CREATE INDEX IF NOT EXISTS moves_updated ON DOWNLOADS (updated)")
+    connect.commit()
+    return connect
+
+
+def get_db():
+    """
+    Borrow pooled connection for this request
+    """
+    if "db" not in g:
+        try:
+            g.db = POOL.get_nowait()
+        except queue.Empty:
+            g.db = connect_db()
+    return g.db
+
+
+@app.teardown_appcontext
+def return_db(exception):
+    """
+    Return request's connection to pool
+    """
+    connect = g.pop("db", None)
+    if connect is None:
+        return
+    try:
+        POOL.put_nowait(connect)
+    except queue.Full:
+        connect.close()
+
+
+POOL.put_nowait(connect_db())
+
+
+def get_moves(before, email):
+    """
+    Return page of move requests from last
+    14 days, newest first, keyed on (date, rowid).
+    Returns rows and cursor for next page
+    """
+    where = ["date >= datetime('now','-14 days')"]
+    params = []
+    if before and "|" in before and before.rsplit("|", 1)[1].isnumeric():
+        date, rowid = before.rsplit("|", 1)
+        where.append("(date, rowid) < (?, ?)")
+        params.extend([date, int(rowid)])
+    if email:
+        where.append("email = ?")
+        params.append(email)
+    params.append(PAGE_SIZE)
+    cursor = get_db().execute(
+        f"SELECT {', '.join(MOVE_FIELDS)}, rowid FROM DOWNLOADS WHERE {' AND '.join(where)} ORDER BY date DESC, rowid DESC LIMIT ?",
+        params,
+    )
+    data = cursor.fetchall()
+    next_page = None
+    if len(data) == PAGE_SIZE:
+        next_page = f"{data[-1][5]}|{data[-1][6]}"
+    return data, next_page
+
+
+def get_move_updates(since):
+    """
+    Return move requests from last 14 days added or
+    changed at or after since, oldest change first.
+    Rows from the since second repeat, the page
+    updates rows by id
+    """
+    cursor = get_db().execute(
+        f"SELECT {', '.join(MOVE_FIELDS)}, rowid, updated FROM DOWNLOADS WHERE updated >= ? AND date >= datetime('now','-14 days') ORDER BY updated",
+        (since,),
+    )
+    return cursor.fetchall()
+
+
+def download_row(hit):
+    """
+    Return download request hit as tuple
+    of DOWNLOAD_FIELDS plus document id
+    """
+    source = hit["_source"]
+    return tuple(source.get(field) for field in DOWNLOAD_FIELDS) + (hit["_id"],)
+
+
+def get_downloads(before):
+    """
+    Return page of download requests from last
+    14 days, newest first, using search_after on
+    date and request_id. Returns rows and cursor
+    for next page
+    """
+    kwargs = {}
+    if before and "|" in before and before.split("|", 1)[0].isnumeric():
+        date, request_id = before.split("|", 1)
+        kwargs["search_after"] = [int(date), request_id]
+    search_results = ES.search(
+        index="dpi_downloads",
+        query={"range": {"date": {"gte": "now-14d/d", "lte": "now/d"}}},
+        sort=DOWNLOAD_SORT,
+        size=PAGE_SIZE,
+        **kwargs,
+    )
+    hits = search_results["hits"]["hits"]
+    data = [download_row(hit) for hit in hits]
+    next_page = None
+    if len(hits) == PAGE_SIZE:
+        date, request_id = hits[-1]["sort"]
+        next_page = f"{date}|{request_id}"
+    return data, next_page
+
+
+def get_download_updates(since):
+    """
+    Return download requests from last 14 days
+    indexed or changed at or after since, oldest
+    change first, with their updated stamps
+    """
+    search_results = ES.search(
+        index="dpi_downloads",
+        query={
+            "bool": {
+                "filter": [
+                    {"range": {"date": {"gte": "now-14d/d", "lte": "now/d"}}},
+                    {"range": {"updated": {"gte": since}}},
+                ]
+            }
+        },
+        sort=[{"updated": "asc"}],
+        size=UPDATES_SIZE,
+    )
+    return [
+        (download_row(hit), hit["_source"]["updated"])
+        for hit in search_results["hits"]["hits"]
+    ]
+
+
 def date_gen(date_str):
     """
     Generate date for checks if date
@@ -105,13 +292,12 @@ def dpi_move_request():
         # Check for non-BFI email and reject
         if "bfi.org.uk" not in email:
             return render_template("email_error.html")
-        with sqlite3.connect(DBASE) as users:
-            cursor = users.cursor()
-            cursor.execute(
-                "INSERT INTO DOWNLOADS (name,email,preservation_date,channel,status,date) VALUES (?,?,?,?,?,?)",
-                (name, email, preservation_date, channel, status, date_stamp),
-            )
-            users.commit()
+        users = get_db()
+        users.execute(
+            "INSERT INTO DOWNLOADS (name,email,preservation_date,channel,status,date,updated) VALUES (?,?,?,?,?,?,?)",
+            (name, email, preservation_date, channel, status, date_stamp, date_stamp),
+        )
+        users.commit()
         return render_template("index.html")
     else:
         return render_template("initiate.html")
@@ -122,11 +308,45 @@ def dpi_move():
     """
     Return the View all requested page
     """
-    connect = sqlite3.connect(DBASE)
-    cursor = connect.cursor()
-    cursor.execute("SELECT * FROM DOWNLOADS where date >= datetime('now','-14 days')")
-    data = cursor.fetchall()
-    return render_template("dpi_requests.html", data=data)
+    data, next_page = get_moves(request.args.get("before"), request.args.get("email"))
+    return render_template(
+        "dpi_requests.html",
+        data=data,
+        next_page=next_page,
+        refreshed=datetime.datetime.now().strftime(FMT),
+    )
+
+
+@app.route("/dpi_move/page")
+def dpi_move_page():
+    """
+    Return page of move requests as JSON,
+    first page when no 'before' cursor
+    """
+    data, next_page = get_moves(request.args.get("before"), request.args.get("email"))
+    fields = MOVE_FIELDS + ["id"]
+    return jsonify(
+        {"rows": [dict(zip(fields, row)) for row in data], "next": next_page}
+    )
+
+
+@app.route("/dpi_move/updates")
+def dpi_move_updates():
+    """
+    Return move requests added or changed since
+    'since' timestamp as JSON, for page refresh
+    """
+    since = request.args.get("since", "")
+    rows = get_move_updates(since)
+    return jsonify(
+        {
+            "rows": [
+                dict(zip(MOVE_FIELDS, row[:6]), id=row[6], updated=row[7])
+                for row in rows
+            ],
+            "since": rows[-1][7] if rows else since,
+        }
+    )
 
 
 @app.route("/dpi_download_request", methods=["GET", "POST"])
@@ -159,8 +379,10 @@ def dpi_download_request():
         # Check for non-BFI email and reject
         if "bfi.org.uk" not in email:
             return render_template("email_error_transcode.html")
+        request_id = uuid.uuid4().hex
         ES.index(
             index="dpi_downloads",
+            id=request_id,
             document={
                 "name": name,
                 "email": email,
@@ -171,6 +393,8 @@ def dpi_download_request():
                 "transcode": transcode,
                 "status": status,
                 "date": date_stamp,
+                "request_id": request_id,
+                "updated": date_stamp,
             },
         )
         return render_template("index_transcode.html")
@@ -183,17 +407,42 @@ def dpi_download():
     """
     Return the View all requested page
     """
-    search_results = ES.search(
-        index="dpi_downloads",
-        query={"range": {"date": {"gte": "now-14d/d", "lte": "now/d"}}},
-        size=500,
+    data, next_page = get_downloads(request.args.get("before"))
+    return render_template(
+        "downloads_transcode.html",
+        data=data,
+        next_page=next_page,
+        refreshed=datetime.datetime.now().strftime(FMT),
     )
-    data = []
-    for row in search_results["hits"]["hits"]:
-        record = [(value) for key, value in row["_source"].items()]
-        data.append(tuple(record))
 
-    return render_template("downloads_transcode.html", data=data)
+
+@app.route("/dpi_download/page")
+def dpi_download_page():
+    """
+    Return page of download requests as JSON,
+    first page when no 'before' cursor
+    """
+    data, next_page = get_downloads(request.args.get("before"))
+    return jsonify({"rows": data, "next": next_page})
+
+
+@app.route("/dpi_download/updates")
+def dpi_download_updates():
+    """
+    Return download requests added or changed since
+    'since' timestamp as JSON, for page refresh
+    """
+    since = request.args.get("since", "")
+    if not since:
+        return jsonify({"rows": [], "since": since})
+    rows = get_download_updates(since)
+    fields = DOWNLOAD_FIELDS + ["id"]
+    return jsonify(
+        {
+            "rows": [dict(zip(fields, row), updated=updated) for row, updated in rows],
+            "since": rows[-1][1] if rows else since,
+        }
+    )
 
 
 if __name__ == "__main__":
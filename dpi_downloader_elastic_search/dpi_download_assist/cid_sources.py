@@ -0,0 +1,60 @@
+"""
+CID searches behind each DPI browser index, and
+streaming of matching prirefs from CID raw priref
+endpoints.
+
+Standard library only, so it can be imported from
+the elasticsearch7 environment by
+elasticsearch_delete_items as well as by the
+indexing scripts.
+
+2026
+"""
+
+# Imports
+from urllib.parse import quote, urlencode
+from urllib.request import urlopen
+
+TIMEOUT = 300
+
+# Per index: CID database to watch for changes, raw priref endpoint
+# for the same database, search matching indexed records, searches
+# for records changed via linked records (no own modification date
+# so tracked by run time) and output database/record element used
+# to build documents
+SOURCES = {
+    "dpi_items": {
+        "database": "collect",
+        "raw": "prirefcollectraw",
+        "search": "(Df=item and reproduction.reference->imagen.media.original_filename=*)",
+        "linked": [
+            "(Df=item and reproduction.reference->imagen.media.original_filename=*) and (part_of_reference->part_of_reference->modification>='{since}')"
+        ],
+        "output": "elasticsearchitems",
+        "record_tag": "item",
+    },
+    "dpi_media": {
+        "database": "media",
+        "raw": "prirefmediaraw",
+        "search": "(object.object_number->Df=item) and (imagen.media.original_filename=*)",
+        "linked": [],
+        "output": "elasticsearchmedia",
+        "record_tag": "media",
+    },
+}
+
+
+def stream_prirefs(api, database, search):
+    """
+    Yield prirefs from a raw priref endpoint (eg
+    prirefcollectraw) as the response arrives,
+    without holding the whole response
+    """
+    query = urlencode(
+        {"database": database, "search": search, "limit": 0}, quote_via=quote
+    )
+    with urlopen(f"{api}?{query}", timeout=TIMEOUT) as response:
+        for line in response:
+            priref = line.decode("utf-8").strip()
+            if priref:
+                yield priref
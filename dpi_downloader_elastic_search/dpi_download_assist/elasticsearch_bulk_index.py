@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+"""
+Streaming bulk index of CID records into
+Elasticsearch, shared by elasticsearch_index_items
+and elasticsearch_index_media.
+
+1. Prirefs, from a list or streamed from a CID raw
+   priref endpoint, are fetched from the CID API in
+   batches (many prirefs per search) on a thread pool
+2. Each XML batch is split per record and converted
+   to JSON (xmljson parker) on a process pool
+3. Documents stream into parallel_bulk, with an
+   error report written per document that fails
+   at any stage
+
+Tune with environment variables:
+ES_FETCH_BATCH, ES_FETCH_WORKERS, ES_CONVERT_WORKERS,
+ES_CHUNK_SIZE, ES_BULK_THREADS
+
+2026
+"""
+
+# Imports
+import copy
+import logging
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from json import dumps
+
+import requests
+from elasticsearch import helpers
+from xmljson import parker
+
+LOG_PATH = os.environ.get("LOG_PATH")
+FETCH_BATCH = int(os.environ.get("ES_FETCH_BATCH", "50"))
+FETCH_WORKERS = int(os.environ.get("ES_FETCH_WORKERS", "4"))
+CONVERT_WORKERS = int(os.environ.get("ES_CONVERT_WORKERS", "4"))
+CHUNK_SIZE = int(os.environ.get("ES_CHUNK_SIZE", "500"))
+BULK_THREADS = int(os.environ.get("ES_BULK_THREADS", "4"))
+
+
+def read_prirefs(txt_dump):
+    """
+    Read unique prirefs from CID dump,
+    keeping file order
+    """
+    prirefs = []
+    seen = set()
+    with open(txt_dump) as txt_file:
+        for line in txt_file:
+            priref = line.strip()
+            if priref and priref not in seen:
+                seen.add(priref)
+                prirefs.append(priref)
+    return prirefs
+
+
+def unique_prirefs(*sources):
+    """
+    Yield each priref once across all sources,
+    in order, taking sources one after another
+    """
+    seen = set()
+    for source in sources:
+        for priref in source:
+            if priref not in seen:
+                seen.add(priref)
+                yield priref
+
+
+def fetch_batch(api, database, prirefs):
+    """
+    Fetch XML for a batch of prirefs in one search
+    Returns prirefs, XML text and error (or None)
+    """
+    search = f"priref={','.join(prirefs)}"
+    try:
+        xml = requests.get(
+            f"{api}?database={database}&search={search}&limit={len(prirefs)}",
+            timeout=300,
+        )
+        return prirefs, xml.text, None
+    except requests.exceptions.RequestException as err:
+        return prirefs, "", f"could not fetch xml from CID API: {err}"
+
+
+def _record_priref(record):
+    """
+    Priref of record from child element or attribute
+    """
+    priref = record.findtext("priref") or record.get("priref") or ""
+    return priref.strip()
+
+
+def convert_batch(prirefs, xml_text, record_tag):
+    """
+    Split batch XML into one tree per record, matching
+    a single priref search, and convert each to JSON.
+    Returns list of (priref, json or None, error or None)
+    """
+    results = []
+    if f"<{record_tag}" not in xml_text:
+        return [
+            (priref, None, f"invalid xml (no <{record_tag}> element) returned")
+            for priref in prirefs
+        ]
+    try:
+        root = ET.fromstring(xml_text)
+    except Exception as err:
+        return [
+            (priref, None, f"could not convert to xml using xmltree: {err}")
+            for priref in prirefs
+        ]
+
+    record_list = root.find("recordList")
+    if record_list is None:
+        record_list = root
+    records = record_list.findall(record_tag)
+    for record in records:
+        record_list.remove(record)
+    found = set()
+    for record in records:
+        priref = _record_priref(record)
+        if priref not in prirefs:
+            results.append((priref, None, "record priref not in requested batch"))
+            continue
+        found.add(priref)
+        single = copy.deepcopy(root)
+        target = single.find("recordList")
+        if target is None:
+            target = single
+        target.append(record)
+        # Convert XML to json for elasticsearch
+        results.append((priref, dumps(parker.data(single)), None))
+    for priref in prirefs:
+        if priref not in found:
+            results.append((priref, None, "no record returned from CID API"))
+    return results
+
+
+def generate_actions(api, database, record_tag, index, prirefs, errors):
+    """
+    Yield bulk index actions as batches are fetched
+    and converted, recording per-document failures.
+    prirefs may be a list or a stream, read one
+    batch at a time as fetches are submitted
+    """
+    prirefs = iter(prirefs)
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as fetchers, ProcessPoolExecutor(
+        max_workers=CONVERT_WORKERS
+    ) as converters:
+        # Keep a bounded number of batches in flight
+        window = FETCH_WORKERS * 2
+        fetches = []
+        conversions = []
+        more = True
+        while more or fetches or conversions:
+            while more and len(fetches) < window:
+                batch = list(islice(prirefs, FETCH_BATCH))
+                if not batch:
+                    more = False
+                    break
+                fetches.append(fetchers.submit(fetch_batch, api, database, batch))
+            if fetches and len(conversions) < window:
+                batch_prirefs, xml_text, error = fetches.pop(0).result()
+                if error:
+                    for priref in batch_prirefs:
+                        errors.append((priref, "fetch", error))
+                else:
+                    conversions.append(
+                        converters.submit(
+                            convert_batch, batch_prirefs, xml_text, record_tag
+                        )
+                    )
+                continue
+            if not conversions:
+                continue
+            for priref, json_out, error in conversions.pop(0).result():
+                if error:
+                    errors.append((priref, "convert", error))
+                    continue
+                yield {"_index": index, "_id": priref, "_source": json_out}
+
+
+def bulk_index(es, api, database, record_tag, index, txt_dump):
+    """
+    Stream all prirefs in txt_dump into index,
+    returning count indexed and list of failures
+    as (priref, stage, error)
+    """
+    return index_prirefs(es, api, database, record_tag, index, read_prirefs(txt_dump))
+
+
+def index_prirefs(es, api, database, record_tag, index, prirefs):
+    """
+    Stream prirefs (list or iterator) into index,
+    returning count indexed and list of failures
+    as (priref, stage, error)
+    """
+    logging.info(
+        "Bulk indexing prirefs into %s, %s per CID search, chunks of %s",
+        index,
+        FETCH_BATCH,
+        CHUNK_SIZE,
+    )
+    errors = []
+    indexed = 0
+    actions = generate_actions(api, database, record_tag, index, prirefs, errors)
+    for ok, info in helpers.parallel_bulk(
+        es,
+        actions,
+        thread_count=BULK_THREADS,
+        chunk_size=CHUNK_SIZE,
+        raise_on_error=False,
+        raise_on_exception=False,
+    ):
+        if ok:
+            indexed += 1
+            if indexed % 1000 == 0:
+                print(f"{indexed} {index} documents indexed")
+            continue
+        result = info.get("index", info)
+        errors.append(
+            (str(result.get("_id")), "index", dumps(result.get("error", result)))
+        )
+
+    write_error_report(index, errors)
+    logging.info(
+        "Bulk index into %s complete: %s indexed, %s failed",
+        index,
+        indexed,
+        len(errors),
+    )
+    return indexed, errors
+
+
+def write_error_report(index, errors):
+    """
+    Write one line per failed document,
+    and log each failure
+    """
+    report = os.path.join(LOG_PATH, f"elasticsearch_{index}_errors.tsv")
+    with open(report, "w") as tsv:
+        tsv.write("priref\tstage\terror\n")
+        for priref, stage, error in errors:
+            logging.error("%s - %s failed: %s", priref, stage, error)
+            tsv.write(f"{priref}\t{stage}\t{error}\n")
+    if errors:
+        logging.warning("%s failed documents listed in %s", len(errors), report)
@@ -1,10 +1,27 @@
 #!/usr/bin/env python3
 
 """
-Elastic search deletion
-script to clean up after
-index entries mapped from
-CSV_PATH file
+Elastic search deletion and
+reconciliation script to clean up
+index entries.
+
+Modes (first argument):
+csv - delete document IDs mapped from
+      CSV_PATH file (default)
+reconcile - compare IDs in index, via a
+      point in time scan of _id only, to
+      current CID prirefs for the index and
+      delete orphans. Add 'report' to list
+      orphans without deleting. Refuses to
+      delete more than ES_MAX_ORPHANS of the
+      index unless 'force' is added
+
+Second argument picks the index,
+dpi_items (default) or dpi_media.
+
+Deletes are sent with streaming_bulk
+without forcing refresh, and every
+orphan/failure is written to a report.
 
 DEPENDENCY:
 Must run from ENV with
@@ -12,14 +29,25 @@ elasticsearch7
 """
 
 import os
+import sys
 import csv
 import logging
 import elasticsearch7 as es
+from elasticsearch7 import helpers
+from cid_sources import SOURCES, stream_prirefs
 
 ES_HOST = os.environ.get("ES_PATH")
 LOG_PATH = os.environ.get("LOG_PATH")
 ADMIN = os.environ.get("ADMIN")
 CSV_PATH = os.path.join(ADMIN, "code/elasticsearch/elasticsearch_deletion.csv")
+CID_APIS = {
+    "dpi_items": os.environ.get("CID_API1"),
+    "dpi_media": os.environ.get("CID_API4"),
+}
+CHUNK_SIZE = 1000
+SCAN_SIZE = 10000
+# Largest fraction of index reconcile deletes without 'force'
+MAX_ORPHANS = float(os.environ.get("ES_MAX_ORPHANS", "0.05"))
 
 # Setup logging
 logger = logging.getLogger("elasticsearch_delete_items")
@@ -30,16 +58,119 @@ logger.addHandler(hdlr)
 logger.setLevel(logging.INFO)
 
 
+def csv_ids():
+    """
+    Yield document IDs from first
+    column of CSV, skipping header
+    """
+    with open(CSV_PATH, "r", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        next(reader)
+        for row in reader:
+            if row and row[0].strip():
+                yield row[0].strip()
+
+
+def index_ids(client, index_name):
+    """
+    Yield all _ids in index using point
+    in time and search_after, no _source
+    """
+    pit = client.open_point_in_time(index=index_name, keep_alive="5m")["id"]
+    search_after = None
+    try:
+        while True:
+            body = {
+                "size": SCAN_SIZE,
+                "_source": False,
+                "pit": {"id": pit, "keep_alive": "5m"},
+                "sort": [{"_shard_doc": "asc"}],
+            }
+            if search_after:
+                body["search_after"] = search_after
+            hits = client.search(body=body)["hits"]["hits"]
+            if not hits:
+                break
+            for hit in hits:
+                yield hit["_id"]
+            search_after = hits[-1]["sort"]
+    finally:
+        client.close_point_in_time(body={"id": pit})
+
+
+def find_orphans(client, index_name):
+    """
+    Return sorted IDs in index with no matching
+    CID record for the index, and count of IDs
+    in index. Index is scanned before CID prirefs
+    are fetched, so records created and indexed
+    between the two are not taken for orphans
+    """
+    doc_ids = list(index_ids(client, index_name))
+    source = SOURCES[index_name]
+    cid_prirefs = set(
+        stream_prirefs(CID_APIS[index_name], source["raw"], source["search"])
+    )
+    if not cid_prirefs:
+        raise Exception("No CID prirefs returned, refusing to reconcile")
+    logger.info("CID returned %s prirefs for %s", len(cid_prirefs), index_name)
+    orphans = [doc_id for doc_id in doc_ids if doc_id not in cid_prirefs]
+    return sorted(orphans), len(doc_ids)
+
+
+def bulk_delete(client, index_name, doc_ids):
+    """
+    Delete IDs in chunks, returning counts deleted,
+    skipped (already gone) and list of failures
+    """
+    actions = (
+        {"_op_type": "delete", "_index": index_name, "_id": doc_id}
+        for doc_id in doc_ids
+    )
+    success = 0
+    skip = 0
+    failed = []
+    for ok, item in helpers.streaming_bulk(
+        client,
+        actions,
+        chunk_size=CHUNK_SIZE,
+        raise_on_error=False,
+        raise_on_exception=False,
+    ):
+        result = item.get("delete", item)
+        if ok:
+            success += 1
+        elif result.get("status") == 404:
+            skip += 1
+        else:
+            failed.append((result.get("_id"), result.get("error", result)))
+    return success, skip, failed
+
+
+def write_report(index_name, mode, doc_ids, failed):
+    """
+    Write IDs targeted and failures to report
+    """
+    report = os.path.join(LOG_PATH, f"elasticsearch_delete_{index_name}_{mode}.tsv")
+    failures = dict(failed)
+    with open(report, "w") as tsv:
+        tsv.write("id\terror\n")
+        for doc_id in doc_ids:
+            tsv.write(f"{doc_id}\t{failures.get(doc_id, '')}\n")
+    logger.info("Report written to %s", report)
+
+
 def main():
     """
-    Call up all clients
-    from Elasticsearch
-    compare to CSV entries
-    delete those not needed
+    Delete CSV entries, or reconcile index
+    against CID and delete orphans in bulk
     """
+    mode = sys.argv[1] if len(sys.argv) > 1 else "csv"
+    index_name = sys.argv[2] if len(sys.argv) > 2 else "dpi_items"
+    report_only = "report" in sys.argv[3:]
+    force = "force" in sys.argv[3:]
 
     logger.info("Elasticsearch delete items start =======================")
-    index_name = "dpi_items"
     try:
         client = es.Elasticsearch(ES_HOST)
         logger.info("Successfully connected to Elasticsearch.")
@@ -57,38 +188,41 @@ def main():
     except es.TransportError as err:
         logger.error("TransportError before deletion: %s", err.info)
 
-    logger.info("Comparing Clients to CSV contents...")
-    try:
-        with open(CSV_PATH, "r", encoding="utf-8") as file:
-            reader = csv.reader(file)
-            success = 0
-            skip = 0
-            next(reader)
-
-            for row in reader:
-                if not row or not row[0].strip():
-                    skip += 1
-                    continue
-
-                doc_id = row[0].strip()
-                try:
-                    res = client.delete(index=index_name, id=doc_id, ignore=[404])
-                    if res.get("result") == "deleted":
-                        success += 1
-                        logger.info("Successfully deleted %s", doc_id)
-                    else:
-                        logger.info("Skipped non-existent document: %s", doc_id)
-                except es.TransportError as e:
-                    logger.error("Error deleting %s: %s", doc_id, e.info)
-
-        final_count = client.count(index=index_name)
+    if mode == "reconcile":
+        logger.info("Reconciling %s against CID...", index_name)
+        doc_ids, total = find_orphans(client, index_name)
+        logger.info("Found %s orphaned documents of %s", len(doc_ids), total)
+        if len(doc_ids) > total * MAX_ORPHANS and not report_only and not force:
+            logger.error(
+                "Orphans exceed %s of index, check CID searches or rerun with 'force'. Only reporting",
+                MAX_ORPHANS,
+            )
+            report_only = True
+    else:
+        logger.info("Reading IDs from CSV...")
+        try:
+            doc_ids = list(csv_ids())
+        except FileNotFoundError:
+            logger.error("CSV file not found.")
+            return
+
+    failed = []
+    if report_only:
+        logger.info("Report only, no documents deleted")
+    else:
+        success, skip, failed = bulk_delete(client, index_name, doc_ids)
+        for doc_id, error in failed:
+            logger.error("Error deleting %s: %s", doc_id, error)
         logger.info(
-            "Documents deleted: %s, Skipped (already deleted/empty): %s", success, skip
+            "Documents deleted: %s, Skipped (already deleted): %s, Failed: %s",
+            success,
+            skip,
+            len(failed),
         )
-        logger.info("Documents remaining in index: %s", final_count.get("count"))
+    write_report(index_name, mode, doc_ids, failed)
 
-    except FileNotFoundError:
-        logger.error("CSV file not found.")
+    final_count = client.count(index=index_name)
+    logger.info("Documents remaining in index: %s", final_count.get("count"))
     logger.info("Elasticsearch delete items complete ====================")
 
 
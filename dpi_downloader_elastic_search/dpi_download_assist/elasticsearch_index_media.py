@@ -11,54 +11,26 @@ video viewer.
 import os
 import sys
 import logging
-from json import dumps
-import xml.etree.ElementTree as ET
 from elasticsearch import Elasticsearch
-from xmljson import parker
-import requests
 
 sys.path.append(os.environ.get("CODE"))
 import utils
+from elasticsearch_bulk_index import bulk_index
+from elasticsearch_sync import SOURCES, rebuild, sync
 
 API = os.environ.get("CID_API4")
 ES_PATH = os.environ.get("ES_SEARCH_PATH")
 LOG_PATH = os.environ.get("LOG_PATH")
 LOG = os.path.join(LOG_PATH, "elasticsearch_index_media.log")
-CODE = os.environ.get("CODE")
-TXT_DUMP = os.path.join(
-    CODE, "dpi_downloader_elastic_search/dpi_download_assist/media_prirefs.txt"
-)
 logging.basicConfig(
     filename=LOG, level=logging.INFO, format="%(asctime)s %(message)s", filemode="w"
 )
 
 
-def call_cid_for_data():
-    """
-    CID calls to get data and build txt lists
-    """
-    search = "(object.object_number->Df=item) and (imagen.media.original_filename=* and modification>today-2)"
-    try:
-        response = requests.get(
-            f"{API}?database=prirefmediaraw&search={search}&limit=0", timeout=300
-        )
-    except requests.exceptions.Timeout as err:
-        print("Timed out at 30 seconds!")
-        raise SystemExit(err) from err
-    except requests.exceptions.RequestException as err:
-        raise SystemExit(err) from err
-
-    with open(TXT_DUMP, "w+") as txtfile:
-        txtfile.write(response.text)
-
-    print(f"Data written to {TXT_DUMP}")
-
-
 def main():
     """
-    Launch media priref CID call
-    then push priref list through to
-    DPI browser
+    Sync changed media records through
+    to DPI browser
     if not utils.check_control("pause_scripts"):
         logging.info(
             "Script run prevented by downtime_control.json. Script exiting."
@@ -69,66 +41,21 @@ def main():
         logging.warning("* Cannot establish CID session, exiting script")
         sys.exit("* Cannot establish CID session, exiting script")
 
-    call_cid_for_data()
     es = Elasticsearch(ES_PATH)
 
-    logging.info("Starting iteration of document: %s", TXT_DUMP)
-    with open(TXT_DUMP) as txt_file:
-        for count, line in enumerate(txt_file, 1):
-            xml_text = ""
-            status = ""
-            priref = line.strip()
-            print(priref)
-            if count % 100 == 0:
-                print(f"{count} media prirefs processed!")
-                logging.info("%s media prirefs processed")
-
-            search = f"priref={priref}"
-            try:
-                xml = requests.get(
-                    f"{API}?database=elasticsearchmedia&search={search}", timeout=30
-                )
-                xml_text = xml.text
-            except requests.exceptions.Timeout as err:
-                print("Timed out at 30 seconds!")
-                continue
-            except requests.exceptions.RequestException as err:
-                logging.error("%s - could not fetch xml from CID API: %s", priref, err)
-                continue
-
-            if "<media>" in xml_text:
-                status = "error-free"
-            else:
-                status = "error"
-                logging.error(
-                    "%s - invalid xml (no <media> element) returned from CID API",
-                    priref,
-                )
-
-            if status == "error-free":
-                try:
-                    xmltree = ET.fromstring(xml_text)
-                except Exception as err:
-                    logging.error(
-                        "%s - could not convert to xml using xmltree:\n%s", priref, err
-                    )
-                    continue
-
-                json_out = dumps(parker.data(xmltree))
-
-                try:
-                    index = es.index(index="dpi_media", id=priref, document=json_out)
-                    print(index["result"])
-                except Exception as err:
-                    logging.error(
-                        "%s - could not update or create document in elasticsearch index:\n%s",
-                        priref,
-                        err,
-                    )
-                    continue
-            else:
-                logging.error("%s - could not fetch xml from CID API", priref)
-                continue
+    # Incremental sync from checkpoint, full rebuild with alias swap,
+    # or clean-up run for prirefs listed in a txt file
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        indexed, errors = rebuild(es, API, "dpi_media")
+    elif len(sys.argv) > 1:
+        logging.info("Opening file: %s", sys.argv[1])
+        source = SOURCES["dpi_media"]
+        indexed, errors = bulk_index(
+            es, API, source["output"], source["record_tag"], "dpi_media", sys.argv[1]
+        )
+    else:
+        indexed, errors = sync(es, API, "dpi_media")
+    print(f"{indexed} media documents indexed, {len(errors)} failed")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+
+"""
+Incremental sync of CID records into the DPI
+browser Elasticsearch indexes, replacing fixed
+'modification>today-2' re-index windows.
+
+A checkpoint per index holds the last CID
+modification timestamp and priref indexed. Each
+run pages through records changed since the
+checkpoint, indexes them in (modification, priref)
+order using elasticsearch_bulk_index, then advances
+the checkpoint atomically past them. Failed records
+are kept in the checkpoint with their attempt count
+and retried by priref, up to MAX_RETRIES runs.
+
+Rebuild mode streams every matching priref from the
+CID raw priref endpoint into a fresh timestamped
+index, then swaps the alias (eg dpi_items) over to
+it in one action. The swap is abandoned, keeping the
+current index, when nothing was indexed or too many
+records failed.
+
+2026
+"""
+
+# Imports
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.environ.get("CODE"))
+import adlib_v3 as adlib
+from cid_sources import SOURCES, stream_prirefs
+from elasticsearch_bulk_index import index_prirefs, unique_prirefs
+
+LOG_PATH = os.environ.get("LOG_PATH")
+CHECKPOINTS = os.path.join(LOG_PATH, "elasticsearch_sync_checkpoints.json")
+PAGE_SIZE = 1000
+# First incremental run with no checkpoint looks back this far
+FIRST_RUN_DAYS = 2
+# Rebuild keeps current index if more than this fraction of records fail
+MAX_FAILED = float(os.environ.get("ES_REBUILD_MAX_FAILED", "0.01"))
+# Runs a failed priref is retried before it is dropped from checkpoint
+MAX_RETRIES = int(os.environ.get("ES_SYNC_MAX_RETRIES", "10"))
+
+
+def read_checkpoints():
+    """
+    Load checkpoints for all indexes
+    """
+    if not os.path.isfile(CHECKPOINTS):
+        return {}
+    with open(CHECKPOINTS) as data:
+        return json.load(data)
+
+
+def write_checkpoint(index, checkpoint):
+    """
+    Replace checkpoint for index, writing
+    to temp file and renaming into place
+    """
+    checkpoints = read_checkpoints()
+    checkpoints[index] = checkpoint
+    tmp = f"{CHECKPOINTS}.tmp"
+    with open(tmp, "w") as data:
+        json.dump(checkpoints, data, indent=2)
+    os.replace(tmp, CHECKPOINTS)
+
+
+def _timestamp(value):
+    """
+    CID modification as 'YYYY-MM-DD HH:MM:SS', from
+    CID 'T' separated or checkpoint values
+    """
+    return str(value)[:19].replace("T", " ")
+
+
+def _first(record, field):
+    """
+    First value of field from jsonv1 record
+    """
+    values = adlib.retrieve_field_name(record, field)
+    if values and values[0]:
+        return str(values[0])
+    return ""
+
+
+def fetch_changes(api, database, search):
+    """
+    Page through records matching search, returning
+    sorted list of (modification, priref)
+    """
+    changes = []
+    startfrom = 1
+    while True:
+        result = adlib.get(
+            api,
+            {
+                "database": database,
+                "search": search,
+                "fields": "priref,modification",
+                "limit": PAGE_SIZE,
+                "startfrom": startfrom,
+                "output": "jsonv1",
+            },
+        )
+        hits = int(result["adlibJSON"]["diagnostic"]["hits"])
+        records = result["adlibJSON"].get("recordList", {}).get("record", [])
+        for record in records:
+            priref = _first(record, "priref")
+            if priref:
+                changes.append((_timestamp(_first(record, "modification")), priref))
+        startfrom += PAGE_SIZE
+        if not records or startfrom > hits:
+            break
+    # Priref as int for tiebreak, matching CID numeric prirefs
+    return sorted(set(changes), key=lambda change: (change[0], int(change[1])))
+
+
+def _after(change, checkpoint):
+    """
+    True if (modification, priref) is past checkpoint
+    """
+    return (_timestamp(change[0]), int(change[1])) > (
+        _timestamp(checkpoint["modification"]),
+        int(checkpoint["priref"] or 0),
+    )
+
+
+def advance(checkpoint, changes):
+    """
+    Return checkpoint moved to the last change
+    """
+    new_checkpoint = dict(checkpoint)
+    if changes:
+        new_checkpoint["modification"], new_checkpoint["priref"] = changes[-1]
+    return new_checkpoint
+
+
+def retry_counts(retry, failed):
+    """
+    Return attempts per priref failed this run, counting
+    on from previous runs (retry may be a list from older
+    checkpoints). Prirefs failing MAX_RETRIES runs are dropped
+    """
+    if isinstance(retry, list):
+        retry = dict.fromkeys(retry, 0)
+    counts = {}
+    for priref in sorted(failed):
+        attempts = retry.get(priref, 0) + 1
+        if attempts > MAX_RETRIES:
+            logging.warning(
+                "Giving up on %s after %s failed attempts", priref, MAX_RETRIES
+            )
+            continue
+        counts[priref] = attempts
+    return counts
+
+
+def sync(es, api, index):
+    """
+    Index records changed since checkpoint and
+    advance it. Returns count indexed and failures
+    """
+    source = SOURCES[index]
+    run_start = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    checkpoint = read_checkpoints().get(index)
+    if checkpoint is None:
+        since = (datetime.now() - timedelta(days=FIRST_RUN_DAYS)).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+        checkpoint = {"modification": since, "priref": "0", "linked": since}
+    since = _timestamp(checkpoint["modification"])
+    logging.info("Syncing %s from checkpoint %s", index, checkpoint)
+
+    search = f"{source['search']} and (modification>='{since}')"
+    changes = [
+        change
+        for change in fetch_changes(api, source["database"], search)
+        if _after(change, checkpoint)
+    ]
+    retry = checkpoint.get("retry", {})
+    linked_searches = [
+        stream_prirefs(
+            api, source["raw"], linked_search.format(since=checkpoint["linked"])
+        )
+        for linked_search in source["linked"]
+    ]
+    logging.info(
+        "%s changed records, %s to retry, plus records changed via linked records",
+        len(changes),
+        len(retry),
+    )
+
+    # Linked search results index as they stream, after changed records
+    changed = [priref for _, priref in changes]
+    indexed, errors = index_prirefs(
+        es,
+        api,
+        source["output"],
+        source["record_tag"],
+        index,
+        unique_prirefs(changed, sorted(retry), *linked_searches),
+    )
+
+    # Checkpoint moves past failures, which are retried by priref
+    failed = {priref for priref, _, _ in errors}
+    new_checkpoint = advance(checkpoint, changes)
+    new_checkpoint["retry"] = retry_counts(retry, failed)
+    new_checkpoint["linked"] = run_start
+    write_checkpoint(index, new_checkpoint)
+    logging.info("Checkpoint for %s advanced to %s", index, new_checkpoint)
+    return indexed, errors
+
+
+def rebuild(es, api, alias):
+    """
+    Index all matching records into a fresh index,
+    swap alias to it and remove the old index(es).
+    Checkpoint set to run start, with failed
+    prirefs left for sync to retry. If nothing was
+    indexed or over MAX_FAILED of records failed the
+    fresh index is deleted and the alias left as is
+    """
+    source = SOURCES[alias]
+    run_start = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    new_index = f"{alias}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    logging.info("Rebuilding %s into %s", alias, new_index)
+
+    # Copy mappings from current index, pause refresh while loading
+    body = {"settings": {"index": {"refresh_interval": "-1"}}}
+    if es.indices.exists(index=alias):
+        current = es.indices.get_mapping(index=alias)
+        body["mappings"] = current[next(iter(current))]["mappings"]
+    es.indices.create(index=new_index, **body)
+
+    # Index as prirefs stream from the raw endpoint
+    indexed, errors = index_prirefs(
+        es,
+        api,
+        source["output"],
+        source["record_tag"],
+        new_index,
+        unique_prirefs(stream_prirefs(api, source["raw"], source["search"])),
+    )
+    attempted = indexed + len(errors)
+    if indexed == 0 or len(errors) > attempted * MAX_FAILED:
+        logging.error(
+            "Rebuild of %s abandoned, %s indexed and %s failed. Keeping current index",
+            alias,
+            indexed,
+            len(errors),
+        )
+        es.indices.delete(index=new_index)
+        logging.info("Deleted incomplete index %s", new_index)
+        return indexed, errors
+
+    es.indices.put_settings(
+        index=new_index, settings={"index": {"refresh_interval": None}}
+    )
+    es.indices.refresh(index=new_index)
+
+    actions = [{"add": {"index": new_index, "alias": alias}}]
+    if es.indices.exists_alias(name=alias):
+        old_indexes = list(es.indices.get_alias(name=alias))
+        actions = [
+            {"remove": {"index": old, "alias": alias}} for old in old_indexes
+        ] + actions
+    elif es.indices.exists(index=alias):
+        # First rebuild, concrete index replaced by alias
+        old_indexes = []
+        actions.insert(0, {"remove_index": {"index": alias}})
+    else:
+        old_indexes = []
+    es.indices.update_aliases(actions=actions)
+    logging.info("Alias %s now points to %s", alias, new_index)
+    for old in old_indexes:
+        es.indices.delete(index=old)
+        logging.info("Deleted previous index %s", old)
+
+    # Records changed from run start on are picked up by sync
+    checkpoint = {
+        "modification": run_start,
+        "priref": "0",
+        "linked": run_start,
+        "retry": retry_counts({}, {priref for priref, _, _ in errors}),
+    }
+    write_checkpoint(alias, checkpoint)
+    return indexed, errors
@@ -86,6 +86,18 @@ CONTROL_JSON: Final = os.environ["CONTROL_JSON"]
 CODEPTH: Final = os.environ["CODE"]
 ES_SEARCH: Final = os.environ["ES_SEARCH_PATH"]
 FMT: Final = "%Y-%m-%d %H:%M:%s"
+# Request fields in row order, document id appended
+FIELDS: Final = [
+    "name",
+    "email",
+    "download_type",
+    "fname",
+    "download_path",
+    "fpath",
+    "transcode",
+    "status",
+    "date",
+]
 
 # CONNECT TO ES
 ES: Final = Elasticsearch([ES_SEARCH])
@@ -276,9 +288,8 @@ def retrieve_requested() -> list[tuple[str, str]]:
         size=200,
     )
     for row in search_results["hits"]["hits"]:
-        get_id = [row["_id"]]
-        record = [(value) for key, value in row["_source"].items()]
-        all_items = tuple(record) + tuple(get_id)
+        record = [row["_source"].get(field) for field in FIELDS]
+        all_items = tuple(record) + (row["_id"],)
         requested_data.append(all_items)
     return remove_duplicates(requested_data)
 
@@ -317,7 +328,12 @@ def update_table(user_id: str, new_status: str) -> bool:
     Update specific ES index with new
     data, for fname match
     """
-    update_request = {"doc": {"status": f"{new_status}"}}
+    update_request = {
+        "doc": {
+            "status": f"{new_status}",
+            "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    }
 
     print(update_request)
     print(user_id)
@@ -98,7 +98,9 @@ def retrieve_requested() -> list[str]:
         cursor = sqlite_connection.cursor()
         print("Database connected successfully")
 
-        cursor.execute("SELECT * FROM DOWNLOADS WHERE status = 'Requested'")
+        cursor.execute(
+            "SELECT name, email, preservation_date, channel, status, date FROM DOWNLOADS WHERE status = 'Requested'"
+        )
         data = cursor.fetchall()
         print(data)
         for row in data:
@@ -139,8 +141,9 @@ def update_table(preservation_date: str, channel: str, new_status: str) -> None:
         sqlite_connection = sqlite3.connect(DATABASE)
         cursor = sqlite_connection.cursor()
         # Update row with new status
-        sql_query = """UPDATE DOWNLOADS SET status = ? WHERE preservation_date = ? AND channel = ?"""
-        data = (new_status, preservation_date, channel)
+        sql_query = """UPDATE DOWNLOADS SET status = ?, updated = ? WHERE preservation_date = ? AND channel = ?"""
+        updated = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        data = (new_status, updated, preservation_date, channel)
         cursor.execute(sql_query, data)
         sqlite_connection.commit()
         print(f"Record updated with new status {new_status}")
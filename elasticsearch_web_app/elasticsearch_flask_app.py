@@ -1,10 +1,16 @@
+import json
 import os
-from functools import lru_cache
 
 import elasticsearch_helper as elastic_helper
-import pandas as pd
 from elasticsearch import Elasticsearch
-from flask import Flask, render_template, request
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    render_template,
+    request,
+    stream_with_context,
+)
 
 app = Flask(__name__, template_folder="templates/")
 
@@ -18,16 +24,61 @@ es = Elasticsearch(
     ELASTIC_PATH, basic_auth=("elastic", ELASTIC_PASS), verify_certs=False
 )
 
-autoingest_index = []
+try:
+    elastic_helper.put_autoingest_template(es)
+except Exception as err:
+    app.logger.warning("Autoingest index template not updated: %s", err)
 
 
 @app.route("/")
 def home():
+    filename = elastic_helper.normalise_query(request.args.get("query"))
+    page = request.args.get("page", 1, type=int)
+    df = elastic_helper.cached_search(filename, es)
+    page_df, page, pages = elastic_helper.get_page(df, page)
+    table_html = page_df.to_html(classes="table table-striped", index=False)
+    return render_template(
+        "index.html",
+        table_html=table_html,
+        query=filename,
+        page=page,
+        pages=pages,
+        total=len(df),
+    )
+
+
+@app.route("/search.json")
+def search_json():
+    """
+    One page of results as JSON
+    """
+    filename = elastic_helper.normalise_query(request.args.get("query"))
+    page = request.args.get("page", 1, type=int)
+    df = elastic_helper.cached_search(filename, es)
+    page_df, page, pages = elastic_helper.get_page(df, page)
+    return jsonify(
+        {
+            "query": filename,
+            "page": page,
+            "pages": pages,
+            "total": len(df),
+            "rows": json.loads(page_df.to_json(orient="records")),
+        }
+    )
+
+
+@app.route("/search.ndjson")
+def search_ndjson():
+    """
+    Stream all results, one JSON object per line
+    """
     filename = request.args.get("query")
-    autoingest_index = elastic_helper.get_autoingest_docs(es)
-    df = elastic_helper.search_by_filepath(filename, autoingest_index, es)
-    table_html = df.to_html(classes="table table-striped", index=False)
-    return render_template("index.html", table_html=table_html)
+
+    def generate():
+        for record in elastic_helper.iter_records(filename, es):
+            yield json.dumps(record) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 
 if __name__ == "__main__":
@@ -1,36 +1,239 @@
 import os
-from functools import lru_cache
+import threading
+import time
+from collections import OrderedDict
 
 import pandas as pd
 from elasticsearch import Elasticsearch
 
 ELASTIC_PASS = os.environ["ELASTIC_PASS"]
 
+# All daily autoingest log indices, searched in one request
+AUTOINGEST_PATTERN = "*autoingest*"
+AUTOINGEST_TEMPLATE = "autoingest_logs"
+# filename.wildcard exists only in indices created from the template,
+# switch once all retained daily indices have rolled over to it
+FILENAME_FIELD = os.environ.get("AUTOINGEST_FILENAME_FIELD", "filename.keyword")
+PAGE_SIZE = 1000
+KEEP_ALIVE = "1m"
+# Seconds before index list and search results are fetched again
+INDEX_TTL = int(os.environ.get("AUTOINGEST_INDEX_TTL", "300"))
+RESULT_TTL = int(os.environ.get("AUTOINGEST_RESULT_TTL", "120"))
+RESULT_CACHE_SIZE = 128
+ROWS_PER_PAGE = 100
 
-@lru_cache(maxsize=1)
-def get_autoingest_docs(es):
-    indices = es.cat.indices(format="json")
-    list_of_auto = [idx["index"] for idx in indices if "autoingest" in idx["index"]]
-    return list_of_auto
+_index_cache = {"indices": (), "expires": 0.0}
+_index_lock = threading.Lock()
 
 
-def search_by_filepath(filepath, list_of_auto, es):
-    query = {
+class TTLCache:
+    """
+    Least recently used cache whose entries expire
+    after ttl seconds. Concurrent misses for one key
+    wait on a single load rather than each loading
+    """
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading = {}
+
+    def get(self, key, load):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                return entry[1]
+            key_lock = self.loading.setdefault(key, threading.Lock())
+        with key_lock:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry[0] > time.monotonic():
+                    return entry[1]
+            try:
+                value = load()
+                with self.lock:
+                    self.entries[key] = (time.monotonic() + self.ttl, value)
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.maxsize:
+                        self.entries.popitem(last=False)
+            finally:
+                with self.lock:
+                    self.loading.pop(key, None)
+            return value
+
+    def peek(self, key):
+        """
+        Return unexpired value or None, without loading
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            return None
+
+
+_results = TTLCache(RESULT_TTL, RESULT_CACHE_SIZE)
+
+
+def get_autoingest_docs(es, refresh=False):
+    """
+    Return autoingest index names, listed again
+    after INDEX_TTL so new daily indices appear
+    """
+    with _index_lock:
+        if refresh or _index_cache["expires"] <= time.monotonic():
+            indices = es.cat.indices(index=AUTOINGEST_PATTERN, format="json")
+            _index_cache["indices"] = tuple(sorted(idx["index"] for idx in indices))
+            _index_cache["expires"] = time.monotonic() + INDEX_TTL
+        return _index_cache["indices"]
+
+
+def put_autoingest_template(es):
+    """
+    Map filename in new daily autoingest indices as
+    text with keyword and wildcard subfields, so
+    filename searches don't rely on dynamic mapping
+    """
+    es.indices.put_index_template(
+        name=AUTOINGEST_TEMPLATE,
+        index_patterns=[AUTOINGEST_PATTERN],
+        template={
+            "mappings": {
+                "properties": {
+                    "filename": {
+                        "type": "text",
+                        "fields": {
+                            "keyword": {"type": "keyword", "ignore_above": 1024},
+                            "wildcard": {"type": "wildcard"},
+                        },
+                    }
+                }
+            }
+        },
+    )
+
+
+def normalise_query(filepath):
+    """
+    Strip whitespace and quotes pasted
+    around a filename
+    """
+    return (filepath or "").strip().strip("'\"").strip()
+
+
+def filepath_query(filepath):
+    """
+    Match filename exactly, or any part
+    of a multi-part file ('01of02')
+    """
+    return {
         "bool": {
             "should": [
-                {"term": {"filename.keyword": f"{filepath}"}},
-                {"wildcard": {"filename.keyword": {"value": f"{filepath}*of*"}}},
+                {"term": {FILENAME_FIELD: f"{filepath}"}},
+                {"wildcard": {FILENAME_FIELD: {"value": f"{filepath}*of*"}}},
             ],
             "minimum_should_match": 1,
         }
     }
-    df = pd.DataFrame()
 
-    for index in list_of_auto:
-        response = es.search(index=index, query=query)
-        df = pd.concat(
-            [df, pd.json_normalize(x["_source"] for x in response["hits"]["hits"])],
-            ignore_index=True,
-        )
 
-    return df
+def iter_hits(es, query, index=AUTOINGEST_PATTERN):
+    """
+    Yield every hit across index pattern/alias
+    using a point in time and search_after
+    """
+    pit = es.open_point_in_time(
+        index=index, keep_alive=KEEP_ALIVE, ignore_unavailable=True
+    )["id"]
+    search_after = None
+    try:
+        while True:
+            response = es.search(
+                query=query,
+                size=PAGE_SIZE,
+                pit={"id": pit, "keep_alive": KEEP_ALIVE},
+                sort=[{"_shard_doc": "asc"}],
+                search_after=search_after,
+            )
+            pit = response.get("pit_id", pit)
+            hits = response["hits"]["hits"]
+            if not hits:
+                break
+            yield from hits
+            search_after = hits[-1]["sort"]
+    finally:
+        es.close_point_in_time(id=pit)
+
+
+def search_by_filepath(filepath, es, index=AUTOINGEST_PATTERN):
+    """
+    Return all log entries for filepath from
+    every autoingest index as one DataFrame
+    """
+    if not filepath:
+        return pd.DataFrame()
+    hits = iter_hits(es, filepath_query(filepath), index)
+    return pd.json_normalize([hit["_source"] for hit in hits])
+
+
+def _cache_key(filepath, es):
+    """
+    Key results by query and current index list,
+    so a new daily index misses the cache
+    """
+    return (normalise_query(filepath), get_autoingest_docs(es))
+
+
+def cached_search(filepath, es):
+    """
+    search_by_filepath for normalised query,
+    reusing results for RESULT_TTL seconds
+    """
+    filepath = normalise_query(filepath)
+    return _results.get(
+        _cache_key(filepath, es), lambda: search_by_filepath(filepath, es)
+    )
+
+
+def flatten(source, prefix=""):
+    """
+    Flatten nested fields to dotted keys,
+    as json_normalize does
+    """
+    record = {}
+    for key, value in source.items():
+        if isinstance(value, dict):
+            record.update(flatten(value, f"{prefix}{key}."))
+        else:
+            record[f"{prefix}{key}"] = value
+    return record
+
+
+def iter_records(filepath, es):
+    """
+    Yield matching log entries as JSON-ready dicts,
+    from cached results where present, else
+    streamed from Elasticsearch
+    """
+    filepath = normalise_query(filepath)
+    if not filepath:
+        return
+    df = _results.peek(_cache_key(filepath, es))
+    if df is not None:
+        yield from df.astype(object).where(df.notna(), None).to_dict(orient="records")
+        return
+    for hit in iter_hits(es, filepath_query(filepath)):
+        yield flatten(hit["_source"])
+
+
+def get_page(df, page, rows=ROWS_PER_PAGE):
+    """
+    Return 1-based page of df, page number
+    (clamped to range) and number of pages
+    """
+    pages = max(1, -(-len(df) // rows))
+    page = min(max(1, page), pages)
+    return df.iloc[(page - 1) * rows : page * rows], page, pages
@@ -20,22 +20,26 @@ es = Elasticsearch(
     verify_certs=False,
 )
 
-autoingest_index = []
+df = elastic_helper.cached_search(text_search, es)
 
-autoingest_index = elastic_helper.get_autoingest_docs(es)
-df = elastic_helper.search_by_filepath(text_search, autoingest_index, es)
 
+if df.empty or "log_level" not in df.columns:
+    # Landing page or no results, no columns to filter on
+    filtered_df = df
+else:
+    with st.sidebar:
+        st.write("Apply filter: ")
 
-with st.sidebar:
-    st.write("Apply filter: ")
-
-    filter_column = ["log_level"]
-    dynamic_filter = DynamicFilters(df, filters=filter_column)
+        filter_column = ["log_level"]
+        dynamic_filter = DynamicFilters(df, filters=filter_column)
 
-    dynamic_filter.display_filters(location="sidebar")
-    filtered_df = dynamic_filter.filter_df()
+        dynamic_filter.display_filters(location="sidebar")
+        filtered_df = dynamic_filter.filter_df()
 if text_search and not df.empty:
-    st.write("results: ")
-    st.dataframe(filtered_df)
+    pages = max(1, -(-len(filtered_df) // elastic_helper.ROWS_PER_PAGE))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1)
+    page_df, page, pages = elastic_helper.get_page(filtered_df, page)
+    st.write(f"results: {len(filtered_df)}, page {page} of {pages}")
+    st.dataframe(page_df)
 else:
     st.write("no results are found!!!")
@@ -8,6 +8,11 @@ Use:
   $ clipmd5 /path/to/source.mkv --start 00:01:15 --end 00:03:00 --output clip.mkv
   $ clipmd5 source.mkv --start 00:05:00 --end 25 --output clip.mkv --ffmpeg -an -
 
+With cache_source=True the source framemd5 is made once
+for the whole file and each clip's manifest must equal
+the source packets from its first packet to the last
+before its end, for cutting many clips from one tape.
+
 Converted to Python3
 2022
 """
@@ -15,10 +20,16 @@ import argparse
 import os
 import subprocess
 import sys
+from typing import Optional
 
 sys.path.append(os.environ["CODE"])
 import utils
 
+# Whole source manifests keyed by path, size, mtime and FFmpeg args
+SOURCE_MANIFESTS: dict = {}
+# Stream copy starts from the keyframe before the requested in point
+SEEK_MARGIN = 30
+
 
 def framemd5_manifest(cmd: list[str]) -> bytes:
     """Generate a manifest of MD5 checksums: a list per stream"""
@@ -108,10 +119,144 @@ def framemd5_cut(framemd5: bytes) -> str:
     return "".join(new_manifest)
 
 
-def clipmd5(in_file: str, start: str, out_file: str, end=None, ffmpeg=None) -> bool:
+def parse_framemd5(framemd5: bytes) -> tuple[list[str], dict[int, list]]:
+    """
+    Split framemd5 into header lines (except timebase)
+    and per stream lists of (pts seconds, checksum)
+    """
+    headers: list[str] = []
+    timebases: dict[int, float] = {}
+    streams: dict[int, list] = {}
+    for line in framemd5.decode("utf-8").splitlines():
+        if line.startswith("#tb "):
+            idx, timebase = line[4:].split(":")
+            num, den = timebase.strip().split("/")
+            timebases[int(idx)] = int(num) / int(den)
+            continue
+        if line.startswith("#"):
+            headers.append(line)
+            continue
+        fields = [field.strip() for field in line.split(",")]
+        if len(fields) < 6:
+            continue
+        stream = int(fields[0])
+        try:
+            pts: Optional[float] = int(fields[2]) * timebases.get(stream, 1)
+        except ValueError:
+            pts = None
+        streams.setdefault(stream, []).append((pts, fields[-1]))
+
+    return headers, streams
+
+
+def source_manifest(
+    in_file: str, ffmpeg: list[str]
+) -> tuple[list[str], dict[int, list]]:
+    """
+    Framemd5 of whole source, made once per source file
+    and reused while its size and mtime are unchanged
+    """
+    stat = os.stat(in_file)
+    key = (in_file, stat.st_size, stat.st_mtime, tuple(ffmpeg))
+    if key not in SOURCE_MANIFESTS:
+        # Only keep the tape currently being split
+        SOURCE_MANIFESTS.clear()
+        manifest = framemd5_manifest(["ffmpeg", "-i", in_file] + ffmpeg)
+        if "#hash: MD5" not in str(manifest):
+            raise RuntimeError(f"Framemd5 source formatting error \n{manifest}")
+        SOURCE_MANIFESTS[key] = parse_framemd5(manifest)
+
+    return SOURCE_MANIFESTS[key]
+
+
+def seconds(position: str) -> float:
+    """
+    Seconds from [hh:mm:ss] or [s] position
+    """
+    total = 0.0
+    for part in position.split(":"):
+        total = total * 60 + float(part)
+    return total
+
+
+def clip_in_source(src, dst, start: float, end: float) -> bool:
+    """
+    True if each clip stream's checksums equal the source
+    stream's packets from the clip's first packet (found
+    near start) to the last source packet at or before end
+    """
+    src_headers, src_streams = src
+    dst_headers, dst_streams = dst
+    if src_headers != dst_headers or not dst_streams:
+        return False
+    if set(dst_streams) - set(src_streams):
+        return False
+
+    # Range relative to first source timestamp
+    first = min(
+        (
+            pts
+            for packets in src_streams.values()
+            for pts, _ in packets
+            if pts is not None
+        ),
+        default=0,
+    )
+    for stream, packets in dst_streams.items():
+        clip = [checksum for _, checksum in packets]
+        source = src_streams[stream]
+        stop = 0
+        for pos, (pts, _) in enumerate(source):
+            if pts is not None and pts - first <= end:
+                stop = pos + 1
+        if not any(
+            [checksum for _, checksum in source[pos:stop]] == clip
+            for pos, (pts, checksum) in enumerate(source[:stop])
+            if checksum == clip[0]
+            and (pts is None or pts - first >= start - SEEK_MARGIN)
+        ):
+            return False
+
+    return True
+
+
+def create_clip_from_source(
+    cmd: list[str], in_file: str, start: str, end=None, ffmpeg=None
+) -> bool:
+    """
+    Trim a clip, compare its framemd5 with the range
+    of the cached whole source framemd5
+    """
+    ffmpeg = ffmpeg or []
+    src = source_manifest(in_file, ffmpeg)
+
+    # Create segment, then framemd5s for destination
+    segment(cmd)
+    dst_md5 = framemd5_manifest(["ffmpeg", "-i", cmd[-1]] + ffmpeg)
+    if "#hash: MD5" not in str(dst_md5):
+        print(f"create_clip(): Framemd5 transcoded MKV formatting error \n{dst_md5}")
+        return False
+
+    start_secs = seconds(start)
+    if not end:
+        end_secs = float("inf")
+    else:
+        try:
+            end_secs = start_secs + int(end)
+        except ValueError:
+            end_secs = seconds(end)
+
+    return clip_in_source(src, parse_framemd5(dst_md5), start_secs, end_secs)
+
+
+def clipmd5(
+    in_file: str, start: str, out_file: str, end=None, ffmpeg=None, cache_source=False
+) -> bool:
     """Wrapper"""
 
     cmd = construct_command(in_file, start, out_file, end, ffmpeg)
+    if cache_source:
+        return create_clip_from_source(cmd, in_file, start, end, ffmpeg)
     status = create_clip(cmd)
     return status
 
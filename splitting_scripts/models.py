@@ -17,6 +17,7 @@ import os
 import re
 import string
 import sys
+from functools import cached_property
 from typing import Any, Final, Optional
 
 # Private packages
@@ -28,6 +29,8 @@ import utils
 LOGS = os.environ["LOG_PATH"]
 LOG_PATH = os.path.join(LOGS, "splitting_models.log")
 CID_API = utils.get_current_api()
+# Shared cid_get results for a run, None when not enabled
+CID_CACHE: Optional[dict] = None
 
 # Setup logging, overwrite each time
 logger = logging.getLogger("split_qnap_test")
@@ -51,6 +54,7 @@ class Item:
     def __init__(self, priref: str):
         self.priref: str = priref
         self.object_number: str = self._object_number()
+        self._siblings: Optional[list[int]] = None
 
     def _object_number(self):
         """
@@ -73,12 +77,15 @@ class Item:
         """
         Fetch identifiers of items in same manifestation
         """
-        siblings_priref: list[str] = []
+        if self._siblings is not None:
+            return self._siblings
+        siblings_priref: list[int] = []
         q: str = f"(part_of_reference->(parts_reference.lref={self.priref}))"
         recs = cid_get("items", q, "priref")[1]
         for rec in recs:
             siblings_priref.append(int(adlib.retrieve_field_name(rec, "priref")[0]))
         logger.info("Siblings: %s", siblings_priref)
+        self._siblings = siblings_priref
         return siblings_priref
 
     def cousins(self):
@@ -88,9 +95,10 @@ class Item:
         cousins_priref: list[int] = []
         q = f"(part_of_reference->(part_of_reference->(parts_reference->(parts_reference.lref={self.priref}))))"
         recs = cid_get("items", q, "priref")[1]
+        siblings = set(self.siblings())
         for rec in recs:
             priref = int(adlib.retrieve_field_name(rec, "priref")[0])
-            if priref not in self.siblings():
+            if priref not in siblings:
                 cousins_priref.append(priref)
         logger.info("Cousins: %s", cousins_priref)
         return cousins_priref
@@ -145,7 +153,6 @@ class Carrier:
     def __init__(self, **identifiers):
         self.identifiers = identifiers
         self.partwhole = self._partwhole()
-        self._items = None
 
         # Resolve can_ID as package if insufficient data
         if self.partwhole is None and "can_ID" in self.identifiers:
@@ -269,18 +276,15 @@ class Carrier:
 
             return f'(can_ID="{q}")'
 
-    @property
+    @cached_property
     def items(self):
         """
-        Fetch all item data
+        Fetch all item data, full records
+        in one query on first access
         """
-        if self._items is None:
-            q = f"{self._find_items()} sort can_ID,priref ascending"
-            print(f"Query for item record retrieval: {q}")
-            rec = cid_get("items", q)[1]
-            self._items = rec
-
-        return self._items
+        q = f"{self._find_items()} sort can_ID,priref ascending"
+        print(f"Query for item record retrieval: {q}")
+        return cid_get("items", q)[1]
 
     def _field_value(self, field, value_instance=None):
         """
@@ -302,7 +306,7 @@ class Carrier:
 
         return values
 
-    @property
+    @cached_property
     def duration(self):
         """
         Sum all known durations of carried items
@@ -352,7 +356,7 @@ class Carrier:
         except Exception as exc:
             print(exc)
 
-    @property
+    @cached_property
     def segments(self):
         """
         Return dict of priref/segments
@@ -468,11 +472,44 @@ class Carrier:
         return manifest
 
 
+def enable_cache() -> None:
+    """
+    Share cid_get results between all
+    models for the rest of the run
+    """
+    global CID_CACHE
+    if CID_CACHE is None:
+        CID_CACHE = {}
+
+
+def clear_cache() -> None:
+    """
+    Drop shared results, eg after records change
+    """
+    if CID_CACHE is not None:
+        CID_CACHE.clear()
+
+
 def cid_get(
     database: str, search: str, fields: Optional[list[Any]] = None
 ) -> tuple[int, Optional[list[dict[Any, Any]]]]:
     """
-    Simple query wrapper
+    Simple query wrapper, returning shared
+    results when cache enabled
+    """
+    if CID_CACHE is None:
+        return _cid_get(database, search, fields)
+    key = (database, search, str(fields or ""))
+    if key not in CID_CACHE:
+        CID_CACHE[key] = _cid_get(database, search, fields)
+    return CID_CACHE[key]
+
+
+def _cid_get(
+    database: str, search: str, fields: Optional[list[Any]] = None
+) -> tuple[int, Optional[list[dict[Any, Any]]]]:
+    """
+    Query CID
     """
     if not fields:
         hits, recs = adlib.retrieve_record(CID_API, database, search, "0")
@@ -156,6 +156,9 @@ def main():
         ]:
             files.append(os.path.join(root, filename))
 
+    # Reels of one package/can share item records, query CID once per run
+    models.enable_cache()
+
     # Process digitised tape files sequentially
     print("----------------------------------------------------")
     print(files)
@@ -567,7 +570,10 @@ def main():
                 print(
                     f"Call clipmd5.clipmd5({filepath}, {tcin}, {of}, {tcout}, {additional_args})"
                 )
-                fixity = clipmd5.clipmd5(filepath, tcin, of, tcout, additional_args)
+                # Source framemd5 made once per tape, shared by its items
+                fixity = clipmd5.clipmd5(
+                    filepath, tcin, of, tcout, additional_args, cache_source=True
+                )
                 print(f"Fixity confirmed: {fixity}")
                 logger.info("%s\tFixity confirmed: %s", filepath, fixity)
 
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.environ["CODE"], "splitting_scripts/"))
+import clipmd5
+
+HEADER = "#format: frame checksums\n#version: 2\n#hash: MD5\n#tb 0: 1/25\n"
+
+
+def framemd5(first: int, last: int) -> bytes:
+    """
+    Framemd5 for stream 0 frames first to last,
+    checksum per frame number
+    """
+    lines = [f"0, {pts}, {pts}, 1, 100, md5{pts:05d}" for pts in range(first, last + 1)]
+    return (HEADER + "\n".join(lines) + "\n").encode("utf-8")
+
+
+def test_clip_in_source():
+    """
+    Clip matches when it holds every source packet
+    from its first to the last before end
+    """
+    # 0 to 40 seconds of 25 fps source
+    src = clipmd5.parse_framemd5(framemd5(0, 1000))
+    dst = clipmd5.parse_framemd5(framemd5(250, 750))
+    assert clipmd5.clip_in_source(src, dst, 10, 30) is True
+
+
+def test_clip_in_source_truncated():
+    """
+    Clip missing packets at its end, or
+    with a changed packet, is rejected
+    """
+    src = clipmd5.parse_framemd5(framemd5(0, 1000))
+    truncated = clipmd5.parse_framemd5(framemd5(250, 700))
+    assert clipmd5.clip_in_source(src, truncated, 10, 30) is False
+
+    changed = framemd5(250, 750).replace(b"md500500", b"md5bad00")
+    assert clipmd5.clip_in_source(src, clipmd5.parse_framemd5(changed), 10, 30) is False